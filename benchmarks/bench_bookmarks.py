@@ -0,0 +1,54 @@
+"""
+Benchmark of the bookmarking of the records: 'incorporate' called for
+every record (the previous per-record path) against the 'BookmarkTracker'
+writing the state once per checkpoint ('tap_marketingcloud.state').
+
+    python -m benchmarks.bench_bookmarks [number of records]
+
+The bookmarks of both paths are compared before timing them.
+"""
+import datetime
+import sys
+import timeit
+
+from tap_marketingcloud.state import incorporate, BookmarkTracker
+
+
+# replication key values as formatted by 'sudsobj_to_dict', in no particular order
+def get_values(count):
+    start = datetime.datetime(2021, 1, 1)
+    return [(start + datetime.timedelta(seconds=(i * 7919) % count)).strftime('%Y-%m-%dT%H:%M:%SZ')
+            for i in range(count)]
+
+
+def incorporate_records(values):
+    state = {}
+    for value in values:
+        state = incorporate(state, 'email', 'ModifiedDate', value)
+    return state
+
+
+def track_records(values):
+    tracker = BookmarkTracker()
+    for value in values:
+        tracker.observe('email', 'ModifiedDate', value)
+    return tracker.write({})
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    values = get_values(count)
+
+    assert incorporate_records(values) == track_records(values)
+
+    previous = min(timeit.repeat(lambda: incorporate_records(values), number=1, repeat=3))
+    tracked = min(timeit.repeat(lambda: track_records(values), number=1, repeat=3))
+
+    print('records: {}'.format(count))
+    print('incorporate:     {:.2f} us per record'.format(previous / count * 1e6))
+    print('BookmarkTracker: {:.2f} us per record'.format(tracked / count * 1e6))
+    print('speedup:         {:.1f}x'.format(previous / tracked))
+
+
+if __name__ == '__main__':
+    main()
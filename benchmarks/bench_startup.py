@@ -0,0 +1,146 @@
+"""
+Benchmark of the startup of the tap ('client.get_auth_stub') for an S10+
+tenant: without 'client_cache_path' (the V1 attempt, the V2 token request
+and the WSDL parsed by suds) against the first and the next runs with
+the cache ('tap_marketingcloud.client_cache').
+
+    python -m benchmarks.bench_startup [number of WSDL types] [--latency=ms]
+
+The token requests are answered by a stub after '--latency' milliseconds
+(100 by default), the V1 one with an error as for a real S10+ tenant, and
+the WSDL is a generated one with as many complex types as asked (800 by
+default, about the size of the ExactTarget WSDL). The suds cache FuelSDK
+uses without 'client_cache_path' is cleared before every run, as it is
+on a new worker.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+from unittest import mock
+
+from tap_marketingcloud import client
+
+TYPE = """
+      <xsd:complexType name="Type{index}"><xsd:sequence>{elements}</xsd:sequence></xsd:complexType>"""
+ELEMENT = '<xsd:element name="Property{index}" type="xsd:string" minOccurs="0"/>'
+
+WSDL = """<?xml version="1.0" encoding="utf-8"?>
+<definitions xmlns="http://schemas.xmlsoap.org/wsdl/" xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+             xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:tns="http://exacttarget.com/wsdl/partnerAPI"
+             targetNamespace="http://exacttarget.com/wsdl/partnerAPI">
+  <types>
+    <xsd:schema elementFormDefault="qualified" targetNamespace="http://exacttarget.com/wsdl/partnerAPI">{types}
+      <xsd:element name="RetrieveRequestMsg">
+        <xsd:complexType><xsd:sequence><xsd:element name="RetrieveRequest" type="tns:Type0"/></xsd:sequence></xsd:complexType>
+      </xsd:element>
+    </xsd:schema>
+  </types>
+  <message name="RetrieveRequestMsg"><part name="parameters" element="tns:RetrieveRequestMsg"/></message>
+  <portType name="Soap">
+    <operation name="Retrieve"><input message="tns:RetrieveRequestMsg"/></operation>
+  </portType>
+  <binding name="Soap" type="tns:Soap">
+    <soap:binding transport="http://schemas.xmlsoap.org/soap/http"/>
+    <operation name="Retrieve"><soap:operation soapAction="Retrieve" style="document"/>
+      <input><soap:body use="literal"/></input></operation>
+  </binding>
+  <service name="PartnerAPI">
+    <port name="Soap" binding="tns:Soap"><soap:address location="https://localhost/Service.asmx"/></port>
+  </service>
+</definitions>"""
+
+CONFIG = {
+    'client_id': 'client_id',
+    'client_secret': 'client_secret',
+    'tenant_subdomain': 'tenant',
+    'start_date': '2021-01-01T00:00:00Z'
+}
+
+V2_TOKEN = {
+    'access_token': 'token',
+    'expires_in': 3600,
+    'soap_instance_url': 'https://tenant.soap.marketingcloudapis.com/',
+    'rest_instance_url': 'https://tenant.rest.marketingcloudapis.com/'
+}
+
+
+def write_wsdl(path, types):
+    elements = ''.join(ELEMENT.format(index=index) for index in range(10))
+    with open(path, 'w') as wsdl_file:
+        wsdl_file.write(WSDL.format(types=''.join(TYPE.format(index=index, elements=elements)
+                                                  for index in range(types))))
+
+
+class MockedTokenResponse:
+    def __init__(self, token):
+        self.token = token
+
+    def json(self):
+        return self.token
+
+
+# token requests of FuelSDK, taking 'latency' seconds, the V1 one fails
+def get_post(latency):
+    def post(url, **kwargs):
+        time.sleep(latency)
+        return MockedTokenResponse(V2_TOKEN if url.endswith('/v2/token') else {'message': 'Unauthorized'})
+    return post
+
+
+def main():
+    types = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 800
+    latency = next((int(arg.split('=', 1)[1]) for arg in sys.argv if arg.startswith('--latency=')), 100) / 1000
+
+    directory = tempfile.mkdtemp()
+    # the WSDL FuelSDK downloads, already in its location for the run without the cache
+    wsdl_path = os.path.join(directory, 'ExactTargetWSDL.xml')
+    write_wsdl(wsdl_path, types)
+    wsdl_size = os.path.getsize(wsdl_path)
+    cache_path = os.path.join(directory, 'cache')
+    os.makedirs(cache_path)
+    shutil.copy(wsdl_path, os.path.join(cache_path, 'ExactTargetWSDL.xml'))
+    # the default suds cache is under the temporary directory
+    tempfile.tempdir = os.path.join(directory, 'tmp')
+
+    def start(config):
+        shutil.rmtree(tempfile.tempdir, ignore_errors=True)
+        os.makedirs(tempfile.tempdir)
+        client.get_auth_stub(config)
+
+    def clear_cache():
+        for name in os.listdir(cache_path):
+            path = os.path.join(cache_path, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif name != 'ExactTargetWSDL.xml':
+                os.remove(path)
+
+    cached_config = dict(CONFIG, client_cache_path=cache_path)
+
+    try:
+        with mock.patch('FuelSDK.client.requests.post', get_post(latency)), \
+                mock.patch('tap_marketingcloud.client.TokenManager'), \
+                mock.patch.dict(os.environ, {'FUELSDK_WSDL_FILE_LOCAL_LOC': wsdl_path}), \
+                mock.patch('tap_marketingcloud.client.LOGGER'):
+            uncached = min(timeit.repeat(lambda: start(CONFIG), number=1, repeat=3))
+            first = min(timeit.repeat(lambda: start(cached_config), setup=clear_cache, number=1, repeat=3))
+            clear_cache()
+            start(cached_config)
+            cached = min(timeit.repeat(lambda: start(cached_config), number=1, repeat=3))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print('WSDL: {} types ({:.0f} KB), token request latency: {:.0f} ms'.format(
+        types, wsdl_size / 1024, latency * 1000))
+    print('no client_cache_path:   {:.0f} ms'.format(uncached * 1000))
+    print('first run with cache:   {:.0f} ms'.format(first * 1000))
+    print('next runs with cache:   {:.0f} ms'.format(cached * 1000))
+    print('saved per run:          {:.0f} ms'.format((uncached - cached) * 1000))
+
+
+if __name__ == '__main__':
+    main()
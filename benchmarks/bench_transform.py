@@ -0,0 +1,89 @@
+"""
+Benchmark of the record transformation: a singer 'Transformer' built for
+every record (the previous 'write_records_with_transform') against the
+transformer compiled once per stream ('tap_marketingcloud.transform').
+
+    python -m benchmarks.bench_transform [stream] [number of records]
+
+The output of both paths is compared before timing them.
+"""
+import copy
+import json
+import sys
+import timeit
+
+from singer import metadata, Transformer
+
+from tap_marketingcloud.schema_registry import get_schema
+from tap_marketingcloud.transform import compile_transformer
+
+
+def get_catalog(stream):
+    schema = get_schema(stream)
+    mdata = metadata.get_standard_metadata(schema=schema, key_properties=['ID'])
+    for entry in mdata:
+        entry['metadata']['selected'] = True
+    return {'schema': schema, 'metadata': mdata}
+
+
+# build records that look like the ones returned by the SOAP API
+def get_records(schema, count):
+    values = {
+        'integer': '12345',
+        'number': '1.5',
+        'boolean': 'true',
+        'string': 'value',
+    }
+    records = []
+    for i in range(count):
+        record = {}
+        for field_name, field_schema in schema['properties'].items():
+            types = field_schema.get('type', ['string'])
+            types = types if isinstance(types, list) else [types]
+            typ = [typ for typ in types if typ != 'null'] or ['string']
+            if field_schema.get('format') == 'date-time':
+                record[field_name] = '2021-01-{:02d}T00:00:00Z'.format(i % 28 + 1)
+            elif typ[0] in values:
+                record[field_name] = values[typ[0]]
+        records.append(record)
+    return records
+
+
+def transform_per_record(records, catalog):
+    for record in records:
+        with Transformer() as transformer:
+            transformer.transform(record, catalog.get('schema'), metadata.to_map(catalog.get('metadata')))
+
+
+def transform_compiled(records, catalog):
+    transformer = compile_transformer(catalog)
+    for record in records:
+        transformer.transform(record)
+
+
+def main():
+    stream = sys.argv[1] if len(sys.argv) > 1 else 'event'
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    catalog = get_catalog(stream)
+    records = get_records(catalog['schema'], count)
+
+    # verify both paths write byte-identical records
+    transformer = compile_transformer(catalog)
+    for record in records[:100]:
+        with Transformer() as reference:
+            expected = reference.transform(copy.deepcopy(record), catalog.get('schema'),
+                                           metadata.to_map(catalog.get('metadata')))
+        assert json.dumps(transformer.transform(record)) == json.dumps(expected)
+
+    per_record = min(timeit.repeat(lambda: transform_per_record(records, catalog), number=1, repeat=3))
+    compiled = min(timeit.repeat(lambda: transform_compiled(records, catalog), number=1, repeat=3))
+
+    print('stream: {}, records: {}'.format(stream, count))
+    print('Transformer per record: {:.3f}s ({:.0f} records/s)'.format(per_record, count / per_record))
+    print('compiled transformer:   {:.3f}s ({:.0f} records/s)'.format(compiled, count / compiled))
+    print('speedup: {:.1f}x'.format(per_record / compiled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark of the SOAP transport against a local stub SOAP server: the
+suds 'HttpAuthenticated' transport (a new connection per call, the
+previous transport of 'get_auth_stub') against the keep-alive
+'PooledTransport' ('tap_marketingcloud.transport').
+
+    python -m benchmarks.bench_transport [number of calls] [--tls]
+
+With '--tls' the stub server uses a self-signed certificate (made with
+the 'openssl' command), as the TLS handshake saved on every call is most
+of the gain against the real endpoints.
+"""
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import timeit
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from suds.transport import Request
+from suds.transport.https import HttpAuthenticated
+
+from tap_marketingcloud.transport import get_session, PooledTransport
+
+RESPONSE = b"""<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+<soap:Body><RetrieveResponseMsg xmlns="http://exacttarget.com/wsdl/partnerAPI">
+<OverallStatus>OK</OverallStatus><RequestID>request_id</RequestID>
+</RetrieveResponseMsg></soap:Body></soap:Envelope>"""
+
+REQUEST = b"""<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>
+<RetrieveRequestMsg xmlns="http://exacttarget.com/wsdl/partnerAPI"><RetrieveRequest>
+<ContinueRequest>request_id</ContinueRequest></RetrieveRequest></RetrieveRequestMsg>
+</soap:Body></soap:Envelope>"""
+
+
+class StubSoapHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # send the headers and the body in one segment, like a real server
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(tls):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSoapHandler)
+    scheme = 'http'
+
+    if tls:
+        directory = tempfile.mkdtemp()
+        cert = os.path.join(directory, 'cert.pem')
+        key = os.path.join(directory, 'key.pem')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                        '-subj', '/CN=127.0.0.1', '-keyout', key, '-out', cert],
+                       check=True, capture_output=True)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, '{}://127.0.0.1:{}/Service.asmx'.format(scheme, server.server_address[1])
+
+
+def call(transport, url, count):
+    for _ in range(count):
+        reply = transport.send(Request(url, REQUEST))
+        assert reply.message == RESPONSE
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 500
+    tls = '--tls' in sys.argv
+
+    if tls:
+        # the stub server certificate is self-signed
+        ssl._create_default_https_context = ssl._create_unverified_context  # pylint: disable=protected-access
+
+    server, url = start_server(tls)
+
+    session = get_session()
+    session.verify = False
+    session.trust_env = False
+
+    try:
+        plain = min(timeit.repeat(lambda: call(HttpAuthenticated(timeout=10), url, count), number=1, repeat=3))
+        pooled = min(timeit.repeat(lambda: call(PooledTransport(session, timeout=10), url, count), number=1, repeat=3))
+    finally:
+        server.shutdown()
+
+    print('calls: {}, {}'.format(count, 'https' if tls else 'http'))
+    print('HttpAuthenticated: {:.2f} ms per call'.format(plain / count * 1000))
+    print('PooledTransport:   {:.2f} ms per call'.format(pooled / count * 1000))
+    print('saved:             {:.2f} ms per call'.format((plain - pooled) / count * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -25,6 +25,9 @@ setup(
         ],
         'dev': [
             'ipdb==0.11'
+        ],
+        'async': [
+            'aiohttp==3.9.5'
         ]
     },
     entry_points='''
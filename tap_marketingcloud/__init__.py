@@ -8,6 +8,10 @@ from singer import utils
 from singer import metadata
 from tap_marketingcloud.state import save_state
 from tap_marketingcloud.client import get_auth_stub
+from tap_marketingcloud.governor import GOVERNOR
+from tap_marketingcloud.page_retry import RETRY_STATS
+from tap_marketingcloud.result_cache import ResultCache
+from tap_marketingcloud.scheduler import StreamScheduler, get_max_concurrent_streams
 from tap_marketingcloud.endpoints.campaigns import CampaignDataAccessObject
 from tap_marketingcloud.endpoints.content_areas import ContentAreaDataAccessObject
 from tap_marketingcloud.endpoints.emails import EmailDataAccessObject
@@ -23,6 +27,8 @@ from tap_marketingcloud.endpoints.campaign_assets import CampaignAssetDataAccess
 from tap_marketingcloud.endpoints.interactions import InteractionsDataAccessObject
 from tap_marketingcloud.endpoints.link_sends import LinkSendDataAccessObject
 from tap_marketingcloud.endpoints.assets import AssetDataAccessObject
+from tap_marketingcloud.endpoints.data_extensions import DataExtensionDataAccessObject, \
+    DataExtensionLookup, get_max_concurrent_data_extensions
 
 
 LOGGER = singer.get_logger()  # noqa
@@ -49,7 +55,8 @@ AVAILABLE_STREAM_ACCESSORS = [
     CampaignAssetDataAccessObject,
     InteractionsDataAccessObject,
     LinkSendDataAccessObject,
-    AssetDataAccessObject
+    AssetDataAccessObject,
+    DataExtensionDataAccessObject
 ]
 
 # run discover mode
@@ -86,8 +93,6 @@ def do_sync(args):
     state = args.state
     catalog = args.properties
 
-    success = True
-
     auth_stub = get_auth_stub(config)
 
     stream_accessors = []
@@ -166,15 +171,45 @@ def do_sync(args):
            send_link_selected:
             stream_accessor.send_link_catalog = send_link_catalog
 
-        try:
-            stream_accessor.state = state
-            stream_accessor.sync()
-            state = stream_accessor.state
+    data_extension_accessors = [stream_accessor for stream_accessor in stream_accessors
+                                if isinstance(stream_accessor, DataExtensionDataAccessObject)]
+    stream_accessors = [stream_accessor for stream_accessor in stream_accessors
+                        if not isinstance(stream_accessor, DataExtensionDataAccessObject)]
+
+    # the data extensions of all the selected data extension streams are
+    # looked up at once, instead of one request per data extension
+    if data_extension_accessors:
+        extension_lookup = DataExtensionLookup(
+            auth_stub,
+            [stream_accessor.customer_key for stream_accessor in data_extension_accessors],
+            data_extension_accessors[0].batch_size)
+
+        for stream_accessor in data_extension_accessors:
+            stream_accessor.extension_lookup = extension_lookup
+
+    # the requests shared by several streams (e.g. the campaign listing
+    # of 'campaign' and 'campaign_asset') are made once in the run
+    result_cache = ResultCache()
+
+    for stream_accessor in stream_accessors:
+        stream_accessor.result_cache = result_cache
+
+    # sync the streams on a bounded pool of workers, 'max_concurrent_streams'
+    # from the config decides how many streams are synced at the same time
+    scheduler = StreamScheduler(state, get_max_concurrent_streams(config))
+    success = scheduler.run(stream_accessors)
+
+    # then the data extensions, 'max_concurrent_data_extensions' at a time
+    if data_extension_accessors:
+        success = scheduler.run(data_extension_accessors,
+                                get_max_concurrent_data_extensions(config)) and success
+
+    state = scheduler.state
 
-        except Exception as e:
-            LOGGER.exception(e)
-            LOGGER.error('Failed to sync endpoint, moving on!')
-            success = False
+    # how much work the retries of the page requests repeated, and
+    # the limits the requests ended up with
+    RETRY_STATS.report()
+    GOVERNOR.report()
 
     save_state(state)
 
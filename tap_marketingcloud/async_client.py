@@ -0,0 +1,255 @@
+import asyncio
+import collections
+import itertools
+import threading
+import weakref
+import singer
+
+from concurrent.futures import ThreadPoolExecutor
+
+from tap_marketingcloud.client import get_field_props, REQUEST_TIMEOUT
+from tap_marketingcloud.governor import is_congestion_error, is_throttled, GOVERNOR
+from tap_marketingcloud.page_retry import retry_streamed_page_async, PAGE_RETRY_ERRORS
+from tap_marketingcloud.soap_stream import build_retrieve_envelope, check_page, get_retrievable_props, \
+    read_fault, RetrieveResponseParser, CHUNK_SIZE, USER_AGENT
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+"""
+This module is an asyncio alternative to 'client.request' for the SOAP
+Retrieve calls, so the windows of a stream can be in flight by the
+hundreds from one thread instead of a thread (and a suds client) each.
+
+The RetrieveRequest and ContinueRequest envelopes are built and the
+responses parsed the same way as 'tap_marketingcloud.soap_stream' does,
+so the records are the same dictionaries, but the requests go through a
+pooled 'aiohttp' session and the records are yielded by async generators.
+The requests are sent under the limits of 'governor.GOVERNOR', shared with
+the requests of the other threads.
+
+'aiohttp' is optional: install 'tap-marketingcloud[async]' to use it.
+"""
+
+LOGGER = singer.get_logger()
+
+# transient errors of a page request, with the ones of 'aiohttp'
+ASYNC_PAGE_RETRY_ERRORS = PAGE_RETRY_ERRORS + ((aiohttp.ClientConnectionError, aiohttp.ServerTimeoutError)
+                                               if aiohttp is not None else ())
+
+# the locks of the event loops waiting for a slot of the governor
+_ACQUIRE_LOCKS = weakref.WeakKeyDictionary()
+
+
+# create the session shared by the requests of an event loop, keeping
+# up to 'max_connections' connections alive, it must be called in the loop
+def create_session(max_connections, timeout=REQUEST_TIMEOUT):
+    if aiohttp is None:
+        raise Exception("The asynchronous client requires 'aiohttp', "
+                        "install it with 'pip install tap-marketingcloud[async]'.")
+
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=max_connections),
+        timeout=aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout),
+        headers={'Accept-Encoding': 'gzip, deflate'},
+        trust_env=True)
+
+
+# wait for a slot and a token of the governor, returning the ticket of the request,
+# one coroutine of the loop waits in the default executor at a time, the others
+# wait for it on the loop, so the windows in flight do not take a thread each
+async def _acquire():
+    loop = asyncio.get_running_loop()
+    lock = _ACQUIRE_LOCKS.setdefault(loop, asyncio.Lock())
+
+    async with lock:
+        future = loop.run_in_executor(None, GOVERNOR.acquire)
+
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # free the slot of the cancelled request once it is acquired
+            future.add_done_callback(lambda done: GOVERNOR.release(done.result(), failed=True))
+            raise
+
+
+# post 'envelope' and yield the results while the response body is downloaded,
+# the 'parser' holds the status of the page once all its results are yielded
+async def _retrieve_page(session, auth_stub, envelope, parser):
+    ticket = await _acquire()
+
+    try:
+        response = await session.post(auth_stub.soap_endpoint,
+                                      data=envelope,
+                                      headers={'Content-Type': 'text/xml; charset=utf-8',
+                                               'SOAPAction': '"Retrieve"',
+                                               'User-Agent': USER_AGENT})
+        # the fault of a failed response tells whether it was throttled
+        content = await response.read() if response.status != 200 else None
+    except BaseException as e:
+        GOVERNOR.release(ticket, throttled=is_congestion_error(e), failed=True)
+        raise
+
+    async with response:
+        if content is not None:
+            fault = read_fault(content)
+            GOVERNOR.release(ticket, throttled=is_throttled(response.status, fault), failed=True)
+            check_page(parser, response.status, fault)
+
+        GOVERNOR.release(ticket)
+
+        try:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                for result in parser.feed(chunk):
+                    yield result
+        except Exception as e:
+            # see 'soap_stream._retrieve_page'
+            if is_congestion_error(e):
+                GOVERNOR.congested(ticket)
+            raise
+
+        for result in parser.close():
+            yield result
+
+        status = response.status
+
+    check_page(parser, status)
+
+
+async def async_retrieve(name, session, auth_stub, object_type, props=None, search_filter=None,
+                         batch_size=2500, fields=None):
+    """
+    Same as `soap_stream.stream_retrieve` (and `client.request` for the
+    `fields`), but the requests are sent through the `session` (see
+    `create_session`) and the records are yielded by an async generator.
+    """
+    loop = asyncio.get_running_loop()
+
+    # the describe call and the token refresh are blocking, so they run on the
+    # default executor, the 'TokenManager' keeps the token fresh in the background
+    if props is None:
+        retrievable = await loop.run_in_executor(None, get_retrievable_props, auth_stub, object_type)
+        props = (fields and get_field_props(retrievable, fields)) or retrievable
+
+    continue_request = None
+    parser = None
+
+    # request the page of 'continue_request', as in 'soap_stream.stream_retrieve'
+    async def request_page():
+        nonlocal parser
+        await loop.run_in_executor(None, auth_stub.refresh_token)
+
+        envelope = build_retrieve_envelope(auth_stub,
+                                           object_type=object_type,
+                                           props=props,
+                                           search_filter=search_filter,
+                                           batch_size=batch_size,
+                                           continue_request=continue_request)
+        parser = RetrieveResponseParser()
+
+        async for item in _retrieve_page(session, auth_stub, envelope, parser):
+            yield item
+
+    while True:
+        count = 0
+
+        async for item in retry_streamed_page_async(request_page, ASYNC_PAGE_RETRY_ERRORS):
+            count += 1
+            yield item
+
+        LOGGER.info('Got %s results from %s endpoint.', count, name)
+
+        if parser.overall_status != 'MoreDataAvailable':
+            break
+
+        LOGGER.info("Getting more results from '{}' endpoint".format(name))
+        continue_request = parser.request_id
+
+    LOGGER.info("Done retrieving results from '{}' endpoint".format(name))
+
+
+class AsyncWindowFetcher():
+    """
+    Same as 'fetcher.WindowFetcher', but the windows are fetched by the
+    coroutine function 'fetch(window, session)' on one event loop instead
+    of a thread per window, so 'max_in_flight' can be much higher.
+
+    The loop runs on a background thread for the duration of 'run', with
+    one session (see 'create_session') shared by all the windows, and the
+    results are yielded to the (synchronous) caller in the order the
+    windows were generated, pulling the windows lazily.
+    """
+
+    def __init__(self, fetch, max_in_flight, timeout=REQUEST_TIMEOUT, session_factory=None):
+        self.fetch = fetch
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.session_factory = session_factory or create_session
+
+    async def _open(self):
+        return self.session_factory(self.max_in_flight, self.timeout)
+
+    # cancel the windows still in flight, then close the session and the executor
+    async def _close(self, session, executor):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        if session is not None:
+            await session.close()
+
+        # the threads are joined on a thread of their own, so the loop keeps running the
+        # callbacks of the calls still in the executor ('loop.shutdown_default_executor'
+        # is not in Python 3.8)
+        loop = asyncio.get_running_loop()
+        shutdown = loop.create_future()
+
+        def shutdown_executor():
+            executor.shutdown(wait=True)
+            loop.call_soon_threadsafe(shutdown.set_result, None)
+
+        threading.Thread(target=shutdown_executor, name='async-window-fetcher-shutdown').start()
+        await shutdown
+
+    # yield '(window, result)' for all the 'windows' in order
+    def run(self, windows):
+        windows = iter(windows)
+        loop = asyncio.new_event_loop()
+        # the executor of the blocking calls of the loop (see '_acquire'), shut down by '_close'
+        executor = ThreadPoolExecutor(thread_name_prefix='async-window-fetcher')
+        loop.set_default_executor(executor)
+        thread = threading.Thread(target=loop.run_forever, name='async-window-fetcher', daemon=True)
+        thread.start()
+
+        def submit(window):
+            return window, asyncio.run_coroutine_threadsafe(self.fetch(window, session), loop)
+
+        session = None
+        pending = collections.deque()
+
+        try:
+            session = asyncio.run_coroutine_threadsafe(self._open(), loop).result()
+
+            for window in itertools.islice(windows, self.max_in_flight):
+                pending.append(submit(window))
+
+            while pending:
+                window, future = pending.popleft()
+                result = future.result()
+
+                # refill the freed slot before handing the result over
+                for next_window in itertools.islice(windows, 1):
+                    pending.append(submit(next_window))
+
+                yield window, result
+
+        finally:
+            asyncio.run_coroutine_threadsafe(self._close(session, executor), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import threading
+import singer
+
+from tap_marketingcloud.util import read_json, write_json_atomic
+
+LOGGER = singer.get_logger()
+
+# the change detectors in use, by sidecar file
+DETECTORS = {}
+DETECTORS_LOCK = threading.Lock()
+
+
+# 8 bytes hash of a JSON value, as hex
+def _digest(value):
+    return hashlib.blake2b(json.dumps(value, sort_keys=True, default=str).encode('utf-8'),
+                           digest_size=8).hexdigest()
+
+
+class ChangeDetector():
+    """
+    Hashes of the records of the full-table streams written by the last
+    run, so only the records that are new or whose content changed are
+    written again.
+
+    The hashes are kept in the sidecar file 'path' as
+    {stream: {hash of the key properties: hash of the record}}, and the
+    ones of a stream are replaced by those of the current run once the
+    stream is synced; a failed sync keeps the previous ones.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.previous = read_json(path) or {}
+        self.current = {}
+
+    # whether the 'record' of 'stream' changed since the last run, the
+    # records without all the 'key_properties' are always changed
+    def changed(self, stream, key_properties, record):
+        if not key_properties or any(key not in record for key in key_properties):
+            return True
+
+        key = _digest([record[key] for key in key_properties])
+        content = _digest(record)
+
+        self.current.setdefault(stream, {})[key] = content
+
+        return self.previous.get(stream, {}).get(key) != content
+
+    # keep the hashes of the records of 'stream' seen by this run for the next one
+    def save(self, stream):
+        with self.lock:
+            self.previous[stream] = self.current.pop(stream, {})
+
+            try:
+                write_json_atomic(self.path, self.previous)
+            except OSError as e:
+                LOGGER.warning('Failed to write the change detection file %s: %s', self.path, e)
+
+
+# get the change detector of the config, shared by all the streams, None
+# when 'change_detection_path' is not set
+def get_change_detector(config):
+    path = config.get('change_detection_path')
+
+    if not path:
+        return None
+
+    with DETECTORS_LOCK:
+        if path not in DETECTORS:
+            DETECTORS[path] = ChangeDetector(path)
+
+        return DETECTORS[path]
@@ -1,14 +1,36 @@
 import FuelSDK
+import queue
 import singer
-
-from suds.transport.https import HttpAuthenticated
-from tap_marketingcloud.fuel_overrides import tap_marketingcloud__getMoreResults
+import threading
+
+from tap_marketingcloud.client_cache import ClientCache, AUTH_MODE_V1, AUTH_MODE_V2
+from tap_marketingcloud.fuel_overrides import tap_marketingcloud__getMoreResults, \
+    tap_marketingcloud__set_rest_session, tap_marketingcloud__set_client_cache
+from tap_marketingcloud.governor import GOVERNOR
+from tap_marketingcloud.page_retry import count_failed_request, retry_page, PAGE_RETRY_ERRORS
+from tap_marketingcloud.soap_stream import stream_retrieve, get_retrievable_props
+from tap_marketingcloud.token_manager import TokenManager
+from tap_marketingcloud.transport import get_session, PooledTransport, RestSession, HTTP_POOL_SIZE
+from tap_marketingcloud.util import get_bool, get_positive_int
 
 LOGGER = singer.get_logger()
 
 # default request timeout
 REQUEST_TIMEOUT = 300
 
+# seconds the read-ahead thread waits for a free slot before checking
+# whether the consumer has gone away
+READ_AHEAD_POLL_INTERVAL = 1
+
+# make the page request 'call' (e.g. 'cursor.get') under the limits of the
+# 'GOVERNOR', retrying it on transient errors and throttles: the continuation
+# of a request uses the 'last_request_id' of the cursor, which only moves on
+# a successful page, so the retry requests the same page again instead of
+# the stream starting over
+@retry_page
+def request_page(call, *args, **kwargs):
+    return GOVERNOR.call(call, *args, **kwargs)
+
 
 # prints the number of records fetched from the passed endpoint
 def _get_response_items(response, name):
@@ -21,7 +43,25 @@ def _get_response_items(response, name):
     return items
 
 
-__all__ = ['get_auth_stub', 'request', 'request_from_cursor']
+# set the pooled transport with the request timeout on the SOAP client of the 'auth_stub'
+def _set_transport(auth_stub, session, request_timeout):
+    transport = PooledTransport(session, timeout=request_timeout)
+    auth_stub.soap_client.set_options(
+        transport=transport)
+    # used by the requests made outside of suds, see 'request_stream'
+    auth_stub.session = session
+    auth_stub.request_timeout = request_timeout
+
+
+# refresh the token of the 'auth_stub' in the background, the SOAP client
+# built by FuelSDK on every refresh gets the transport of the 'auth_stub'
+# before it is set on it, see 'fuel_overrides.tap_marketingcloud__set_client_cache'
+def _manage_token(auth_stub):
+    TokenManager(auth_stub).start()
+    return auth_stub
+
+
+__all__ = ['get_auth_stub', 'request', 'request_from_cursor', 'request_stream']
 
 
 # PUBLIC FUNCTIONS
@@ -59,23 +99,46 @@ def get_auth_stub(config):
     else:
         request_timeout = REQUEST_TIMEOUT
 
-    # First try V1
-    try:
-        LOGGER.info('Trying to authenticate using V1 endpoint')
-        params['useOAuth2Authentication'] = "False"
-        auth_stub = FuelSDK.ET_Client(params=params)
+    # keep-alive connections shared by all the SOAP and REST requests
+    pool_size = get_positive_int(config, 'http_pool_size', HTTP_POOL_SIZE)
+    session = get_session(pool_size, get_bool(config, 'http_compression', True))
+    tap_marketingcloud__set_rest_session(RestSession(session, request_timeout))
 
-        transport = HttpAuthenticated(timeout=request_timeout)
-        auth_stub.soap_client.set_options(
-            transport=transport)
-        LOGGER.info("Success.")
-        return auth_stub
-    except Exception as e:
-        LOGGER.info('Failed to auth using V1 endpoint')
-        if not config.get('tenant_subdomain'):
-            LOGGER.warning('No tenant_subdomain found, will not attempt to auth with V2 endpoint')
-            message = "{}. Please check your \'client_id\', \'client_secret\' or try adding the \'tenant_subdomain\'."
-            raise Exception(message.format(str(e))) from None
+    # limits of the requests shared by all the streams, see 'governor.RateGovernor',
+    # by default as many requests are in flight as there are pooled connections
+    GOVERNOR.configure(rate=float(config.get('max_requests_per_second') or 0),
+                       max_concurrency=get_positive_int(config, 'max_concurrent_requests', pool_size))
+
+    # the WSDL, the parsed SOAP clients and the authentication modes, kept
+    # from one run to the next in 'client_cache_path', see 'ClientCache'
+    client_cache = ClientCache.from_config(config)
+    tap_marketingcloud__set_client_cache(client_cache)
+
+    if client_cache.wsdl_path():
+        params['wsdl_file_local_loc'] = client_cache.wsdl_path()
+
+    auth_mode = client_cache.get_auth_mode(config.get('tenant_subdomain'), config['client_id'])
+
+    # First try V1, unless the tenant authenticated using V2 in an earlier
+    # run: the V1 attempt only fails for the S10+ tenants
+    if auth_mode == AUTH_MODE_V2:
+        LOGGER.info('Skipping V1 endpoint, the last run authenticated using V2 endpoint')
+    else:
+        try:
+            LOGGER.info('Trying to authenticate using V1 endpoint')
+            params['useOAuth2Authentication'] = "False"
+            auth_stub = FuelSDK.ET_Client(params=params)
+
+            _set_transport(auth_stub, session, request_timeout)
+            client_cache.set_auth_mode(config.get('tenant_subdomain'), config['client_id'], AUTH_MODE_V1)
+            LOGGER.info("Success.")
+            return _manage_token(auth_stub)
+        except Exception as e:
+            LOGGER.info('Failed to auth using V1 endpoint')
+            if not config.get('tenant_subdomain'):
+                LOGGER.warning('No tenant_subdomain found, will not attempt to auth with V2 endpoint')
+                message = "{}. Please check your \'client_id\', \'client_secret\' or try adding the \'tenant_subdomain\'."
+                raise Exception(message.format(str(e))) from None
 
     # Next try V2
     # Move to OAuth2: https://help.salesforce.com/articleView?id=mc_rn_january_2019_platform_ip_remove_legacy_package_create_ability.htm&type=5
@@ -87,26 +150,48 @@ def get_auth_stub(config):
         LOGGER.info("Authentication URL is: %s", params['authenticationurl'])
         auth_stub = FuelSDK.ET_Client(params=params)
 
-        transport = HttpAuthenticated(timeout=request_timeout)
-        auth_stub.soap_client.set_options(
-            transport=transport)
+        _set_transport(auth_stub, session, request_timeout)
+        client_cache.set_auth_mode(config.get('tenant_subdomain'), config['client_id'], AUTH_MODE_V2)
     except Exception as e:
         LOGGER.info('Failed to auth using V2 endpoint')
+        # the next run tries V1 first again
+        client_cache.set_auth_mode(config.get('tenant_subdomain'), config['client_id'], None)
         message = "{}. Please check your \'client_id\', \'client_secret\' or \'tenant_subdomain\'."
         raise Exception(message.format(str(e))) from None
 
     LOGGER.info("Success.")
-    return auth_stub
+    return _manage_token(auth_stub)
 
 
-def request(name, selector, auth_stub, search_filter=None, props=None, batch_size=2500):
+# get the retrievable properties (in the order of 'retrievable') the 'fields'
+# of the records are read from: a field is retrievable itself (e.g. 'Email.ID'),
+# is part of a retrievable property ('Link.URL' of 'Link') or is made of
+# retrievable properties ('Client' of 'Client.ID'), None if no field is retrievable
+def get_field_props(retrievable, fields):
+    fields = set(fields)
+
+    props = [prop for prop in retrievable
+             if prop in fields
+             or any(field.startswith(prop + '.') or prop.startswith(field + '.') for field in fields)]
+
+    return props or None
+
+
+def request(name, selector, auth_stub, search_filter=None, props=None, batch_size=2500, prefetch=0,
+            streaming=False, fields=None):
     """
     Given an object name (`name`), used for logging purposes only,
       a `selector`, for example FuelSDK.ET_ClickEvent,
       an `auth_stub`, generated by `get_auth_stub`,
       an optional `search_filter`,
-      and an optional set of `props` (properties), which specifies the fields
+      an optional set of `props` (properties), which specifies the fields
         to be returned from this object,
+      or else an optional list of the `fields` the records are read from
+        (e.g. 'Email.ID'), to return only the retrievable properties
+        needed for them instead of all of them, see `get_field_props`,
+      an optional number of pages to `prefetch`, see `request_from_cursor`,
+      and an optional `streaming` flag to parse the SOAP responses while they
+        are downloaded instead of using FuelSDK, see `tap_marketingcloud.soap_stream`,
 
     ... request data from the ExactTarget API using FuelSDK. This function
     returns a generator that will yield all the records returned by the
@@ -123,6 +208,14 @@ def request(name, selector, auth_stub, search_filter=None, props=None, batch_siz
     """
     cursor = selector()
     cursor.auth_stub = auth_stub
+
+    if props is None and fields:
+        props = get_field_props(get_retrievable_props(auth_stub, cursor.obj_type), fields)
+
+    if streaming:
+        return request_stream(name, cursor.obj_type, auth_stub, search_filter,
+                              props=props, batch_size=batch_size)
+
     # set batch size ie. the page size defined by the user as the
     # FuelSDK supports setting page size in the "BatchSize" value in "options" parameter
     cursor.options = {"BatchSize": batch_size}
@@ -142,24 +235,29 @@ def request(name, selector, auth_stub, search_filter=None, props=None, batch_siz
             "Making RETRIEVE call to '{}' endpoint with no filters."
             .format(name))
 
-    return request_from_cursor(name, cursor, batch_size)
+    return request_from_cursor(name, cursor, batch_size, prefetch=prefetch)
 
 
-def request_from_cursor(name, cursor, batch_size):
+def request_stream(name, object_type, auth_stub, search_filter=None, props=None, batch_size=2500):
     """
-    Given an object name (`name`), used for logging purposes only, and a
-    `cursor` provided by FuelSDK, return a generator that yields all the
-    items in that cursor.
-
-    Primarily used internally by `request`, but can be used if cursors have
-    to be customized. See tap_marketingcloud.endpoints.data_extensions for
-    an example.
+    Same as `request`, but for the SOAP `object_type` (for example
+    'ClickEvent' or 'DataExtensionObject[name]'), and the responses are
+    parsed while they are downloaded, see `tap_marketingcloud.soap_stream`.
+    The records are yielded as dictionaries.
     """
-    response = cursor.get()
+    LOGGER.info(
+        "Making streaming RETRIEVE call to '{}' endpoint with filters '{}'."
+        .format(name, search_filter))
+
+    return stream_retrieve(name, auth_stub, object_type,
+                           props=props,
+                           search_filter=search_filter,
+                           batch_size=batch_size,
+                           timeout=getattr(auth_stub, 'request_timeout', REQUEST_TIMEOUT))
 
-    for item in _get_response_items(response, name):
-        yield item
 
+# generator that yields the continuation pages of 'response'
+def _get_more_pages(name, cursor, batch_size, response):
     while response.more_results:
         # __import__('pdb').set_trace()
         LOGGER.info("Getting more results from '{}' endpoint".format(name))
@@ -169,18 +267,125 @@ def request_from_cursor(name, cursor, batch_size):
         if isinstance(cursor, FuelSDK.ET_Campaign) or isinstance(cursor, FuelSDK.ET_Asset):
             # use 'getMoreResults' for campaigns as it does not use
             # batch_size, rather it uses $page and $pageSize and REST Call
-            response = cursor.getMoreResults()
+            response = request_page(cursor.getMoreResults)
         else:
             # Override call to getMoreResults to add a batch_size parameter
             # response = cursor.getMoreResults()
-            response = tap_marketingcloud__getMoreResults(cursor, batch_size=batch_size)
+            response = request_page(tap_marketingcloud__getMoreResults, cursor, batch_size=batch_size)
 
         if response.code != 200:
             LOGGER.info("Response details: %s", response.__dict__)
             raise RuntimeError("Request failed with '{}'"
                                .format(response.message))
 
+        yield response
+
+
+class _ReadAhead():
+    """
+    Pulls the pages of 'pages' on a background thread, keeping at most
+    'depth' pages that are fetched but not yet consumed, and hands them
+    over in order when iterated. An error raised while fetching a page is
+    raised to the consumer in place of that page.
+    """
+
+    _DONE = object()
+
+    def __init__(self, pages, depth):
+        self.pages = pages
+        self.queue = queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=READ_AHEAD_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            for page in self.pages:
+                if not self._put((page, None)):
+                    return
+        except Exception as e:  # pylint: disable=broad-except
+            self._put((None, e))
+            return
+
+        self._put((self._DONE, None))
+
+    def __iter__(self):
+        while True:
+            page, error = self.queue.get()
+
+            if error is not None:
+                raise error
+
+            if page is self._DONE:
+                return
+
+            yield page
+
+    # stop fetching when the consumer does not need more pages
+    def close(self):
+        self.stopped.set()
+
+
+def request_from_cursor(name, cursor, batch_size, prefetch=0):
+    """
+    Given an object name (`name`), used for logging purposes only, and a
+    `cursor` provided by FuelSDK, return a generator that yields all the
+    items in that cursor.
+
+    With `prefetch` set, up to that many continuation pages are fetched on a
+    background thread while the caller works through the current page.
+    Errors are raised at the same point as without read-ahead.
+
+    Every page (the first Retrieve and each ContinueRequest) is retried on
+    its own on transient errors, see `request_page`.
+
+    Primarily used internally by `request`, but can be used if cursors have
+    to be customized. See tap_marketingcloud.endpoints.data_extensions for
+    an example.
+    """
+    pages_count = 0
+    records_count = 0
+
+    try:
+        response = request_page(cursor.get)
+    except PAGE_RETRY_ERRORS as e:
+        count_failed_request(e, pages_count, records_count)
+        raise
+
+    pages = _get_more_pages(name, cursor, batch_size, response)
+    read_ahead = None
+
+    if prefetch and response.more_results:
+        read_ahead = _ReadAhead(pages, prefetch)
+        pages = iter(read_ahead)
+
+    try:
+        pages_count += 1
         for item in _get_response_items(response, name):
+            records_count += 1
             yield item
 
+        for response in pages:
+            pages_count += 1
+            for item in _get_response_items(response, name):
+                records_count += 1
+                yield item
+
+    except PAGE_RETRY_ERRORS as e:
+        count_failed_request(e, pages_count, records_count)
+        raise
+
+    finally:
+        if read_ahead is not None:
+            read_ahead.close()
+
     LOGGER.info("Done retrieving results from '{}' endpoint".format(name))
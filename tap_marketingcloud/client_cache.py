@@ -0,0 +1,165 @@
+import hashlib
+import os
+import pickle
+import threading
+import singer
+import suds.cache
+import suds.client
+
+from tap_marketingcloud.util import read_json, write_json_atomic
+
+LOGGER = singer.get_logger()
+
+# days a parsed WSDL is kept on disk, it is keyed by the hash of the WSDL so
+# it is never stale, the duration only bounds what an unused WSDL takes
+PARSED_WSDL_CACHE_DAYS = 30
+
+WSDL_FILE_NAME = 'ExactTargetWSDL.xml'
+AUTH_MODES_FILE_NAME = 'auth_modes.json'
+
+# the authentication modes of 'client.get_auth_stub'
+AUTH_MODE_V1 = 'V1'
+AUTH_MODE_V2 = 'V2'
+
+
+# the path of the local WSDL file of the 'file:' URL built by FuelSDK ('ET_Client.load_wsdl')
+def _get_wsdl_path(wsdl_url):
+    if wsdl_url.startswith('file:///'):
+        return wsdl_url[len('file:///'):]
+    return None
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as wsdl_file:
+        for chunk in iter(lambda: wsdl_file.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class _RunCache(suds.cache.Cache):
+    """
+    suds cache keeping the objects (the parsed WSDL) in memory for the
+    run, on top of the 'persistent' cache they are loaded from the first time.
+
+    The first 'get' returns the object itself, the next ones a copy: suds
+    points the cached WSDL to the options of the client opening it, so a
+    WSDL shared by the clients would build the messages of the earlier
+    clients with the options (e.g. the SOAP headers) of the latest one.
+    """
+
+    def __init__(self, persistent):
+        self.persistent = persistent
+        self.objects = {}
+
+    def get(self, id):  # pylint: disable=redefined-builtin
+        if id not in self.objects:
+            self.objects[id] = self.persistent.get(id)
+            return self.objects[id]
+
+        return self._copy(self.objects[id])
+
+    def put(self, id, object):  # pylint: disable=redefined-builtin
+        self.objects[id] = object
+        self.persistent.put(id, object)
+
+    # a copy of the WSDL, pickled as the 'ObjectCache' does (without its options)
+    @staticmethod
+    def _copy(object):  # pylint: disable=redefined-builtin
+        if object is None:
+            return None
+        return pickle.loads(pickle.dumps(object, pickle.HIGHEST_PROTOCOL))
+
+    def purge(self, id):  # pylint: disable=redefined-builtin
+        self.objects.pop(id, None)
+        self.persistent.purge(id)
+
+    def clear(self):
+        self.objects.clear()
+        self.persistent.clear()
+
+
+class ClientCache():
+    """
+    What 'client.get_auth_stub' sets up before the first request, kept from
+    one run to the next in the directory 'path' ('client_cache_path' in the
+    config), or for the duration of the run only when 'path' is None:
+
+    - the ExactTarget WSDL, downloaded once by FuelSDK (see 'wsdl_path'),
+    - the WSDL parsed by suds, kept in memory for the SOAP clients FuelSDK
+      builds on every token refresh (each one getting a copy of it), and
+      pickled under 'path' by the suds 'ObjectCache' keyed by the SOAP
+      endpoint and the hash of the WSDL, so a new WSDL is parsed again,
+    - the authentication mode (V1 or V2) each tenant succeeded with, so
+      the V1 attempt that fails for the S10+ tenants is not made again.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        # suds caches of the parsed WSDL, by SOAP endpoint and WSDL URL
+        self.caches = {}
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('client_cache_path') or None)
+
+    # the local WSDL file FuelSDK downloads the WSDL to, None for its default location
+    def wsdl_path(self):
+        if self.path is None:
+            return None
+        return os.path.join(self.path, WSDL_FILE_NAME)
+
+    # the suds cache of the WSDL parsed for 'endpoint', on disk under a directory
+    # of its own so a new WSDL (or endpoint) never loads an old pickle, else
+    # the default cache of suds (a day in the temporary directory) FuelSDK uses
+    def _get_persistent_cache(self, wsdl_url, endpoint):
+        wsdl_path = _get_wsdl_path(wsdl_url)
+
+        if self.path is None or wsdl_path is None:
+            return suds.cache.ObjectCache(days=1)
+
+        key = hashlib.sha256('{}\n{}'.format(endpoint, _hash_file(wsdl_path)).encode('utf-8')).hexdigest()
+        return suds.cache.ObjectCache(os.path.join(self.path, 'suds', key[:32]), days=PARSED_WSDL_CACHE_DAYS)
+
+    def get_client(self, wsdl_url, endpoint):
+        """
+        Return a new suds client of the WSDL at `wsdl_url`, with the options
+        FuelSDK builds its clients with, the WSDL is parsed (or loaded from
+        the disk) once in the run.
+        """
+        with self.lock:
+            cache = self.caches.get((endpoint, wsdl_url))
+
+            if cache is None:
+                cache = _RunCache(self._get_persistent_cache(wsdl_url, endpoint))
+                self.caches[(endpoint, wsdl_url)] = cache
+
+            return suds.client.Client(wsdl_url, faults=False, cachingpolicy=1, cache=cache)
+
+    def _auth_modes_path(self):
+        return os.path.join(self.path, AUTH_MODES_FILE_NAME)
+
+    # the authentication mode the 'tenant' (with the 'client_id') last succeeded with
+    def get_auth_mode(self, tenant, client_id):
+        if self.path is None or not tenant:
+            return None
+
+        return (read_json(self._auth_modes_path()) or {}).get('{}/{}'.format(tenant, client_id))
+
+    def set_auth_mode(self, tenant, client_id, auth_mode):
+        if self.path is None or not tenant:
+            return
+
+        with self.lock:
+            auth_modes = read_json(self._auth_modes_path()) or {}
+            key = '{}/{}'.format(tenant, client_id)
+
+            if auth_modes.get(key) != auth_mode:
+                auth_modes[key] = auth_mode
+                write_json_atomic(self._auth_modes_path(), auth_modes)
@@ -3,13 +3,18 @@ import socket
 import functools
 import requests
 import singer
-import os
+import json
 import urllib
-from singer import metadata, Transformer, utils
+from singer import metadata
 
-from funcy import project
-
-from tap_marketingcloud.util import sudsobj_to_dict
+from tap_marketingcloud.pagination import date_windows, AdaptiveWindow, ADAPTIVE_MIN_SECONDS, ADAPTIVE_MAX_SECONDS
+from tap_marketingcloud.schema_registry import get_schema, REGISTRY
+from tap_marketingcloud.transform import compile_transformer, get_filtered_fields
+from tap_marketingcloud.state import OUTPUT_LOCK, BookmarkTracker, CheckpointPolicy, save_state, \
+    get_window_size, set_window_size
+from tap_marketingcloud.util import sudsobj_to_dict, sudsobj_to_record, get_bool, get_positive_int
+from tap_marketingcloud.window_cache import get_window_cache
+from tap_marketingcloud.change_detection import get_change_detector
 
 LOGGER = singer.get_logger()
 
@@ -18,28 +23,15 @@ def _get_catalog_schema(catalog):
     return catalog.get('schema', {}).get('properties')
 
 
-def get_abs_path(path):
-    return os.path.join(os.path.dirname(os.path.realpath(__file__)), path)
-
-
-# function to load the fields in the 'definitions' which contains the reference fields
+# function to load the fields in the 'definitions' which contains the reference fields,
+# the schemas of the streams are read (and resolved) by 'schema_registry.REGISTRY'
 def load_schema_references():
-    shared_schema_path = get_abs_path('schemas/definitions.json')
-
-    refs = {}
-    # load json from the path
-    refs["definitions.json"] = utils.load_json(shared_schema_path)
+    return REGISTRY.load_references()
 
-    return refs
 
-
-# function to load schema from json file
+# function to load schema from json file, without resolving the references
 def load_schema(stream):
-    path = get_abs_path('schemas/{}s.json'.format(stream))
-    # load json from the path
-    schema = utils.load_json(path)
-
-    return schema
+    return REGISTRY.load_schema(stream)
 
 
 # boolean function to check if the error is 'timeout' error or not
@@ -54,15 +46,25 @@ def is_timeout_error(e):
     return True
 
 
-# decorator for retrying on error
+# the errors of the page requests whose retries are exhausted (see
+# 'client.request_page') do not sync the stream again from the start
+def is_page_retries_exhausted(e):
+    return getattr(e, 'page_retries_exhausted', False)
+
+
+# decorator for retrying on error, the last resort as the pages are
+# retried on their own by 'client.request_from_cursor'
 def exacttarget_error_handling(fnc):
     @backoff.on_exception(backoff.expo,
                           urllib.error.URLError,    # backoff 'timeout' error for SOAP API
-                          giveup=is_timeout_error,
+                          giveup=lambda e: is_timeout_error(e) or is_page_retries_exhausted(e),
                           max_tries=8,
                           factor=2)
     @backoff.on_exception(backoff.expo,
-                          (socket.timeout, ConnectionError, requests.Timeout),
+                          (socket.timeout, ConnectionError, requests.Timeout,
+                           # the connection errors of the calls sent through 'requests'
+                           requests.ConnectionError, requests.exceptions.ChunkedEncodingError),
+                          giveup=is_page_retries_exhausted,
                           max_tries=8,
                           factor=2)
     @functools.wraps(fnc)
@@ -73,26 +75,88 @@ def exacttarget_error_handling(fnc):
 
 class DataAccessObject():
 
+    # days of the lookback before the bookmark, synced again for the records
+    # arriving late (see 'get_last_record_value_for_table'), not cached
+    DELAY_IN_DAY = 1
+
     def __init__(self, config, state, auth_stub, catalog):
         self.config = config.copy()
         self.state = state.copy()
         self.catalog = catalog
         self.auth_stub = auth_stub
         # initialize batch size
-        self.batch_size = int(self.config.get('batch_size', 2500))
+        self.batch_size = self.get_batch_size()
+        # number of continuation pages fetched ahead of the consumer, 0 disables read-ahead
+        self.prefetch_pages = get_positive_int(self.config, 'prefetch_pages', 0)
+        # parse the SOAP responses of the bulk streams while they are downloaded
+        self.streaming_retrieve = get_bool(self.config, 'streaming_retrieve')
+        # run-wide state the bookmarks are merged into, set by the
+        # 'StreamScheduler' when streams are synced concurrently
+        self.merged_state = None
+        # latest replication key values of the records written since the last checkpoint
+        self.bookmark_tracker = BookmarkTracker()
+        # which checkpoints emit a STATE message, see 'checkpoint_interval_*' in the config
+        self.checkpoint_policy = CheckpointPolicy.from_config(self.config)
+        # on-disk cache of the windows already requested, None when disabled
+        self.window_cache = get_window_cache(self.config)
+        # hashes of the records written by the last run, only the changed
+        # records of the full-table streams are written when enabled
+        self.change_detector = get_change_detector(self.config) \
+            if self.REPLICATION_METHOD == 'FULL_TABLE' else None
+        # 'ResultCache' of the requests shared with the other streams of the run, set by 'do_sync'
+        self.result_cache = None
+        # transformers compiled for the streams written by this accessor, by table
+        self.transformers = {}
+        # catalog keys used to project the records, see 'get_projection_keys'
+        self._projection_keys = None
+        self._projection_catalog = None
 
     @classmethod
     def matches_catalog(cls, catalog):
         return catalog.get('stream') == cls.TABLE
 
+    # the server-side filter expression of the stream, 'filters__<stream>' in
+    # the config, as JSON or a JSON string, None if not set
+    def get_filter_expression(self):
+        expression = self.config.get('filters__{}'.format(self.TABLE))
+
+        if isinstance(expression, str):
+            expression = json.loads(expression) if expression else None
+
+        return expression
+
+    # the query parameters added to the requests of the REST streams,
+    # from the filter expression of the stream (a JSON object)
+    def get_filter_params(self):
+        expression = self.get_filter_expression() or {}
+
+        if not isinstance(expression, dict):
+            raise ValueError("'filters__{}' must be an object of query parameters.".format(self.TABLE))
+
+        return expression
+
+    # the result of a request shared with the other streams of the run, see
+    # 'ResultCache', 'fetch()' is called directly when there is no cache
+    def get_shared_result(self, key, fetch):
+        if self.result_cache is None:
+            return fetch()
+
+        return self.result_cache.get(key, fetch)
+
+    # get the page size of the stream, 'batch_size__<stream>' (e.g.
+    # 'batch_size__subscriber') overrides 'batch_size' for one stream
+    def get_batch_size(self, stream=None):
+        batch_size = int(self.config.get('batch_size', 2500))
+        return get_positive_int(self.config,
+                                'batch_size__{}'.format(stream or self.TABLE),
+                                batch_size)
+
     # generate schema and metadata for adding in catalog file
     def generate_catalog(self):
         cls = self.__class__
 
-        # get the reference schemas
-        refs = load_schema_references()
-        # resolve the schema reference and make final schema
-        schema = singer.resolve_schema_references(load_schema(cls.TABLE), refs)
+        # get the schema with the references resolved, loaded once per process
+        schema = get_schema(cls.TABLE, self.config.get('schema_cache_path'))
         mdata = metadata.new()
 
         # use 'get_standard_metadata' with primary key, replication key and replication method
@@ -115,32 +179,141 @@ class DataAccessObject():
             'metadata': metadata.to_list(mdata_map)
         }]
 
-    # convert suds object to dictionary
+    # convert suds object to dictionary, reading only the fields written
+    # for the stream straight off the object
     def filter_keys_and_parse(self, obj):
-        to_return = sudsobj_to_dict(obj)
-
-        return self.parse_object(to_return)
+        return self.parse_object(obj)
 
     # get the list for keys present in the schema
     def get_catalog_keys(self):
         return list(
             self.catalog.get('schema', {}).get('properties', {}).keys())
 
+    # get the keys of the records, computed once per catalog as it is called for
+    # every record: the fields which are not selected are skipped as the Transformer
+    # removes them anyway, but the primary and replication keys are always kept
+    def get_projection_keys(self):
+        if self._projection_keys is None or self._projection_catalog is not self.catalog:
+            filtered = get_filtered_fields(metadata.to_map(self.catalog.get('metadata') or []))
+            required = set(self.KEY_PROPERTIES or []) | set(self.REPLICATION_KEYS or [])
+
+            self._projection_keys = tuple(key for key in self.get_catalog_keys()
+                                          if key not in filtered or key in required)
+            self._projection_catalog = self.catalog
+
+        return self._projection_keys
+
+    # get the properties of the SOAP objects the projection keys are read from
+    # (e.g. 'Email.ID' for the derived 'EmailID'), so only those are requested
+    def get_request_fields(self):
+        return [
+            '.'.join(self.DERIVED_FIELDS[key][0]) if key in self.DERIVED_FIELDS else key
+            for key in self.get_projection_keys()]
+
+    # convert the suds object (or dictionary) 'obj' to a record
+    # with the projection keys and the 'DERIVED_FIELDS'
     def parse_object(self, obj):
-        return project(obj, self.get_catalog_keys())
+        return sudsobj_to_record(obj, self.get_projection_keys(), self.DERIVED_FIELDS)
+
+    # a function to write records by applying transformation, the
+    # transformer of a table is compiled from its catalog on first use
+    def write_records_with_transform(self, record, catalog, table):
+        transformer = self.transformers.get(table)
+
+        if transformer is None:
+            transformer = compile_transformer(catalog)
+            self.transformers[table] = transformer
+
+        rec = transformer.transform(record)
 
-    # a function to write records by applying transformation
-    @staticmethod
-    def write_records_with_transform(record, catalog, table):
-        with Transformer() as transformer:
-            rec = transformer.transform(record, catalog.get('schema'), metadata.to_map(catalog.get('metadata')))
+        if self.change_detector is not None and \
+                not self.change_detector.changed(table, self.KEY_PROPERTIES, rec):
+            return
+
+        with OUTPUT_LOCK:
             singer.write_record(table, rec)
 
+        self.checkpoint_policy.record()
+
     def write_schema(self):
-        singer.write_schema(
-            self.catalog.get('stream'),
-            self.catalog.get('schema'),
-            key_properties=self.catalog.get('key_properties'))
+        with OUTPUT_LOCK:
+            singer.write_schema(
+                self.catalog.get('stream'),
+                self.catalog.get('schema'),
+                key_properties=self.catalog.get('key_properties'))
+
+    # write the state message for the records written so far, unless the
+    # 'checkpoint_policy' holds it back ('force' always writes it)
+    def checkpoint(self, force=False):
+        self.state = self.bookmark_tracker.write(self.state)
+
+        if not self.checkpoint_policy.should_emit(force):
+            return
+
+        if self.merged_state is not None:
+            self.merged_state.save(self.state)
+        else:
+            save_state(self.state)
+
+    # get the records of the window of 'stream' with 'search_filter' ending at
+    # 'end', returned by 'fetch' or replayed from the window cache when enabled
+    def fetch_window(self, stream, search_filter, end, fetch, props=None):
+        if self.window_cache is None:
+            return fetch()
+
+        return self.window_cache.get_or_fetch(
+            stream, search_filter, end,
+            lambda: [sudsobj_to_dict(obj) for obj in fetch()],
+            props=props,
+            refresh_seconds=self.get_refresh_seconds())
+
+    # same as 'fetch_window', for the coroutine function 'fetch' of the
+    # asynchronous client (returning the records as dictionaries)
+    async def fetch_window_async(self, stream, search_filter, end, fetch, props=None):
+        if self.window_cache is None:
+            return await fetch()
+
+        refresh_seconds = self.get_refresh_seconds()
+        records = self.window_cache.get(stream, search_filter, end, props, refresh_seconds)
+
+        if records is None:
+            records = await fetch()
+            self.window_cache.put(stream, search_filter, end, records, props, refresh_seconds)
+
+        return records
+
+    # the windows of the lookback can still receive records, so they are always requested again
+    def get_refresh_seconds(self):
+        return self.DELAY_IN_DAY * 24 * 60 * 60
+
+    # return the date window of 'table' starting from the configured 'unit',
+    # sized adaptively when 'pagination__adaptive' is set in the config
+    def get_window(self, table, unit):
+        adaptive = get_bool(self.config, 'pagination__adaptive')
+
+        return AdaptiveWindow(
+            unit,
+            self.batch_size,
+            adaptive=adaptive,
+            min_seconds=get_positive_int(self.config, 'pagination__adaptive_min_seconds', ADAPTIVE_MIN_SECONDS),
+            max_seconds=get_positive_int(self.config, 'pagination__adaptive_max_seconds', ADAPTIVE_MAX_SECONDS),
+            seconds=get_window_size(self.state, table) if adaptive else None)
+
+    # yield the date windows of 'pagination.date_windows', with the window cache
+    # on the grid of the windows starting at 'start_date', so the windows of a sync
+    # started from a later bookmark are the ones cached by the earlier syncs
+    def get_date_windows(self, field, start, end_date, window):
+        anchor = self.config.get('start_date') if self.window_cache is not None else None
+
+        return date_windows(field, start, end_date, window, anchor=anchor)
+
+    # resize the 'window' of 'table' after a window of 'count' records and
+    # keep the new size in the state for the next run
+    def observe_window(self, table, window, count):
+        window.observe(count)
+
+        if window.adaptive:
+            self.state = set_window_size(self.state, table, window.seconds)
 
     # main 'sync' function
     def sync(self):
@@ -156,7 +329,23 @@ class DataAccessObject():
 
         self.write_schema()
 
-        return self.sync_data()
+        result = self.sync_data()
+
+        for table, transformer in self.transformers.items():
+            transformer.log_removed(table)
+
+        # the hashes of the records of this run are compared by the next one
+        if self.change_detector is not None:
+            self.change_detector.save(self.catalog.get('stream'))
+
+        # the records written after the last checkpoint
+        self.state = self.bookmark_tracker.write(self.state)
+
+        # emit the last checkpoint held back by the 'checkpoint_policy'
+        if self.checkpoint_policy.pending:
+            self.checkpoint(force=True)
+
+        return result
 
     # OVERRIDE THESE TO IMPLEMENT A NEW DAO:
 
@@ -164,6 +353,9 @@ class DataAccessObject():
     KEY_PROPERTIES = None
     REPLICATION_KEYS = []
     REPLICATION_METHOD = None
+    # fields read from a nested path of the object, as
+    # {field: (path, default)}, e.g. {'EmailID': (['Email', 'ID'], None)}
+    DERIVED_FIELDS = {}
 
     # function to be overridden by the respective stream files and implement sync
     def sync_data(self):  # pylint: disable=no-self-use
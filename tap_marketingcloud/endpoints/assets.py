@@ -4,8 +4,7 @@ import singer
 
 from tap_marketingcloud.client import request
 from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling)
-from tap_marketingcloud.state import incorporate, save_state, \
-    get_last_record_value_for_table
+from tap_marketingcloud.state import get_last_record_value_for_table
 
 
 LOGGER = singer.get_logger()
@@ -32,17 +31,15 @@ class AssetDataAccessObject(DataAccessObject):
             'Asset',
             FuelSDK.ET_Asset,
             self.auth_stub,
-            props={"$pageSize": 50, "$page": 1, "page": 1, "$filter": filter, "$orderBy": "modifiedDate asc"})
+            props={"$pageSize": 50, "$page": 1, "page": 1, "$filter": filter, "$orderBy": "modifiedDate asc"},
+            prefetch=self.prefetch_pages)
 
         catalog_copy = copy.deepcopy(self.catalog)
 
         for asset in cursor:
             asset = self.filter_keys_and_parse(asset)
-            self.state = incorporate(self.state,
-                                     table,
-                                     'modifiedDate',
-                                     asset.get('modifiedDate'))
+            self.bookmark_tracker.observe(table, 'modifiedDate', asset.get('modifiedDate'))
 
             self.write_records_with_transform(asset, catalog_copy, table)
 
-        save_state(self.state)
+        self.checkpoint()
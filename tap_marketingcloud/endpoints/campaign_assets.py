@@ -4,9 +4,15 @@ import singer
 
 from tap_marketingcloud.client import request
 from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling)
+from tap_marketingcloud.endpoints.campaigns import get_campaigns
+from tap_marketingcloud.fetcher import WindowFetcher
+from tap_marketingcloud.util import get_positive_int
 
 LOGGER = singer.get_logger()
 
+# default number of campaigns whose assets are requested at the same time
+MAX_CONCURRENT_CAMPAIGN_ASSET_REQUESTS = 1
+
 
 class CampaignAssetDataAccessObject(DataAccessObject):
 
@@ -14,29 +20,33 @@ class CampaignAssetDataAccessObject(DataAccessObject):
     KEY_PROPERTIES = ['id']
     REPLICATION_METHOD = 'FULL_TABLE'
 
-    @exacttarget_error_handling
-    def sync_data(self):
-        cursor = request(
-            'Campaign',
-            FuelSDK.ET_Campaign,
+    # get all the assets of the 'campaign'
+    def _get_campaign_assets(self, campaign):
+        return list(request(
+            'Campaign Assets',
+            FuelSDK.ET_Campaign_Asset,
             self.auth_stub,
             # use $pageSize and $page in the props for
             # this stream as it calls using REST API
-            props={"$pageSize": self.batch_size, "$page": 1, "page": 1})
+            props={"$pageSize": self.batch_size, "$page": 1, "page": 1, "id": campaign.get("id")},
+            prefetch=self.prefetch_pages))
 
-        catalog_copy = copy.deepcopy(self.catalog)
+    @exacttarget_error_handling
+    def sync_data(self):
+        # the query parameters of 'filters__campaign_asset' limit the campaigns,
+        # the listing is the one of the 'campaign' stream when they are the same
+        campaigns = get_campaigns(self, self.get_filter_params())
 
-        for campaign in cursor:
-            cursor = request(
-                'Campaign Assets',
-                FuelSDK.ET_Campaign_Asset,
-                self.auth_stub,
-                # use $pageSize and $page in the props for
-                # this stream as it calls using REST API
-                props={"$pageSize": self.batch_size, "$page": 1, "page": 1, "id": campaign.get("id")})
+        catalog_copy = copy.deepcopy(self.catalog)
 
-            catalog_copy = copy.deepcopy(self.catalog)
+        # the assets of 'max_concurrent_campaign_asset_requests' campaigns are requested
+        # at the same time, and written in the order of the campaigns
+        fetcher = WindowFetcher(
+            self._get_campaign_assets,
+            get_positive_int(self.config, 'max_concurrent_campaign_asset_requests',
+                             MAX_CONCURRENT_CAMPAIGN_ASSET_REQUESTS))
 
-            for campaign_asset in cursor:
+        for _, campaign_assets in fetcher.run(campaigns):
+            for campaign_asset in campaign_assets:
                 campaign_asset = self.filter_keys_and_parse(campaign_asset)
                 self.write_records_with_transform(campaign_asset, catalog_copy, self.TABLE)
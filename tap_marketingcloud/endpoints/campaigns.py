@@ -1,5 +1,6 @@
 import FuelSDK
 import copy
+import json
 import singer
 
 from tap_marketingcloud.client import request
@@ -8,6 +9,22 @@ from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling
 LOGGER = singer.get_logger()
 
 
+# get the campaigns with the query parameters 'filter_params', requested once per
+# run for the 'campaign' and 'campaign_asset' streams of the 'accessor', see 'ResultCache'
+def get_campaigns(accessor, filter_params):
+    def fetch():
+        return list(request(
+            'Campaign',
+            FuelSDK.ET_Campaign,
+            accessor.auth_stub,
+            # use $pageSize and $page in the props for
+            # this stream as it calls using REST API
+            props={**filter_params, "$pageSize": accessor.batch_size, "$page": 1, "page": 1},
+            prefetch=accessor.prefetch_pages))
+
+    return accessor.get_shared_result(('Campaign', json.dumps(filter_params, sort_keys=True)), fetch)
+
+
 class CampaignDataAccessObject(DataAccessObject):
 
     TABLE = 'campaign'
@@ -16,17 +33,12 @@ class CampaignDataAccessObject(DataAccessObject):
 
     @exacttarget_error_handling
     def sync_data(self):
-        cursor = request(
-            'Campaign',
-            FuelSDK.ET_Campaign,
-            self.auth_stub,
-            # use $pageSize and $page in the props for
-            # this stream as it calls using REST API
-            props={"$pageSize": self.batch_size, "$page": 1, "page": 1})
+        # the campaigns with the query parameters of 'filters__campaign'
+        campaigns = get_campaigns(self, self.get_filter_params())
 
         catalog_copy = copy.deepcopy(self.catalog)
 
-        for campaign in cursor:
+        for campaign in campaigns:
             campaign = self.filter_keys_and_parse(campaign)
 
             self.write_records_with_transform(campaign, catalog_copy, self.TABLE)
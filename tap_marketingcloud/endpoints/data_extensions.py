@@ -1,25 +1,43 @@
 import FuelSDK
 import copy
+import threading
 import singer
 
-from funcy import set_in, update_in, merge
+from funcy import chunks
 
-from tap_marketingcloud.client import request, request_from_cursor
+from tap_marketingcloud.client import request, request_from_cursor, request_stream
 from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling)
-from tap_marketingcloud.pagination import get_date_page, before_date, \
-    increment_date
-from tap_marketingcloud.state import incorporate, save_state, \
-    get_last_record_value_for_table
-from tap_marketingcloud.util import sudsobj_to_dict
+from tap_marketingcloud.fetcher import WindowFetcher
+from tap_marketingcloud.filters import simple
+from tap_marketingcloud.state import incorporate, \
+    get_last_record_value_for_table, get_end_date
+from tap_marketingcloud.util import sudsobj_to_dict, get_positive_int, read_json, write_json_atomic
 from tap_marketingcloud.fuel_overrides import TapMarketingcloud__ET_DataExtension_Row, \
     TapMarketingcloud__ET_DataExtension_Column
 
 LOGGER = singer.get_logger()  # noqa
 
-# add 'new_item' in 'collection' (dict) at the 'path'
-# update_in({"a": {}}, ["a", "cnt"], 1) -> {"a": {"cnt": 1}}
-def _merge_in(collection, path, new_item):
-    return update_in(collection, path, lambda x: merge(x, [new_item]))
+# number of data extensions the fields are requested for in one request
+DISCOVERY_BATCH_SIZE = 100
+
+# default number of field requests made at the same time during discovery
+MAX_CONCURRENT_DISCOVERY_REQUESTS = 1
+
+# default number of data extensions synced at the same time
+MAX_CONCURRENT_DATA_EXTENSIONS = 1
+
+
+def get_max_concurrent_data_extensions(config):
+    return get_positive_int(config, 'max_concurrent_data_extensions', MAX_CONCURRENT_DATA_EXTENSIONS)
+
+
+# filter on the data extensions with the 'customer_keys', at 'field'
+# ('CustomerKey' of a data extension, 'DataExtension.CustomerKey' of a field)
+def _customer_keys_filter(field, customer_keys):
+    if len(customer_keys) == 1:
+        return simple(field, 'equals', customer_keys[0])
+
+    return simple(field, 'IN', customer_keys)
 
 
 def _convert_extension_datatype(datatype):
@@ -33,6 +51,11 @@ def _convert_extension_datatype(datatype):
     return 'string'
 
 
+# get the table level metadata (the empty breadcrumb) of a catalog entry
+def _get_table_metadata(catalog):
+    return next(mdata['metadata'] for mdata in catalog['metadata'] if not mdata.get('breadcrumb'))
+
+
 def _get_tap_stream_id(extension):
     extension_name = extension.CustomerKey
     return 'data_extension.{}'.format(extension_name)
@@ -42,12 +65,74 @@ def _get_extension_name_from_tap_stream_id(tap_stream_id):
     return tap_stream_id.split('.')[1]
 
 
+class DataExtensionLookup():
+    """
+    The 'DataExtension' objects (CustomerKey, CategoryID and Name) of the
+    data extensions synced in a run, shared by all their accessors.
+
+    They are requested in bulk, in batches of 'DISCOVERY_BATCH_SIZE', the
+    first time one is needed, instead of one request per data extension.
+    """
+
+    def __init__(self, auth_stub, customer_keys, batch_size=2500):
+        self.auth_stub = auth_stub
+        self.customer_keys = list(customer_keys)
+        self.batch_size = batch_size
+        self.extensions = None
+        self.lock = threading.Lock()
+
+    def _load(self):
+        extensions = {}
+
+        for customer_keys in chunks(DISCOVERY_BATCH_SIZE, self.customer_keys):
+            result = request(
+                'DataExtension',
+                FuelSDK.ET_DataExtension,
+                self.auth_stub,
+                search_filter=_customer_keys_filter('CustomerKey', customer_keys),
+                props=['CustomerKey', 'CategoryID', 'Name'],
+                batch_size=self.batch_size)
+
+            for extension in result:
+                extensions[str(extension.CustomerKey)] = extension
+
+        return extensions
+
+    # get the 'DataExtension' object with the 'customer_key'
+    def get(self, customer_key):
+        # the other accessors wait for the one loading the data extensions,
+        # and a failed load is tried again by the next call
+        with self.lock:
+            if self.extensions is None:
+                self.extensions = self._load()
+
+        extension = self.extensions.get(customer_key)
+
+        if extension is None:
+            raise Exception("Data extension '{}' not found.".format(customer_key))
+
+        return extension
+
+
 class DataExtensionDataAccessObject(DataAccessObject):
 
+    def __init__(self, config, state, auth_stub, catalog):
+        super().__init__(config, state, auth_stub, catalog)
+        tap_stream_id = (catalog or {}).get('tap_stream_id')
+        # the customer key of the data extension synced by this accessor
+        self.customer_key = tap_stream_id.split('.', 1)[1] if tap_stream_id else None
+        # 'DataExtensionLookup' shared with the accessors of the other data
+        # extensions of the run, set by 'do_sync'
+        self.extension_lookup = None
+
     @classmethod
     def matches_catalog(cls, catalog):
         return 'data_extension.' in catalog.get('stream')
 
+    # the same batch size is used for all the data extensions
+    def get_batch_size(self, stream=None):
+        return super().get_batch_size(stream or 'data_extension')
+
     # get list of all the data extensions created by the user
     @exacttarget_error_handling
     def _get_extensions(self):
@@ -55,15 +140,17 @@ class DataExtensionDataAccessObject(DataAccessObject):
             'DataExtension',
             FuelSDK.ET_DataExtension,
             self.auth_stub,
-            props=['CustomerKey', 'Name'],
+            props=['CustomerKey', 'Name', 'ModifiedDate'],
             batch_size=self.batch_size
         )
 
         to_return = {}
+        modified_dates = {}
 
         for extension in result:
             extension_name = str(extension.Name)
             customer_key = str(extension.CustomerKey)
+            modified_dates[customer_key] = str(getattr(extension, 'ModifiedDate', None))
 
             # create a basic catalog dict for all data extensions
             to_return[customer_key] = {
@@ -107,20 +194,47 @@ class DataExtensionDataAccessObject(DataAccessObject):
                 ]
             }
 
-        return to_return
+        return to_return, modified_dates
 
-    # get all the fields in all the data extensions
-    @exacttarget_error_handling
-    def _get_fields(self, extensions): # pylint: disable=too-many-branches
-        to_return = extensions.copy()
+    # request the fields of the data extensions with the 'customer_keys',
+    # or of all the data extensions when not passed
+    def _request_fields(self, customer_keys=None):
+        search_filter = None
 
-        result = request(
+        if customer_keys is not None:
+            search_filter = _customer_keys_filter('DataExtension.CustomerKey', customer_keys)
+
+        return request(
             'DataExtensionField',
             # use custom class to apply 'batch_size'
             TapMarketingcloud__ET_DataExtension_Column,
             self.auth_stub,
+            search_filter,
             batch_size=self.batch_size)
 
+    # fetch the fields of a batch of data extensions, run on the worker threads
+    def _fetch_fields(self, customer_keys):
+        return list(self._request_fields(customer_keys))
+
+    # get all the fields in all the data extensions
+    # when 'customer_keys' is passed, the fields are requested for batches of
+    # 'DISCOVERY_BATCH_SIZE' data extensions, 'max_concurrent_discovery_requests'
+    # at a time, otherwise all of them are requested through one cursor
+    @exacttarget_error_handling
+    def _get_fields(self, extensions, customer_keys=None):
+        # the catalog dicts are updated in place, work on a copy so a retry starts over
+        to_return = copy.deepcopy(extensions)
+
+        if customer_keys is None:
+            fields = self._request_fields()
+        else:
+            fetcher = WindowFetcher(
+                self._fetch_fields,
+                get_positive_int(self.config, 'max_concurrent_discovery_requests',
+                                 MAX_CONCURRENT_DISCOVERY_REQUESTS))
+            batches = chunks(DISCOVERY_BATCH_SIZE, customer_keys)
+            fields = (field for _, batch_fields in fetcher.run(batches) for field in batch_fields)
+
         # iterate through all the fields and determine if it is primary key
         # or replication key and update the catalog file accordingly:
         #   is_primary_key:
@@ -129,26 +243,33 @@ class DataExtensionDataAccessObject(DataAccessObject):
         #       update value of 'forced-replication-method' as INCREMENTAL
         #       update catalog file by appending that field in 'valid-replication-keys'
         #   add 'AUTOMATIC' replication method for both primary and replication keys
-        for field in result:
-            is_replication_key = False
-            is_primary_key = False
+        for field in fields:
             # the date extension in which the fields is present
-            extension_id = field.DataExtension.CustomerKey
+            extension_id = str(field.DataExtension.CustomerKey)
             field = sudsobj_to_dict(field)
             field_name = field['Name']
 
-            if field.get('IsPrimaryKey'):
-                # add primary key in 'key_properties' list
-                is_primary_key = True
-                to_return = _merge_in(
-                    to_return,
-                    [extension_id, 'key_properties'],
-                    field_name)
+            catalog = to_return.get(extension_id)
+            if catalog is None:
+                LOGGER.warning('Skipping field %s of unknown data extension %s.', field_name, extension_id)
+                continue
+
+            mdata = _get_table_metadata(catalog)
+            is_primary_key = bool(field.get('IsPrimaryKey'))
+            is_replication_key = field_name in ['ModifiedDate', 'JoinDate']
+
+            # add primary key in 'key_properties' and 'table-key-properties'
+            if is_primary_key:
+                catalog['key_properties'].append(field_name)
+                mdata['table-key-properties'].append(field_name)
 
-            if field_name in ['ModifiedDate', 'JoinDate']:
-                is_replication_key = True
+            # add replication key in 'valid-replication-keys'
+            # and change 'forced-replication-method' to INCREMENTAL
+            if is_replication_key:
+                mdata['forced-replication-method'] = 'INCREMENTAL'
+                mdata['valid-replication-keys'].append(field_name)
 
-            field_schema = {
+            catalog['schema']['properties'][field_name] = {
                 'type': [
                     'null',
                     _convert_extension_datatype(str(field.get('FieldType')))
@@ -156,79 +277,78 @@ class DataExtensionDataAccessObject(DataAccessObject):
                 'description': str(field.get('Description')),
             }
 
-            to_return = set_in(
-                to_return,
-                [extension_id, 'schema', 'properties', field_name],
-                field_schema)
-
-            # add primary key in 'table-key-properties'
-            if is_primary_key:
-                for mdata in to_return[extension_id]['metadata']:
-                    if not mdata.get('breadcrumb'):
-                        mdata.get('metadata').get('table-key-properties').append(field_name)
-
-            # add replication key in 'valid-replication-keys'
-            # and change 'forced-replication-method' to INCREMENTAL
-            if is_replication_key:
-                for mdata in to_return[extension_id]['metadata']:
-                    if not mdata.get('breadcrumb'):
-                        mdata.get('metadata')['forced-replication-method'] = "INCREMENTAL"
-                        mdata.get('metadata').get('valid-replication-keys').append(field_name)
-
             # These fields are defaulted into the schema, do not add to metadata again.
             if field_name not in {'_CustomObjectKey', 'CategoryID'}:
                 # if primary of replication key, then mark it as automatic
-                if is_primary_key or is_replication_key:
-                    to_return[extension_id]['metadata'].append({
-                        'breadcrumb': ('properties', field_name),
-                        'metadata': {'inclusion': 'automatic'}
-                    })
-                else:
-                    to_return[extension_id]['metadata'].append({
-                        'breadcrumb': ('properties', field_name),
-                        'metadata': {'inclusion': 'available'}
-                    })
-
-        # the structure of 'to_return' is like:
-        # {
-        #     'de1': {
-        #         'tap_stream_id': 'data_extension.de1',
-        #         'stream': 'data_extension.de1',
-        #         'key_properties': ['_CustomObjectKey'],
-        #         'schema': {
-        #             'type': 'object',
-        #             'properties': {...}
-        #         },
-        #         'metadata': [...]
-        #     },
-        #    'de2': {
-        #         'tap_stream_id': 'data_extension.de2',
-        #         'stream': 'data_extension.de2',
-        #         'key_properties': ['_CustomObjectKey'],
-        #         'schema': {
-        #             'type': 'object',
-        #             'properties': {...}
-        #         },
-        #         'metadata': [...]
-        #     }
-        # }
+                catalog['metadata'].append({
+                    'breadcrumb': ('properties', field_name),
+                    'metadata': {'inclusion': 'automatic' if is_primary_key or is_replication_key else 'available'}
+                })
 
         # loop through all the data extension catalog in 'to_return'
         # and remove empty 'valid-replication-keys' present in metadata
         for catalog in to_return.values():
-            for mdata in catalog.get('metadata'):
-                if not mdata.get('breadcrumb'):
-                    if not mdata.get('metadata').get('valid-replication-keys'):
-                        del mdata.get('metadata')['valid-replication-keys']
+            mdata = _get_table_metadata(catalog)
+            if not mdata.get('valid-replication-keys'):
+                del mdata['valid-replication-keys']
+
         return to_return
 
     def generate_catalog(self):
-        # get all the data extensions by requesting all the fields
-        extensions_catalog = self._get_extensions()
-
-        extensions_catalog_with_fields = self._get_fields(extensions_catalog)
-
-        return extensions_catalog_with_fields.values()
+        # get all the data extensions, with the date they were last modified
+        extensions_catalog, modified_dates = self._get_extensions()
+
+        cache_path = self.config.get('data_extension_catalog_cache_path')
+        cached_catalogs = self._get_cached_catalogs(cache_path, extensions_catalog, modified_dates)
+
+        # request the fields of the data extensions not cached, in batches when
+        # some are cached or when the batches can be requested concurrently
+        customer_keys = [key for key in extensions_catalog if key not in cached_catalogs]
+        extensions_catalog_with_fields = {}
+
+        if customer_keys:
+            concurrent = get_positive_int(self.config, 'max_concurrent_discovery_requests',
+                                          MAX_CONCURRENT_DISCOVERY_REQUESTS) > 1
+            extensions_catalog_with_fields = self._get_fields(
+                {key: extensions_catalog[key] for key in customer_keys},
+                customer_keys if cached_catalogs or concurrent else None)
+
+        catalogs = {key: cached_catalogs.get(key) or extensions_catalog_with_fields[key]
+                    for key in extensions_catalog}
+
+        if cache_path:
+            try:
+                write_json_atomic(cache_path, {
+                    key: {'ModifiedDate': modified_dates[key], 'catalog': catalog}
+                    for key, catalog in catalogs.items()
+                })
+            except OSError as e:
+                LOGGER.warning('Failed to write the data extension catalog cache %s: %s', cache_path, e)
+
+        return catalogs.values()
+
+    # get the catalogs of the data extensions not modified since they were
+    # written in the cache at 'cache_path', by customer key
+    @staticmethod
+    def _get_cached_catalogs(cache_path, extensions_catalog, modified_dates):
+        cache = (read_json(cache_path) or {}) if cache_path else {}
+        cached_catalogs = {}
+
+        for customer_key, extension_catalog in extensions_catalog.items():
+            cached = cache.get(customer_key)
+            modified_date = modified_dates[customer_key]
+
+            if cached and modified_date != 'None' and cached.get('ModifiedDate') == modified_date:
+                catalog = cached['catalog']
+                # the name of a data extension can change without a new field
+                catalog['stream'] = extension_catalog['stream']
+                cached_catalogs[customer_key] = catalog
+
+        if cached_catalogs:
+            LOGGER.info('Reusing the cached catalog of %s of the %s data extensions.',
+                        len(cached_catalogs), len(extensions_catalog))
+
+        return cached_catalogs
 
     def parse_object(self, obj):
         properties = obj.get('Properties', {}).get('Property', {})
@@ -277,50 +397,59 @@ class DataExtensionDataAccessObject(DataAccessObject):
 
         return to_return
 
-    @exacttarget_error_handling
-    def _replicate(self, customer_key, keys,
-                   parent_category_id, table,
-                   partial=False, start=None,
-                   end=None, unit=None, replication_key=None):
-        if partial:
-            LOGGER.info("Fetching {} from {} to {}"
-                        .format(table, start, end))
+    # request the rows of the data extension, all of them without 'search_filter'
+    def _request_rows(self, customer_key, keys, search_filter, name):
+        if self.streaming_retrieve and name is not None:
+            return request_stream('DataExtensionObject',
+                                  'DataExtensionObject[{}]'.format(name),
+                                  self.auth_stub,
+                                  search_filter,
+                                  props=keys,
+                                  batch_size=self.batch_size)
 
         # use custom class to apply 'batch_size'
         cursor = TapMarketingcloud__ET_DataExtension_Row()
         cursor.auth_stub = self.auth_stub
         cursor.CustomerKey = customer_key
+        # the name is already known, no need to look it up from the customer key
+        cursor.Name = name
         cursor.props = keys
         cursor.options = {"BatchSize": self.batch_size}
+        cursor.search_filter = search_filter
+
+        return request_from_cursor('DataExtensionObject', cursor,
+                                   batch_size=self.batch_size,
+                                   prefetch=self.prefetch_pages)
 
+    @exacttarget_error_handling
+    def _replicate(self, customer_key, keys,
+                   parent_category_id, table,
+                   partial=False, end=None, search_filter=None, replication_key=None,
+                   name=None):
         if partial:
-            cursor.search_filter = get_date_page(replication_key,
-                                                 start,
-                                                 unit)
+            LOGGER.info("Fetching {} from {} to {}"
+                        .format(table, *search_filter['Value']))
 
-        result = request_from_cursor('DataExtensionObject', cursor,
-                                     batch_size=self.batch_size)
+            result = self.fetch_window(
+                'data_extension.{}'.format(customer_key), search_filter, end,
+                lambda: self._request_rows(customer_key, keys, search_filter, name),
+                props=keys)
+        else:
+            result = self._request_rows(customer_key, keys, None, name)
 
         catalog_copy = copy.deepcopy(self.catalog)
+        count = 0
 
         for row in result:
             row = self.filter_keys_and_parse(row)
             row['CategoryID'] = parent_category_id
+            count += 1
 
-            self.state = incorporate(self.state,
-                                     table,
-                                     replication_key,
-                                     row.get(replication_key))
+            self.bookmark_tracker.observe(table, replication_key, row.get(replication_key))
 
             self.write_records_with_transform(row, catalog_copy, table)
 
-        if partial:
-            self.state = incorporate(self.state,
-                                     table,
-                                     replication_key,
-                                     start)
-
-            save_state(self.state)
+        return count
 
     @exacttarget_error_handling
     def sync_data(self):
@@ -336,6 +465,7 @@ class DataExtensionDataAccessObject(DataAccessObject):
 
         # pass config to return start date if not bookmark is found
         start = get_last_record_value_for_table(self.state, table, self.config)
+        end_date = get_end_date(self.config)
 
         for key in ['ModifiedDate', 'JoinDate']:
             if key in keys:
@@ -346,48 +476,43 @@ class DataExtensionDataAccessObject(DataAccessObject):
         pagination_quantity = self.config.get(
             'pagination__data_extension_interval_quantity', 7)
 
-        unit = {pagination_unit: int(pagination_quantity)}
+        window_size = self.get_window(table, {pagination_unit: int(pagination_quantity)})
 
-        end = increment_date(start, unit)
+        # look up the data extension alone when the accessor is not part of a run
+        if self.extension_lookup is None:
+            self.extension_lookup = DataExtensionLookup(self.auth_stub, [customer_key], self.batch_size)
 
-        parent_result = None
-        parent_extension = None
-        parent_result = request(
-            'DataExtension',
-            FuelSDK.ET_DataExtension,
-            self.auth_stub,
-            search_filter={
-                'Property': 'CustomerKey',
-                'SimpleOperator': 'equals',
-                'Value': customer_key,
-            },
-            props=['CustomerKey', 'CategoryID'],
-            batch_size=self.batch_size)
-
-        parent_extension = next(parent_result)
+        parent_extension = self.extension_lookup.get(customer_key)
         parent_category_id = parent_extension.CategoryID
+        parent_name = getattr(parent_extension, 'Name', None)
 
-        while before_date(start) or replication_key is None:
+        # without a replication key, all the rows are replicated at once
+        if replication_key is None:
             self._replicate(
                 customer_key,
                 keys,
                 parent_category_id,
                 table,
-                partial=(replication_key is not None),
-                start=start,
-                end=end,
-                unit=unit,
-                replication_key=replication_key)
+                name=parent_name)
+            return
 
-            if replication_key is None:
-                return
+        for start, end, search_filter in self.get_date_windows(replication_key, start, end_date, window_size):
+            count = self._replicate(
+                customer_key,
+                keys,
+                parent_category_id,
+                table,
+                partial=True,
+                end=end,
+                search_filter=search_filter,
+                replication_key=replication_key,
+                name=parent_name)
 
             self.state = incorporate(self.state,
                                      table,
                                      replication_key,
                                      start)
 
-            save_state(self.state)
+            self.observe_window(table, window_size, count)
 
-            start = end
-            end = increment_date(start, unit)
+            self.checkpoint()
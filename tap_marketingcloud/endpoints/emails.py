@@ -4,8 +4,7 @@ import singer
 
 from tap_marketingcloud.client import request
 from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling)
-from tap_marketingcloud.pagination import get_date_page, before_date, increment_date
-from tap_marketingcloud.state import incorporate, save_state, \
+from tap_marketingcloud.state import incorporate, \
     get_last_record_value_for_table, get_end_date
 
 LOGGER = singer.get_logger()
@@ -17,25 +16,16 @@ class EmailDataAccessObject(DataAccessObject):
     KEY_PROPERTIES = ['ID']
     REPLICATION_METHOD = 'INCREMENTAL'
     REPLICATION_KEYS = ['ModifiedDate']
-
-    def parse_object(self, obj):
-        to_return = obj.copy()
-        content_area_ids = []
-
-        for content_area in to_return.get('ContentAreas', []):
-            content_area_ids.append(content_area.get('ID'))
-
-        to_return['EmailID'] = to_return.get('Email', {}).get('ID')
-        to_return['ContentAreaIDs'] = content_area_ids
-
-        return super().parse_object(to_return)
+    DERIVED_FIELDS = {
+        'EmailID': (['Email', 'ID'], None),
+        'ContentAreaIDs': (['ContentAreas', 'ID'], []),
+    }
 
     @exacttarget_error_handling
     def sync_data(self):
         table = self.__class__.TABLE
         selector = FuelSDK.ET_Email
 
-        search_filter = None
         # pass config to return start date if not bookmark is found
         start = get_last_record_value_for_table(self.state, table, self.config)
         end_date = get_end_date(self.config)
@@ -48,37 +38,38 @@ class EmailDataAccessObject(DataAccessObject):
         pagination_quantity = self.config.get(
             'pagination__{}_interval_quantity'.format(table), 60)
 
-        unit = {pagination_unit: int(pagination_quantity)}
-
-        end = increment_date(start, unit)
+        window_size = self.get_window(table, {pagination_unit: int(pagination_quantity)})
 
-        LOGGER.info('Before date: %s', before_date(start, end_date))
+        fields = self.get_request_fields()
 
-        while before_date(start, end_date):
-            LOGGER.info('Start: %s, end: %s, date comparison: %s', start, end_date, before_date(start, end_date))
+        for start, end, search_filter in self.get_date_windows('ModifiedDate', start, end_date, window_size):
             LOGGER.info("Fetching {} from {} to {}"
-                        .format(table, start, end))
-
-            search_filter = get_date_page('ModifiedDate', start, unit)
+                        .format(table, *search_filter['Value']))
 
-            stream = request('Email',
+            stream = self.fetch_window(
+                table, search_filter, end,
+                lambda: request('Email',
                                 selector,
                                 self.auth_stub,
                                 search_filter,
-                                batch_size=self.batch_size)
+                                batch_size=self.batch_size,
+                                prefetch=self.prefetch_pages,
+                                fields=fields),
+                props=fields)
 
             catalog_copy = copy.deepcopy(self.catalog)
+            count = 0
 
             for event in stream:
                 event = self.filter_keys_and_parse(event)
+                count += 1
 
-                self.state = incorporate(self.state, table, 'ModifiedDate', event.get('ModifiedDate'))
+                self.bookmark_tracker.observe(table, 'ModifiedDate', event.get('ModifiedDate'))
 
                 self.write_records_with_transform(event, catalog_copy, table)
 
             self.state = incorporate(self.state, table, 'ModifiedDate', start)
 
-            save_state(self.state)
+            self.observe_window(table, window_size, count)
 
-            start = end
-            end = increment_date(start, unit)
+            self.checkpoint()
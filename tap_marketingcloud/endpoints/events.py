@@ -3,10 +3,12 @@ import copy
 import singer
 
 from datetime import datetime
-from tap_marketingcloud.client import request
+from tap_marketingcloud.async_client import async_retrieve, AsyncWindowFetcher
+from tap_marketingcloud.client import request, REQUEST_TIMEOUT
 from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling)
-from tap_marketingcloud.pagination import get_date_page, before_date, increment_date
-from tap_marketingcloud.state import incorporate, save_state, get_last_record_value_for_table, get_end_date
+from tap_marketingcloud.fetcher import WindowFetcher, interleave, MAX_CONCURRENT_WINDOWS
+from tap_marketingcloud.state import incorporate, get_last_record_value_for_table, get_end_date
+from tap_marketingcloud.util import get_positive_int, get_bool
 
 
 LOGGER = singer.get_logger()
@@ -18,13 +20,68 @@ class EventDataAccessObject(DataAccessObject):
     KEY_PROPERTIES = ['SendID', 'EventType', 'SubscriberKey', 'EventDate', 'ID']
     REPLICATION_METHOD = 'INCREMENTAL'
     REPLICATION_KEYS = ['EventDate']
+    DERIVED_FIELDS = {
+        'ID': (['ID'], 'N/A'),
+    }
 
-    def parse_object(self, obj):
-        to_return = obj.copy()
+    # generate the date windows to fetch for the event type 'event_name'
+    def _get_windows(self, event_name, selector, window_size):
+        # pass config to return start date if not bookmark is found
+        start = get_last_record_value_for_table(self.state, event_name, self.config)
+        end_date = get_end_date(self.config)
 
-        to_return['ID'] = to_return.get('ID', 'N/A')
+        if start is None:
+            raise RuntimeError('start_date not defined!')
 
-        return super().parse_object(to_return)
+        for window_start, window_end, search_filter in self.get_date_windows('EventDate', start, end_date, window_size):
+            yield event_name, selector, window_start, window_end, search_filter
+
+    # fetch and parse the events of a window, runs on the fetcher's workers, the
+    # events are parsed while they are requested (see 'WindowFetcher.run')
+    def _fetch_window(self, window):
+        event_name, selector, _, end, search_filter = window
+
+        LOGGER.info("Fetching {} from {} to {}"
+                    .format(event_name, *search_filter['Value']))
+
+        fields = self.get_request_fields()
+
+        stream = self.fetch_window(
+            event_name, search_filter, end,
+            lambda: request(event_name,
+                            selector,
+                            self.auth_stub,
+                            search_filter,
+                            batch_size=self.batch_size,
+                            prefetch=self.prefetch_pages,
+                            streaming=self.streaming_retrieve,
+                            fields=fields),
+            props=fields)
+
+        return (self.filter_keys_and_parse(event) for event in stream)
+
+    # same as '_fetch_window' with the asynchronous client, runs on the event
+    # loop of the 'AsyncWindowFetcher' with its 'session'
+    async def _fetch_window_async(self, window, session):
+        event_name, selector, _, end, search_filter = window
+
+        LOGGER.info("Fetching {} from {} to {}"
+                    .format(event_name, *search_filter['Value']))
+
+        fields = self.get_request_fields()
+
+        async def fetch():
+            return [event async for event in async_retrieve(event_name,
+                                                            session,
+                                                            self.auth_stub,
+                                                            selector().obj_type,
+                                                            search_filter=search_filter,
+                                                            batch_size=self.batch_size,
+                                                            fields=fields)]
+
+        stream = await self.fetch_window_async(event_name, search_filter, end, fetch, props=fields)
+
+        return [self.filter_keys_and_parse(event) for event in stream]
 
     @exacttarget_error_handling
     def sync_data(self):
@@ -36,59 +93,56 @@ class EventDataAccessObject(DataAccessObject):
             'unsub': FuelSDK.ET_UnsubEvent
         }
 
-        for event_name, selector in endpoints.items():
-            search_filter = None
-
-            # pass config to return start date if not bookmark is found
-            start = get_last_record_value_for_table(self.state, event_name, self.config)
-            end_date = get_end_date(self.config)
-
-            if start is None:
-                raise RuntimeError('start_date not defined!')
-
+        # the windows of all the event types are fetched 'max_concurrent_windows'
+        # at a time, and are handed over in order for every event type so the
+        # bookmark of an event type only moves past a window once all its
+        # earlier windows are written
+        max_in_flight = get_positive_int(self.config, 'max_concurrent_windows', MAX_CONCURRENT_WINDOWS)
+
+        # with 'async_retrieve__event' the windows are requested by the asynchronous
+        # client on one event loop, so many more of them can be in flight
+        if get_bool(self.config, 'async_retrieve__{}'.format(table)):
+            fetcher = AsyncWindowFetcher(
+                self._fetch_window_async,
+                max_in_flight,
+                timeout=getattr(self.auth_stub, 'request_timeout', REQUEST_TIMEOUT))
+        else:
+            fetcher = WindowFetcher(self._fetch_window, max_in_flight)
+
+        event_window_sizes = {}
+
+        for event_name in endpoints:
             pagination_unit = self.config.get(
                 'pagination__{}_interval_unit'.format(event_name), 'minutes')
             pagination_quantity = self.config.get(
                 'pagination__{}_interval_quantity'.format(event_name), 10)
 
-            unit = {pagination_unit: int(pagination_quantity)}
-
-            end = increment_date(start, unit)
-
-            LOGGER.info('Before date: %s', before_date(start, end_date))
-
-            while before_date(start, end_date):
-                LOGGER.info('Start: %s, end: %s, date comparison: %s', start, end_date, before_date(start, end_date))
-                LOGGER.info("Fetching {} from {} to {}"
-                            .format(event_name, start, end))
-
-                search_filter = get_date_page('EventDate', start, unit)
+            event_window_sizes[event_name] = self.get_window(
+                event_name, {pagination_unit: int(pagination_quantity)})
 
-                stream = request(event_name,
-                                 selector,
-                                 self.auth_stub,
-                                 search_filter,
-                                 batch_size=self.batch_size)
+        windows = interleave(*[self._get_windows(event_name, selector, event_window_sizes[event_name])
+                               for event_name, selector in endpoints.items()])
 
-                catalog_copy = copy.deepcopy(self.catalog)
+        catalog_copy = copy.deepcopy(self.catalog)
 
-                for event in stream:
-                    event = self.filter_keys_and_parse(event)
+        for (event_name, _, start, _, _), events in fetcher.run(windows):
+            count = 0
 
-                    self.state = incorporate(self.state, event_name, 'EventDate', event.get('EventDate'))
+            for event in events:
+                count += 1
+                self.bookmark_tracker.observe(event_name, 'EventDate', event.get('EventDate'))
 
-                    if event.get('SubscriberKey') is None:
-                        LOGGER.info("SubscriberKey is NULL so ignoring {} record with SendID: {} and EventDate: {}"
-                                    .format(event_name,
-                                            event.get('SendID'),
-                                            event.get('EventDate')))
-                        continue
+                if event.get('SubscriberKey') is None:
+                    LOGGER.info("SubscriberKey is NULL so ignoring {} record with SendID: {} and EventDate: {}"
+                                .format(event_name,
+                                        event.get('SendID'),
+                                        event.get('EventDate')))
+                    continue
 
-                    self.write_records_with_transform(event, catalog_copy, table)
+                self.write_records_with_transform(event, catalog_copy, table)
 
-                self.state = incorporate(self.state, event_name, 'EventDate', start)
+            self.state = incorporate(self.state, event_name, 'EventDate', start)
 
-                save_state(self.state)
+            self.observe_window(event_name, event_window_sizes[event_name], count)
 
-                start = end
-                end = increment_date(start, unit)
+            self.checkpoint()
@@ -4,8 +4,7 @@ import singer
 
 from tap_marketingcloud.client import request
 from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling)
-from tap_marketingcloud.state import incorporate, save_state, \
-    get_last_record_value_for_table
+from tap_marketingcloud.state import get_last_record_value_for_table
 
 
 LOGGER = singer.get_logger()
@@ -17,13 +16,9 @@ class FolderDataAccessObject(DataAccessObject):
     KEY_PROPERTIES = ['ID']
     REPLICATION_METHOD = 'INCREMENTAL'
     REPLICATION_KEYS = ['ModifiedDate']
-
-    def parse_object(self, obj):
-        to_return = obj.copy()
-
-        to_return['ParentFolder'] = to_return.get('ParentFolder', {}).get('ID')
-
-        return super().parse_object(to_return)
+    DERIVED_FIELDS = {
+        'ParentFolder': (['ParentFolder', 'ID'], None),
+    }
 
     @exacttarget_error_handling
     def sync_data(self):
@@ -46,18 +41,17 @@ class FolderDataAccessObject(DataAccessObject):
                          selector,
                          self.auth_stub,
                          search_filter,
-                         batch_size=self.batch_size)
+                         batch_size=self.batch_size,
+                         prefetch=self.prefetch_pages,
+                         fields=self.get_request_fields())
 
         catalog_copy = copy.deepcopy(self.catalog)
 
         for folder in stream:
             folder = self.filter_keys_and_parse(folder)
 
-            self.state = incorporate(self.state,
-                                     table,
-                                     'ModifiedDate',
-                                     folder.get('ModifiedDate'))
+            self.bookmark_tracker.observe(table, 'ModifiedDate', folder.get('ModifiedDate'))
 
             self.write_records_with_transform(folder, catalog_copy, table)
 
-        save_state(self.state)
+        self.checkpoint()
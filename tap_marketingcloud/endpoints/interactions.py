@@ -18,7 +18,10 @@ class InteractionsDataAccessObject(DataAccessObject):
         cursor = request('Interactions',
                          FuelSDK.ET_Interactions,
                          self.auth_stub,
-                         props={"$pageSize": self.batch_size, "$page": 1, "page": 1, "extras": "activities", "mostRecentVersionOnly": "false"})
+                         # the query parameters of 'filters__interaction' (e.g. {"status": "Published"})
+                         props={"$pageSize": self.batch_size, "$page": 1, "page": 1, "extras": "activities", "mostRecentVersionOnly": "false",
+                                **self.get_filter_params()},
+                         prefetch=self.prefetch_pages)
 
         catalog_copy = copy.deepcopy(self.catalog)
 
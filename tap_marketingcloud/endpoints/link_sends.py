@@ -7,6 +7,11 @@ from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling
 
 LOGGER = singer.get_logger()
 
+# default number of sends whose link sends are requested at once (with the 'IN' filter)
+LINK_SEND_BATCH_SIZE = 50
+# default number of link send requests made at the same time
+MAX_CONCURRENT_LINK_SEND_REQUESTS = 1
+
 
 class LinkSendDataAccessObject(DataAccessObject):
 
@@ -14,25 +19,22 @@ class LinkSendDataAccessObject(DataAccessObject):
     KEY_PROPERTIES = ['ID']
     REPLICATION_METHOD = 'INCREMENTAL'
     REPLICATION_KEYS = ['ModifiedDate']
+    DERIVED_FIELDS = {
+        'LinkID': (['Link', 'ID'], None),
+        'URL': (['Link', 'URL'], None),
+        'TotalClicks': (['Link', 'TotalClicks'], None),
+        'UniqueClicks': (['Link', 'UniqueClicks'], None),
+        'LastClicked': (['Link', 'LastClicked'], None),
+        'Alias': (['Link', 'Alias'], None),
+    }
 
-    def parse_object(self, obj):
-        to_return = obj.copy()
-
-        to_return['LinkID'] = to_return.get('Link', {}).get('ID')
-        to_return['URL'] = to_return.get('Link', {}).get('URL')
-        to_return['TotalClicks'] = to_return.get('Link', {}).get('TotalClicks')
-        to_return['UniqueClicks'] = to_return.get('Link', {}).get('UniqueClicks')
-        to_return['LastClicked'] = to_return.get('Link', {}).get('LastClicked')
-        to_return['Alias'] = to_return.get('Link', {}).get('Alias')
-
-        return super().parse_object(to_return)
-
+    # fetch and parse the link sends of the sends 'send_ids', it does not
+    # write anything so it can run on the workers of a 'WindowFetcher'
     @exacttarget_error_handling
-    def pull_link_send_batch(self, send_ids):
+    def fetch_link_send_batch(self, send_ids):
         if not send_ids:
-            return
+            return []
 
-        table = self.__class__.TABLE
         _filter = {}
 
         if len(send_ids) == 1:
@@ -50,16 +52,25 @@ class LinkSendDataAccessObject(DataAccessObject):
             }
         else:
             LOGGER.info('Got empty set of subscriber keys, moving on')
-            return
+            return []
 
-        catalog_copy = copy.deepcopy(self.catalog)
         stream = request(
-            'LinkSendDataAccessObject', FuelSDK.ET_LinkSend, self.auth_stub, _filter, batch_size=self.batch_size)
+            'LinkSendDataAccessObject', FuelSDK.ET_LinkSend, self.auth_stub, _filter, batch_size=self.batch_size, prefetch=self.prefetch_pages,
+            fields=self.get_request_fields())
 
-        for link_send in stream:
-            link_send = self.filter_keys_and_parse(link_send)
+        return [self.filter_keys_and_parse(link_send) for link_send in stream]
+
+    # write the link sends returned by 'fetch_link_send_batch'
+    def write_link_sends(self, link_sends):
+        table = self.__class__.TABLE
+        catalog_copy = copy.deepcopy(self.catalog)
+
+        for link_send in link_sends:
             self.write_records_with_transform(link_send, catalog_copy, table)
 
+    def pull_link_send_batch(self, send_ids):
+        self.write_link_sends(self.fetch_link_send_batch(send_ids))
+
     @exacttarget_error_handling
     def sync_data(self):
         pass
@@ -4,6 +4,7 @@ import singer
 
 from tap_marketingcloud.client import request
 from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling)
+from tap_marketingcloud.filters import from_expression
 
 LOGGER = singer.get_logger()
 
@@ -13,13 +14,9 @@ class ListSendDataAccessObject(DataAccessObject):
     TABLE = 'list_send'
     KEY_PROPERTIES = ['ListID', 'SendID']
     REPLICATION_METHOD = 'FULL_TABLE'
-
-    def parse_object(self, obj):
-        to_return = obj.copy()
-
-        to_return['ListID'] = to_return.get('List', {}).get('ID')
-
-        return super().parse_object(to_return)
+    DERIVED_FIELDS = {
+        'ListID': (['List', 'ID'], None),
+    }
 
     @exacttarget_error_handling
     def sync_data(self):
@@ -28,10 +25,16 @@ class ListSendDataAccessObject(DataAccessObject):
 
         # making this endpoint as FULL_TABLE, as 'ModifiedDate' is not retrievable as discussed
         # here: https://salesforce.stackexchange.com/questions/354332/not-getting-modifieddate-for-listsend-endpoint
+        # only the list sends matching 'filters__list_send' from the config, if set
+        search_filter = from_expression(self.get_filter_expression())
+
         stream = request('ListSend',
                          selector,
                          self.auth_stub,
-                         batch_size=self.batch_size)
+                         search_filter,
+                         batch_size=self.batch_size,
+                         prefetch=self.prefetch_pages,
+                         fields=self.get_request_fields())
 
         catalog_copy = copy.deepcopy(self.catalog)
 
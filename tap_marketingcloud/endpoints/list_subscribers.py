@@ -5,22 +5,19 @@ import singer
 from tap_marketingcloud.client import request
 from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling)
 from tap_marketingcloud.endpoints.subscribers import SubscriberDataAccessObject
-from tap_marketingcloud.pagination import get_date_page, before_date, \
-    increment_date
-from tap_marketingcloud.state import incorporate, save_state, \
-    get_last_record_value_for_table, get_end_date
-from tap_marketingcloud.util import partition_all, sudsobj_to_dict
+from tap_marketingcloud.state import get_last_record_value_for_table, get_end_date
+from tap_marketingcloud.util import partition_all, sudsobj_to_dict, get_path
 
 
 LOGGER = singer.get_logger()
 
 
 def _get_subscriber_key(list_subscriber):
-    # return the 'SubscriberKey' of the subscriber
-    return list_subscriber.SubscriberKey
+    # return the 'SubscriberKey' of the subscriber (suds object, or dictionary replayed from the window cache)
+    return get_path(list_subscriber, ['SubscriberKey'])
 
 
-def _get_list_subscriber_filter(_list, start, unit):
+def _get_list_subscriber_filter(_list, date_filter):
     return {
         'LogicalOperator': 'AND',
         'LeftOperand': {
@@ -28,7 +25,7 @@ def _get_list_subscriber_filter(_list, start, unit):
             'SimpleOperator': 'equals',
             'Value': _list.get('ID'),
         },
-        'RightOperand': get_date_page('ModifiedDate', start, unit)
+        'RightOperand': date_filter
     }
 
 
@@ -38,6 +35,7 @@ class ListSubscriberDataAccessObject(DataAccessObject):
     KEY_PROPERTIES = ['SubscriberKey', 'ListID']
     REPLICATION_METHOD = 'INCREMENTAL'
     REPLICATION_KEYS = ['ModifiedDate']
+    DELAY_IN_DAY = 4
 
     def __init__(self, config, state, auth_stub, catalog):
         super().__init__(
@@ -76,8 +74,11 @@ class ListSubscriberDataAccessObject(DataAccessObject):
             self.auth_stub,
             self.subscriber_catalog)
 
+        # the records of the child stream count towards the checkpoints of this stream
+        subscriber_dao.checkpoint_policy = self.checkpoint_policy
+
         # pass config to return start date if not bookmark is found
-        start = get_last_record_value_for_table(self.state, table, self.config, delay_in_day=4)
+        start = get_last_record_value_for_table(self.state, table, self.config, delay_in_day=self.DELAY_IN_DAY)
         end_date = get_end_date(self.config)
 
         pagination_unit = self.config.get(
@@ -85,37 +86,42 @@ class ListSubscriberDataAccessObject(DataAccessObject):
         pagination_quantity = self.config.get(
             'pagination__list_subscriber_interval_quantity', 1)
 
-        unit = {pagination_unit: int(pagination_quantity)}
-
-        end = increment_date(start, unit)
+        window_size = self.get_window(table, {pagination_unit: int(pagination_quantity)})
 
         all_subscribers_list = self._get_all_subscribers_list()
 
-        while before_date(start, end_date):
-            stream = request('ListSubscriber',
-                             FuelSDK.ET_List_Subscriber,
-                             self.auth_stub,
-                             _get_list_subscriber_filter(
-                                 all_subscribers_list,
-                                 start, unit),
-                             batch_size=self.batch_size)
+        fields = self.get_request_fields()
+
+        for _, end, date_filter in self.get_date_windows('ModifiedDate', start, end_date, window_size):
+            search_filter = _get_list_subscriber_filter(all_subscribers_list, date_filter)
+
+            stream = self.fetch_window(
+                table, search_filter, end,
+                lambda: request('ListSubscriber',
+                                FuelSDK.ET_List_Subscriber,
+                                self.auth_stub,
+                                search_filter,
+                                batch_size=self.batch_size,
+                                prefetch=self.prefetch_pages,
+                                fields=fields),
+                props=fields)
 
             batch_size = 10000
 
             if self.replicate_subscriber:
                 subscriber_dao.write_schema()
 
+            count = 0
+
             for list_subscribers_batch in partition_all(stream, batch_size):
+                count += len(list_subscribers_batch)
+
                 for list_subscriber in list_subscribers_batch:
                     list_subscriber = self.filter_keys_and_parse(
                         list_subscriber)
 
                     if list_subscriber.get('ModifiedDate'):
-                        self.state = incorporate(
-                            self.state,
-                            table,
-                            'ModifiedDate',
-                            list_subscriber.get('ModifiedDate'))
+                        self.bookmark_tracker.observe(table, 'ModifiedDate', list_subscriber.get('ModifiedDate'))
                             
                 if self.replicate_subscriber:
                     # make the list of subscriber keys
@@ -125,7 +131,6 @@ class ListSubscriberDataAccessObject(DataAccessObject):
                     # pass the list of 'subscriber_keys' to fetch subscriber details
                     subscriber_dao.pull_subscribers_batch(subscriber_keys)
 
-                save_state(self.state)
+                self.checkpoint()
 
-            start = end
-            end = increment_date(start, unit)
+            self.observe_window(table, window_size, count)
@@ -4,8 +4,7 @@ import singer
 
 from tap_marketingcloud.client import request
 from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling)
-from tap_marketingcloud.state import incorporate, save_state, \
-    get_last_record_value_for_table
+from tap_marketingcloud.state import get_last_record_value_for_table
 
 
 LOGGER = singer.get_logger()
@@ -39,18 +38,17 @@ class ListDataAccessObject(DataAccessObject):
                          selector,
                          self.auth_stub,
                          search_filter,
-                         batch_size=self.batch_size)
+                         batch_size=self.batch_size,
+                         prefetch=self.prefetch_pages,
+                         fields=self.get_request_fields())
 
         catalog_copy = copy.deepcopy(self.catalog)
 
         for _list in stream:
             _list = self.filter_keys_and_parse(_list)
 
-            self.state = incorporate(self.state,
-                                     table,
-                                     'ModifiedDate',
-                                     _list.get('ModifiedDate'))
+            self.bookmark_tracker.observe(table, 'ModifiedDate', _list.get('ModifiedDate'))
 
             self.write_records_with_transform(_list, catalog_copy, table)
 
-        save_state(self.state)
+        self.checkpoint()
@@ -3,17 +3,18 @@ import copy
 import singer
 
 from tap_marketingcloud.client import request
-from tap_marketingcloud.endpoints.link_sends import LinkSendDataAccessObject
+from tap_marketingcloud.endpoints.link_sends import LinkSendDataAccessObject, LINK_SEND_BATCH_SIZE, \
+    MAX_CONCURRENT_LINK_SEND_REQUESTS
+from tap_marketingcloud.fetcher import WindowFetcher
 from tap_marketingcloud.dao import (DataAccessObject, exacttarget_error_handling)
-from tap_marketingcloud.state import incorporate, save_state, \
-    get_last_record_value_for_table
-from tap_marketingcloud.util import partition_all
+from tap_marketingcloud.state import get_last_record_value_for_table
+from tap_marketingcloud.util import partition_all, get_path, get_positive_int
 
 LOGGER = singer.get_logger()
 
 def _get_send_id(send):
-    # return the 'SubscriberKey' of the subscriber
-    return send.ID
+    # return the 'ID' of the send, a suds object or a dictionary with 'streaming_retrieve'
+    return get_path(send, ['ID'])
 
 class SendDataAccessObject(DataAccessObject):
 
@@ -21,6 +22,9 @@ class SendDataAccessObject(DataAccessObject):
     KEY_PROPERTIES = ['ID']
     REPLICATION_METHOD = 'INCREMENTAL'
     REPLICATION_KEYS = ['ModifiedDate']
+    DERIVED_FIELDS = {
+        'EmailID': (['Email', 'ID'], None),
+    }
 
     def __init__(self, config, state, auth_stub, catalog):
         super().__init__(
@@ -28,13 +32,6 @@ class SendDataAccessObject(DataAccessObject):
 
         self.send_link_catalog = None
 
-    def parse_object(self, obj):
-        to_return = obj.copy()
-
-        to_return['EmailID'] = to_return.get('Email', {}).get('ID')
-
-        return super().parse_object(to_return)
-
     @exacttarget_error_handling
     def sync_data(self):
         table = self.__class__.TABLE
@@ -57,32 +54,39 @@ class SendDataAccessObject(DataAccessObject):
             self.auth_stub,
             self.send_link_catalog)
 
+        # the records of the child stream count towards the checkpoints of this stream
+        linksend_dao.checkpoint_policy = self.checkpoint_policy
+
         stream = request('Send',
                          selector,
                          self.auth_stub,
                          search_filter,
-                         batch_size=self.batch_size)
+                         batch_size=self.batch_size,
+                         prefetch=self.prefetch_pages,
+                         streaming=self.streaming_retrieve,
+                         fields=self.get_request_fields())
 
         catalog_copy = copy.deepcopy(self.catalog)
-        batch_size = 50
+        batch_size = get_positive_int(self.config, 'link_send_batch_size', LINK_SEND_BATCH_SIZE)
         linksend_dao.write_schema()
 
-        for send_batch in partition_all(stream, batch_size):
+        # the link sends of the batches of sends are requested 'max_concurrent_link_send_requests'
+        # at a time while the sends are paged, but the batches are handed over in order so
+        # a checkpoint is written only once the link sends of all the earlier sends are
+        fetcher = WindowFetcher(
+            lambda send_batch: linksend_dao.fetch_link_send_batch(list(map(_get_send_id, send_batch))),
+            get_positive_int(self.config, 'max_concurrent_link_send_requests', MAX_CONCURRENT_LINK_SEND_REQUESTS))
+
+        for send_batch, link_sends in fetcher.run(partition_all(stream, batch_size)):
             for send in send_batch:
                 send = self.filter_keys_and_parse(
                     send)
 
-                self.state = incorporate(self.state,
-                                    table,
-                                    'ModifiedDate',
-                                    send.get('ModifiedDate'))
+                self.bookmark_tracker.observe(table, 'ModifiedDate', send.get('ModifiedDate'))
 
                 self.write_records_with_transform(send, catalog_copy, table)
 
-            send_ids = list(map(
-                _get_send_id, send_batch))
-
-            linksend_dao.pull_link_send_batch(send_ids)
+            linksend_dao.write_link_sends(link_sends)
 
             # Send state message to target
-            save_state(self.state)
+            self.checkpoint()
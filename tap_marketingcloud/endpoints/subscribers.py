@@ -14,24 +14,6 @@ class SubscriberDataAccessObject(DataAccessObject):
     REPLICATION_METHOD = 'INCREMENTAL'
     REPLICATION_KEYS = ['ModifiedDate']
 
-    def parse_object(self, obj):
-        to_return = obj.copy()
-
-        if 'ListIDs' in to_return:
-            to_return['ListIDs'] = [_list.get('ObjectID')
-                                    for _list in to_return.get('Lists', [])]
-
-        if 'Lists' in to_return:
-            del to_return['Lists']
-
-        if to_return.get('Addresses') is None:
-            to_return['Addresses'] = []
-
-        if to_return.get('PartnerProperties') is None:
-            to_return['PartnerProperties'] = []
-
-        return super().parse_object(obj)
-
     def sync_data(self):
         pass
 
@@ -62,7 +44,8 @@ class SubscriberDataAccessObject(DataAccessObject):
             return
 
         stream = request(
-            'Subscriber', FuelSDK.ET_Subscriber, self.auth_stub, _filter, batch_size=self.batch_size)
+            'Subscriber', FuelSDK.ET_Subscriber, self.auth_stub, _filter, batch_size=self.batch_size, prefetch=self.prefetch_pages,
+            streaming=self.streaming_retrieve, fields=self.get_request_fields())
 
         catalog_copy = copy.deepcopy(self.catalog)
 
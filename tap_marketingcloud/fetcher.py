@@ -0,0 +1,93 @@
+import collections
+import collections.abc
+import itertools
+import singer
+
+from concurrent.futures import ThreadPoolExecutor
+
+LOGGER = singer.get_logger()
+
+# default number of windows requested at the same time
+MAX_CONCURRENT_WINDOWS = 1
+
+
+# yield the items of all the 'iterables' in round-robin order:
+# interleave([1, 2, 3], ['a', 'b']) -> 1, 'a', 2, 'b', 3
+def interleave(*iterables):
+    iterators = collections.deque(iter(iterable) for iterable in iterables)
+
+    while iterators:
+        iterator = iterators.popleft()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            continue
+
+        iterators.append(iterator)
+        yield item
+
+
+class WindowFetcher():
+    """
+    Fetches windows (date pages) on a thread pool while keeping at most
+    'max_in_flight' of them in flight, and yields the results in the same
+    order the windows were generated.
+
+    'fetch' is called with a window and returns what the window holds
+    (e.g. the records), the caller can therefore move the bookmark past a
+    window once its result is used. With one window in flight the result
+    is yielded as is, so a generator of records is streamed to the caller,
+    else an iterator is read whole on the worker, as the result of a
+    window is buffered until all the earlier windows are yielded.
+
+    The windows are pulled from the iterable lazily, only when a slot is
+    free, so a window generator can rely on the results of the earlier
+    windows it has seen.
+    """
+
+    def __init__(self, fetch, max_in_flight=MAX_CONCURRENT_WINDOWS):
+        self.fetch = fetch
+        self.max_in_flight = max_in_flight
+
+    # fetch the 'window' on a worker, reading an iterator result whole
+    def _fetch_buffered(self, window):
+        result = self.fetch(window)
+
+        if isinstance(result, collections.abc.Iterator):
+            return list(result)
+
+        return result
+
+    # yield '(window, result)' for all the 'windows' in order
+    def run(self, windows):
+        if self.max_in_flight == 1:
+            for window in windows:
+                yield window, self.fetch(window)
+            return
+
+        windows = iter(windows)
+        pending = collections.deque()
+
+        executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+
+        try:
+            for window in itertools.islice(windows, self.max_in_flight):
+                pending.append((window, executor.submit(self._fetch_buffered, window)))
+
+            while pending:
+                window, future = pending.popleft()
+                result = future.result()
+
+                # refill the freed slot before handing the result over
+                for next_window in itertools.islice(windows, 1):
+                    pending.append((next_window, executor.submit(self._fetch_buffered, next_window)))
+
+                yield window, result
+
+        finally:
+            # do not wait for the windows that will never be used when
+            # a window failed or the caller stopped early
+            for _, future in pending:
+                future.cancel()
+
+            executor.shutdown(wait=True)
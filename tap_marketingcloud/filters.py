@@ -23,3 +23,34 @@ def between(field, start, end):
         field,
         'between',
         [start, end])
+
+
+# build the search filter of a config expression, either one condition
+# '[property, operator, value]' or a list of conditions that all have to match:
+# [["Status", "equals", "Active"], ["List.ID", "IN", [1, 2]]]
+# -> combine(simple("Status", ...), simple("List.ID", ...), 'AND'), the
+# conditions after the second one are 'AdditionalOperands' of the same
+# complex filter, as FuelSDK only builds simple filters for its operands
+def from_expression(expression):
+    if not expression:
+        return None
+
+    if not isinstance(expression[0], list):
+        expression = [expression]
+
+    for condition in expression:
+        if len(condition) != 3:
+            raise ValueError('Invalid filter condition {}, expected [property, operator, value].'
+                             .format(condition))
+
+    filters = [simple(*condition) for condition in expression]
+
+    if len(filters) == 1:
+        return filters[0]
+
+    search_filter = combine(filters[0], filters[1], 'AND')
+
+    if len(filters) > 2:
+        search_filter['AdditionalOperands'] = filters[2:]
+
+    return search_filter
@@ -1,5 +1,9 @@
 
 import FuelSDK
+import suds.wsse
+
+from suds.sax.element import Element
+from tap_marketingcloud.transport import PooledTransport
 
 """
 This module overrides classes and methods deep inside of the FuelSDK module.
@@ -20,8 +24,9 @@ class TapMarketingcloud__ET_Continue(FuelSDK.rest.ET_Constructor):
         ws_continueRequest = auth_stub.soap_client.factory.create('RetrieveRequest')
         ws_continueRequest.ContinueRequest = request_id
 
-        # tap-marketingcloud override: set batch size here
-        # ws_continueRequest.Options.BatchSize = batch_size
+        # tap-marketingcloud override: set batch size here, so the
+        # continuation pages are not sized by the server default
+        ws_continueRequest.Options.BatchSize = batch_size
 
         response = auth_stub.soap_client.service.Retrieve(ws_continueRequest)
 
@@ -105,3 +110,53 @@ class TapMarketingcloud__ET_DataExtension_Column(FuelSDK.ET_DataExtension_Column
         '''
 
         return obj
+
+
+# send the REST calls of FuelSDK ('ET_GetRest' used by 'ET_Campaign' and 'ET_Asset',
+# ...) through 'rest_session' (see 'tap_marketingcloud.transport.RestSession')
+# instead of the 'requests' module, which opens a new connection for every call
+def tap_marketingcloud__set_rest_session(rest_session):
+    FuelSDK.rest.requests = rest_session
+
+
+# override of 'ET_Client.build_soap_client', called by FuelSDK on every token refresh,
+# which takes the SOAP client from the 'client_cache' instead of parsing the WSDL again
+def _tap_marketingcloud__build_soap_client(self, client_cache):
+    if self.soap_endpoint is None or not self.soap_endpoint:
+        self.soap_endpoint = self.get_soap_endpoint()
+
+    # tap-marketingcloud override: the client is built on a copy of the WSDL parsed in the run
+    soap_client = client_cache.get_client(self.wsdl_file_url, self.soap_endpoint)
+    soap_client.set_options(location=self.soap_endpoint)
+    soap_client.set_options(headers={'user-agent': 'FuelSDK-Python-v1.3.0'})
+
+    if self.use_oAuth2_authentication == 'True':
+        element_oAuth = Element('fueloauth', ns=('etns', 'http://exacttarget.com'))
+        element_oAuth.setText(self.authToken)
+        soap_client.set_options(soapheaders=(element_oAuth))
+    else:
+        element_oAuth = Element('oAuth', ns=('etns', 'http://exacttarget.com'))
+        element_oAuthToken = Element('oAuthToken').setText(self.internalAuthToken)
+        element_oAuth.append(element_oAuthToken)
+        soap_client.set_options(soapheaders=(element_oAuth))
+
+        security = suds.wsse.Security()
+        token = suds.wsse.UsernameToken('*', '*')
+        security.tokens.append(token)
+        soap_client.set_options(wsse=security)
+
+    # tap-marketingcloud override: the client of a token refresh gets the pooled
+    # transport of the 'auth_stub' (see 'client._set_transport'), and is set on it
+    # once configured, so the threads sharing the 'auth_stub' never use it without
+    session = getattr(self, 'session', None)
+    if session is not None:
+        soap_client.set_options(transport=PooledTransport(session, timeout=self.request_timeout))
+
+    self.soap_client = soap_client
+
+
+# build the SOAP clients of FuelSDK from 'client_cache' (see
+# 'tap_marketingcloud.client_cache.ClientCache')
+def tap_marketingcloud__set_client_cache(client_cache):
+    FuelSDK.ET_Client.build_soap_client = \
+        lambda auth_stub: _tap_marketingcloud__build_soap_client(auth_stub, client_cache)
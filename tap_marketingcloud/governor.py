@@ -0,0 +1,234 @@
+import asyncio
+import requests
+import socket
+import threading
+import time
+import urllib.error
+import singer
+import singer.metrics
+
+from tap_marketingcloud.transport import HTTP_POOL_SIZE
+
+LOGGER = singer.get_logger()
+
+# HTTP status codes of a throttled request
+THROTTLE_STATUS_CODES = (429, 503)
+
+# messages of the faults returned to a throttled request (e.g. the
+# SOAP fault 'Server was unable to process request. ---> Server too busy')
+THROTTLE_MESSAGES = ('server too busy', 'too many requests', 'rate limit')
+
+# the concurrency limit is multiplied by this factor on a throttle or a timeout
+DECREASE_FACTOR = 0.5
+
+
+class ThrottleError(ConnectionError):
+    """
+    Raised for a request throttled by Marketing Cloud, once the governor
+    lowered its limit, so the request is retried like a connection error
+    (see 'client.request_page') instead of failing the stream.
+    """
+
+
+# whether a response with 'status_code' (and the fault 'message') is a throttle
+def is_throttled(status_code, message=None):
+    if status_code in THROTTLE_STATUS_CODES:
+        return True
+
+    message = str(message or '').lower()
+    return any(throttle_message in message for throttle_message in THROTTLE_MESSAGES)
+
+
+# whether the error 'e' of a request is a sign of an overloaded server (a
+# throttle, a timeout or a response cut short), the other errors (e.g. a DNS
+# error) say nothing of the load
+def is_congestion_error(e):
+    if isinstance(e, (ThrottleError, socket.timeout, asyncio.TimeoutError, requests.Timeout,
+                      requests.exceptions.ChunkedEncodingError)):
+        return True
+
+    # 'requests' raises the read timeout of a response body as a 'ConnectionError'
+    return isinstance(e, (urllib.error.URLError, requests.ConnectionError)) and 'timed out' in str(e)
+
+
+def _log_metric(metric_type, metric, value, **tags):
+    singer.metrics.log(LOGGER, singer.metrics.Point(metric_type, metric, value, tags))
+
+
+class RateGovernor():
+    """
+    The limits shared by all the API requests of the tap: a token bucket
+    of 'rate' requests per second (unlimited with 0), and an AIMD limit of
+    the requests in flight, between 'min_concurrency' and 'max_concurrency'.
+
+    The concurrency limit starts at 'max_concurrency', is multiplied by
+    'DECREASE_FACTOR' when a request is throttled or times out, and grows
+    back by one request per limit's worth of successful requests. The
+    other failures (a SOAP fault for a bad filter, a DNS error, ...) leave
+    it as it is, they say nothing of the load of the server. The requests
+    started before a decrease were sent at the higher limit, so their
+    throttles do not lower it again.
+
+    A request waits for a slot and a token in 'acquire' and reports its
+    outcome to 'release' (and a later timeout to 'congested'), or is made
+    through 'call'. The current limit and
+    the time the requests waited are logged as metrics, see 'report'.
+    """
+
+    def __init__(self, rate=0, max_concurrency=HTTP_POOL_SIZE, min_concurrency=1,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.condition = threading.Condition()
+        self.clock = clock
+        self.sleep = sleep
+        self.in_flight = 0
+        self.decreases = 0
+        self.requests = 0
+        self.throttles = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.configure(rate, max_concurrency, min_concurrency)
+
+    def configure(self, rate=0, max_concurrency=HTTP_POOL_SIZE, min_concurrency=1):
+        with self.condition:
+            self.rate = rate
+            # up to a second worth of requests can be sent at once
+            self.burst = max(1, rate)
+            self.tokens = self.burst
+            self.updated = self.clock()
+            self.min_concurrency = min(min_concurrency, max_concurrency)
+            self.max_concurrency = max_concurrency
+            self.limit = float(max_concurrency)
+            self.condition.notify_all()
+
+    # take a token from the bucket, returning how long to wait for it
+    def _take_token(self):
+        if not self.rate:
+            return 0
+
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # the token is reserved even if the bucket is empty, the
+        # requests waiting for the next tokens are served in order
+        self.tokens -= 1
+
+        return max(0, -self.tokens / self.rate)
+
+    def acquire(self):
+        """
+        Wait for a free slot under the concurrency limit and for a token,
+        then return the ticket to pass to `release` once the request is done.
+        """
+        start = self.clock()
+
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+
+            self.in_flight += 1
+            ticket = self.decreases
+            delay = self._take_token()
+
+        if delay > 0:
+            self.sleep(delay)
+
+        waited = self.clock() - start
+
+        with self.condition:
+            self.requests += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+        return ticket
+
+    def release(self, ticket, throttled=False, failed=False):
+        """
+        Free the slot of the request of `ticket` (see `acquire`), lowering
+        the concurrency limit if it was `throttled` (or timed out), raising
+        it if it succeeded, and leaving it as it is if it otherwise `failed`.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            previous_limit = int(self.limit)
+
+            if throttled:
+                self._decrease(ticket)
+            elif not failed:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+            limit = int(self.limit)
+            self.condition.notify_all()
+
+        self._log_limit(previous_limit, limit)
+
+    def congested(self, ticket):
+        """
+        Lower the concurrency limit for the request of `ticket` failing with
+        a timeout after its slot was released, e.g. while its response body
+        was downloaded.
+        """
+        with self.condition:
+            previous_limit = int(self.limit)
+            self._decrease(ticket)
+            limit = int(self.limit)
+
+        self._log_limit(previous_limit, limit)
+
+    # count a throttle of the request of 'ticket', lowering the limit if the
+    # request was sent at the current limit, the lock must be held
+    def _decrease(self, ticket):
+        self.throttles += 1
+
+        if ticket == self.decreases:
+            self.decreases += 1
+            self.limit = max(self.min_concurrency, self.limit * DECREASE_FACTOR)
+
+    def _log_limit(self, previous_limit, limit):
+        if limit != previous_limit:
+            if limit < previous_limit:
+                LOGGER.warning('Requests throttled, lowering the concurrency limit to %s.', limit)
+            _log_metric('gauge', 'request_concurrency_limit', limit)
+
+    def call(self, call, *args, **kwargs):
+        """
+        Make the request `call` (e.g. `cursor.get`) of FuelSDK under the
+        limits and return its response. A throttled response (or a timeout)
+        lowers the concurrency limit, and a throttled response raises a
+        `ThrottleError`.
+        """
+        ticket = self.acquire()
+
+        try:
+            response = call(*args, **kwargs)
+        except Exception as e:
+            self.release(ticket, throttled=is_congestion_error(e), failed=True)
+            raise
+
+        code = getattr(response, 'code', None)
+        message = getattr(response, 'message', None)
+        throttled = is_throttled(code, message)
+
+        self.release(ticket, throttled=throttled, failed=code not in (None, 200))
+
+        if throttled:
+            raise ThrottleError("Request throttled with '{}'".format(message or code))
+
+        return response
+
+    # log the current concurrency limit and the time the requests waited
+    def report(self):
+        with self.condition:
+            limit = int(self.limit)
+            requests = self.requests
+            throttles = self.throttles
+            wait_seconds = self.wait_seconds
+            max_wait_seconds = self.max_wait_seconds
+
+        _log_metric('gauge', 'request_concurrency_limit', limit)
+        _log_metric('counter', 'throttled_requests', throttles)
+        _log_metric('timer', 'request_wait', round(wait_seconds, 3),
+                    requests=requests, max_wait=round(max_wait_seconds, 3))
+
+
+# the governor of all the requests, configured by 'client.get_auth_stub'
+GOVERNOR = RateGovernor()
@@ -0,0 +1,155 @@
+import asyncio
+import backoff
+import itertools
+import requests
+import singer
+import socket
+import sys
+import threading
+import time
+import urllib.error
+
+LOGGER = singer.get_logger()
+
+# number of times a page (Retrieve or ContinueRequest call) is requested
+# before the error is raised to the stream
+PAGE_MAX_TRIES = 5
+
+# transient errors of a page request, see 'is_page_error_permanent', the
+# requests sent through 'requests' (see 'transport.PooledTransport' and
+# 'soap_stream') fail with its own connection errors, not the builtin ones
+PAGE_RETRY_ERRORS = (socket.timeout, ConnectionError, requests.Timeout, urllib.error.URLError,
+                     requests.ConnectionError, requests.exceptions.ChunkedEncodingError)
+
+
+class RetryStats():
+    """
+    Counts the retries of the page requests and the work they repeated: a
+    page retry repeats only the failed request, while a request whose page
+    retries are exhausted fails the stream, and the pages and records it
+    had returned are requested again if the stream is synced again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.page_retries = 0
+        self.failed_requests = 0
+        self.lost_pages = 0
+        self.lost_records = 0
+
+    def page_retried(self):
+        with self.lock:
+            self.page_retries += 1
+
+    def request_failed(self, pages, records):
+        with self.lock:
+            self.failed_requests += 1
+            self.lost_pages += pages
+            self.lost_records += records
+
+    def report(self):
+        with self.lock:
+            LOGGER.info('Retried %s page requests, %s requests failed after %s pages (%s records).',
+                        self.page_retries, self.failed_requests, self.lost_pages, self.lost_records)
+
+
+RETRY_STATS = RetryStats()
+
+
+# the 'urllib.error.URLError' which are not timeouts are not retried,
+# as in 'dao.exacttarget_error_handling'
+def is_page_error_permanent(e):
+    return isinstance(e, urllib.error.URLError) and 'timed out' not in str(e)
+
+
+def _log_page_retry(details):
+    RETRY_STATS.page_retried()
+    LOGGER.warning("Retrying the page request (try %s) after error: %s",
+                   details['tries'] + 1, sys.exc_info()[1])
+
+
+# mark the error of a page request whose retries are exhausted, so the
+# stream is not synced again from the start for it
+def _mark_page_error(details):
+    sys.exc_info()[1].page_retries_exhausted = True
+
+
+# retry the page request 'function' on the transient errors
+retry_page = backoff.on_exception(backoff.expo,
+                                  PAGE_RETRY_ERRORS,
+                                  giveup=is_page_error_permanent,
+                                  on_backoff=_log_page_retry,
+                                  on_giveup=_mark_page_error,
+                                  max_tries=PAGE_MAX_TRIES,
+                                  factor=2)
+
+
+# count the pages and records returned by a request before it failed
+# with the error 'e', once its page retries are exhausted
+def count_failed_request(e, pages_count, records_count):
+    if getattr(e, 'page_retries_exhausted', False):
+        RETRY_STATS.request_failed(pages_count, records_count)
+
+
+# the seconds to wait before the next try of a streamed page which failed with
+# the error 'e' on the try 'tries', None when its retries are exhausted, the
+# same policy as 'retry_page', it must be called while handling 'e'
+def _get_page_wait(e, tries, waits):
+    details = {'tries': tries}
+
+    if is_page_error_permanent(e) or tries >= PAGE_MAX_TRIES:
+        _mark_page_error(details)
+        return None
+
+    _log_page_retry(details)
+    return backoff.full_jitter(next(waits))
+
+
+def retry_streamed_page(request_page):
+    """
+    Yield the records of the page streamed by the generator `request_page()`,
+    calling it again on the transient errors as `retry_page` does. The
+    records yielded before the error are skipped on the next tries, so a
+    page fails or is yielded once whole, without the request starting over.
+    """
+    waits = backoff.expo(factor=2)
+    yielded = 0
+
+    for tries in itertools.count(1):
+        try:
+            for index, record in enumerate(request_page()):
+                if index >= yielded:
+                    yielded += 1
+                    yield record
+            return
+        except PAGE_RETRY_ERRORS as e:
+            seconds = _get_page_wait(e, tries, waits)
+            if seconds is None:
+                raise
+
+        time.sleep(seconds)
+
+
+async def retry_streamed_page_async(request_page, retry_errors=PAGE_RETRY_ERRORS):
+    """
+    Same as `retry_streamed_page`, for the page streamed by the async
+    generator `request_page()`, retried on the `retry_errors`.
+    """
+    waits = backoff.expo(factor=2)
+    yielded = 0
+
+    for tries in itertools.count(1):
+        try:
+            index = 0
+            async for record in request_page():
+                if index >= yielded:
+                    yielded += 1
+                    yield record
+                index += 1
+            return
+        except retry_errors as e:
+            seconds = _get_page_wait(e, tries, waits)
+            if seconds is None:
+                raise
+
+        await asyncio.sleep(seconds)
@@ -6,6 +6,12 @@ from tap_marketingcloud.filters import between
 LOGGER = singer.get_logger()
 DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
+# bounds of the adaptive window size, in seconds
+ADAPTIVE_MIN_SECONDS = 60
+ADAPTIVE_MAX_SECONDS = 30 * 24 * 60 * 60
+# a window holding less than this share of a batch is considered sparse
+ADAPTIVE_SPARSE_RATIO = 0.25
+
 
 # checks if the 'date_value' is less than or equal to now date
 def before_date(date_value, date_limit):
@@ -32,3 +38,88 @@ def increment_date(date_value, unit=None):
 # }
 def get_date_page(field, start, unit):
     return between(field, start, increment_date(start, unit))
+
+
+# the start of the window of 'size' (timedelta) holding 'date' (datetime) on the
+# grid of the windows starting at 'anchor' (datetime)
+def align_date(date, anchor, size):
+    return anchor + (date - anchor) // size * size
+
+
+# yield the '(start, end, filter)' of the date windows on 'field' from 'start'
+# until 'end_date' ('DATE_FORMAT' strings), sized by the 'AdaptiveWindow'
+# 'window' (read before every window, so a resize applies to the next one)
+# the bounds are datetimes, formatted only once for the 'between' filter,
+# the end of a window being the start of the next one, with an 'anchor'
+# ('DATE_FORMAT' string) the first window starts on the grid of the windows
+# starting at 'anchor', so the windows are the same whatever the 'start'
+def date_windows(field, start, end_date, window, anchor=None):
+    start = datetime.datetime.strptime(start, DATE_FORMAT)
+    end_date = datetime.datetime.strptime(end_date, DATE_FORMAT)
+
+    if anchor is not None:
+        start = align_date(start, datetime.datetime.strptime(anchor, DATE_FORMAT),
+                           datetime.timedelta(**window.unit))
+
+    start_str = start.strftime(DATE_FORMAT)
+
+    while start <= end_date:
+        end = start + datetime.timedelta(**window.unit)
+        end_str = end.strftime(DATE_FORMAT)
+
+        yield start, end, between(field, start_str, end_str)
+
+        start, start_str = end, end_str
+
+
+class AdaptiveWindow():
+    """
+    Size of the date windows of a stream, starting from the configured
+    'unit'.
+
+    When 'adaptive' is set, the window doubles after a sparse or empty
+    window and halves after a window that spilled past one batch (and
+    hence needed 'ContinueRequest' pages), always staying within
+    'min_seconds' and 'max_seconds'. 'seconds' restores the size learned
+    in an earlier run. Without 'adaptive' the configured unit is used as is.
+    """
+
+    def __init__(self, unit, batch_size, adaptive=False,
+                 min_seconds=ADAPTIVE_MIN_SECONDS,
+                 max_seconds=ADAPTIVE_MAX_SECONDS,
+                 seconds=None):
+        self.configured_unit = unit
+        self.batch_size = batch_size
+        self.adaptive = adaptive
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+
+        if seconds is None:
+            seconds = datetime.timedelta(**unit).total_seconds()
+
+        self.seconds = int(min(max(seconds, min_seconds), max_seconds))
+
+    # the unit of the next window
+    @property
+    def unit(self):
+        if not self.adaptive:
+            return self.configured_unit
+
+        return {'seconds': self.seconds}
+
+    # update the window size with the number of records of a fetched window
+    def observe(self, count):
+        if not self.adaptive:
+            return
+
+        if count > self.batch_size:
+            seconds = max(self.seconds // 2, self.min_seconds)
+        elif count < self.batch_size * ADAPTIVE_SPARSE_RATIO:
+            seconds = min(self.seconds * 2, self.max_seconds)
+        else:
+            return
+
+        if seconds != self.seconds:
+            LOGGER.info('Changing window size from %s to %s seconds after a window of %s records.',
+                        self.seconds, seconds, count)
+            self.seconds = seconds
@@ -0,0 +1,41 @@
+import threading
+import singer
+
+LOGGER = singer.get_logger()
+
+
+class ResultCache():
+    """
+    The results of the requests shared by several streams of a run (e.g.
+    the campaign listing of the 'campaign' and 'campaign_asset' streams),
+    held in memory for the duration of the run.
+
+    A result is fetched by the first stream needing it, the streams needing
+    it at the same time wait for that fetch, and the later ones reuse it.
+    A failed fetch is not cached, the next stream fetches it again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.results = {}
+        # one lock per key, so the different results are fetched concurrently
+        self.key_locks = {}
+
+    def get(self, key, fetch):
+        """
+        Return the result of `key` (a tuple starting with the name of the
+        requested object, e.g. `('Campaign', ...)`), calling `fetch()` (which
+        must return the whole result, e.g. a list of records) the first time only.
+        """
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if key in self.results:
+                LOGGER.info("Reusing the '%s' results fetched earlier in the run.", key[0])
+                return self.results[key]
+
+            result = fetch()
+            self.results[key] = result
+
+            return result
@@ -0,0 +1,68 @@
+import singer
+
+from concurrent.futures import ThreadPoolExecutor
+
+from tap_marketingcloud.state import MergedState
+from tap_marketingcloud.util import get_positive_int
+
+LOGGER = singer.get_logger()
+
+# default number of streams synced at the same time
+MAX_CONCURRENT_STREAMS = 1
+
+
+def get_max_concurrent_streams(config):
+    return get_positive_int(config, 'max_concurrent_streams', MAX_CONCURRENT_STREAMS)
+
+
+class StreamScheduler():
+    """
+    Runs the 'sync' of the selected stream accessors on a bounded thread pool.
+
+    Every accessor works on its own copy of the state and its bookmarks are
+    merged into a single run-wide state (see 'MergedState'), and all the
+    RECORD, SCHEMA and STATE messages go through one lock, so the output
+    stays a valid Singer stream no matter how the workers interleave.
+
+    Child streams ('link_send' of 'send' and 'subscriber' of
+    'list_subscriber') are replicated by their parent accessor, so a
+    parent and its child always run on the same worker.
+    """
+
+    def __init__(self, state, max_workers=MAX_CONCURRENT_STREAMS):
+        self.merged_state = MergedState(state)
+        self.max_workers = max_workers
+
+    @property
+    def state(self):
+        return self.merged_state.state
+
+    def _sync(self, stream_accessor):
+        try:
+            stream_accessor.state = self.merged_state.copy()
+            stream_accessor.merged_state = self.merged_state
+            stream_accessor.sync()
+            self.merged_state.merge(stream_accessor.state)
+            return True
+
+        except Exception as e:
+            LOGGER.exception(e)
+            LOGGER.error('Failed to sync endpoint, moving on!')
+            return False
+
+    # sync all the 'stream_accessors' and return whether all of them succeeded
+    # 'max_workers' overrides the number of workers of the scheduler for this run
+    def run(self, stream_accessors, max_workers=None):
+        max_workers = max_workers or self.max_workers
+
+        if max_workers == 1:
+            return all([self._sync(stream_accessor)
+                        for stream_accessor in stream_accessors])
+
+        LOGGER.info('Syncing %s streams with %s workers.',
+                    len(stream_accessors), max_workers)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(self._sync, stream_accessors))
+
+        return all(results)
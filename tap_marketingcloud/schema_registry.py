@@ -0,0 +1,118 @@
+import copy
+import os
+import threading
+import singer
+
+from singer import utils
+from tap_marketingcloud.util import read_json, write_json_atomic
+
+LOGGER = singer.get_logger()
+
+SCHEMAS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'schemas')
+
+# file with the shared schemas the stream schemas refer to
+DEFINITIONS_FILE = 'definitions.json'
+
+
+class SchemaRegistry():
+    """
+    Schemas of the streams under 'schemas_dir', loaded and resolved (with
+    the references to 'definitions.json') at most once per process, on
+    first use.
+
+    With a 'cache_path', the resolved schemas are also written to that
+    file along with the modification time and size of every schema file,
+    and the next processes read them from there as long as no schema file
+    has changed, instead of parsing and resolving every file again.
+    """
+
+    def __init__(self, schemas_dir=SCHEMAS_DIR):
+        self.schemas_dir = schemas_dir
+        self.schemas = None
+        self.lock = threading.Lock()
+
+    # the modification time and size of every schema file, by file name
+    def _get_fingerprint(self):
+        fingerprint = {}
+
+        for file_name in sorted(os.listdir(self.schemas_dir)):
+            if not file_name.endswith('.json'):
+                continue
+
+            stat = os.stat(os.path.join(self.schemas_dir, file_name))
+            fingerprint[file_name] = [stat.st_mtime_ns, stat.st_size]
+
+        return fingerprint
+
+    # the shared schemas the stream schemas refer to, by file name
+    def load_references(self):
+        return {DEFINITIONS_FILE: utils.load_json(os.path.join(self.schemas_dir, DEFINITIONS_FILE))}
+
+    # the schema of 'stream' as in its file, without resolving the references
+    def load_schema(self, stream):
+        # 'events.json' holds the schema of the 'event' stream
+        return utils.load_json(os.path.join(self.schemas_dir, '{}s.json'.format(stream)))
+
+    def _load(self, fingerprint):
+        refs = self.load_references()
+        schemas = {}
+
+        for file_name in fingerprint:
+            if file_name == DEFINITIONS_FILE:
+                continue
+
+            stream = file_name[:-len('s.json')]
+            schemas[stream] = singer.resolve_schema_references(self.load_schema(stream), refs)
+
+        return schemas
+
+    @staticmethod
+    def _read_cache(cache_path, fingerprint):
+        cache = read_json(cache_path)
+
+        if cache is None:
+            return None
+
+        if cache.get('fingerprint') != fingerprint:
+            LOGGER.info('Schema files changed, the schema cache is not used.')
+            return None
+
+        return cache.get('schemas')
+
+    @staticmethod
+    def _write_cache(cache_path, fingerprint, schemas):
+        try:
+            write_json_atomic(cache_path, {'fingerprint': fingerprint, 'schemas': schemas})
+        except OSError as e:
+            LOGGER.warning('Failed to write the schema cache %s: %s', cache_path, e)
+
+    def _get_schemas(self, cache_path):
+        with self.lock:
+            if self.schemas is None:
+                fingerprint = self._get_fingerprint()
+                schemas = None
+
+                if cache_path:
+                    schemas = self._read_cache(cache_path, fingerprint)
+
+                if schemas is None:
+                    schemas = self._load(fingerprint)
+
+                    if cache_path:
+                        self._write_cache(cache_path, fingerprint, schemas)
+
+                self.schemas = schemas
+
+            return self.schemas
+
+    # get a copy of the resolved schema of 'stream', that the caller can update
+    def get_schema(self, stream, cache_path=None):
+        return copy.deepcopy(self._get_schemas(cache_path)[stream])
+
+
+REGISTRY = SchemaRegistry()
+
+
+# get the resolved schema of 'stream' from the registry of the tap schemas
+def get_schema(stream, cache_path=None):
+    return REGISTRY.get_schema(stream, cache_path)
@@ -0,0 +1,359 @@
+import re
+import threading
+import FuelSDK
+import requests
+import singer
+
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from tap_marketingcloud.governor import is_congestion_error, is_throttled, GOVERNOR, ThrottleError
+from tap_marketingcloud.page_retry import retry_streamed_page
+
+"""
+This module is an alternative to the FuelSDK/suds Retrieve call for the
+objects the tap replicates in bulk (events, sends, subscribers and data
+extension rows).
+
+suds reads the whole Retrieve response into a DOM and converts it to suds
+objects before the first record is returned, so the memory used grows
+with the batch size. Here the RetrieveRequest envelope is posted with
+'requests' and the response body is parsed while it is downloaded: every
+'Results' element is converted to a plain dictionary, yielded and dropped
+from the tree, so the memory used stays the same whatever the batch size.
+
+The dictionaries have the same shape as 'sudsobj_to_dict' gives for the
+suds objects, see '_to_value'.
+"""
+
+LOGGER = singer.get_logger()
+
+SOAP_NS = 'http://schemas.xmlsoap.org/soap/envelope/'
+PARTNER_API_NS = 'http://exacttarget.com/wsdl/partnerAPI'
+ET_NS = 'http://exacttarget.com'
+WSSE_NS = 'http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd'
+XSI_NS = 'http://www.w3.org/2001/XMLSchema-instance'
+
+# same user agent as the FuelSDK SOAP client
+USER_AGENT = 'FuelSDK-Python-v1.3.0'
+
+# bytes of the response body parsed at a time
+CHUNK_SIZE = 64 * 1024
+
+# elements which are always lists in the WSDL, even with a single item
+LIST_ELEMENTS = {'Attributes', 'ContentAreas', 'Lists', 'PartnerProperties', 'Property'}
+
+# 'xsd:dateTime' values, converted to the format 'sudsobj_to_dict' writes
+# the suds 'datetime' values with (the timezone offset is dropped the same way)
+DATETIME_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:\d{2})?$')
+
+# retrievable properties of the object types, see 'get_retrievable_props'
+_RETRIEVABLE_PROPS = {}
+_RETRIEVABLE_PROPS_LOCK = threading.Lock()
+
+
+# get the properties of 'object_type' that can be retrieved, the same way
+# 'FuelSDK.ET_Get' does when no properties are passed, but only once per run
+def get_retrievable_props(auth_stub, object_type):
+    with _RETRIEVABLE_PROPS_LOCK:
+        if object_type not in _RETRIEVABLE_PROPS:
+            describe = FuelSDK.rest.ET_Describe(auth_stub, object_type)
+            _RETRIEVABLE_PROPS[object_type] = [prop.Name for prop in describe.results[0].Properties
+                                               if prop.IsRetrievable]
+
+        return _RETRIEVABLE_PROPS[object_type]
+
+
+def _element(name, value):
+    if isinstance(value, (list, tuple)):
+        return ''.join(_element(name, item) for item in value)
+
+    return '<{0}>{1}</{0}>'.format(name, escape(str(value)))
+
+
+# build the 'Filter' of the request from a tap search filter,
+# see 'tap_marketingcloud.filters'
+def _filter_part(search_filter, name='Filter'):
+    if 'LogicalOperator' in search_filter:
+        operands = ''.join(_filter_part(operand, 'Operand')
+                           for operand in search_filter.get('AdditionalOperands', []))
+        if operands:
+            operands = '<AdditionalOperands>{}</AdditionalOperands>'.format(operands)
+
+        return ('<{0} xsi:type="ComplexFilterPart">{1}{2}{3}{4}</{0}>'
+                .format(name,
+                        _filter_part(search_filter['LeftOperand'], 'LeftOperand'),
+                        _element('LogicalOperator', search_filter['LogicalOperator']),
+                        _filter_part(search_filter['RightOperand'], 'RightOperand'),
+                        operands))
+
+    return ('<{0} xsi:type="SimpleFilterPart">{1}{2}{3}{4}</{0}>'
+            .format(name,
+                    _element('Property', search_filter['Property']),
+                    _element('SimpleOperator', search_filter['SimpleOperator']),
+                    _element('Value', search_filter.get('Value', [])),
+                    _element('DateValue', search_filter.get('DateValue', []))))
+
+
+# build the SOAP header with the token of the 'auth_stub', like 'ET_Client.build_soap_client'
+def _header(auth_stub):
+    if auth_stub.use_oAuth2_authentication == 'True':
+        return '<fueloauth xmlns="{}">{}</fueloauth>'.format(ET_NS, escape(auth_stub.authToken))
+
+    return ('<oAuth xmlns="{0}"><oAuthToken>{1}</oAuthToken></oAuth>'
+            '<wsse:Security xmlns:wsse="{2}" mustUnderstand="true">'
+            '<wsse:UsernameToken><wsse:Username>*</wsse:Username><wsse:Password>*</wsse:Password>'
+            '</wsse:UsernameToken></wsse:Security>'
+            .format(ET_NS, escape(auth_stub.internalAuthToken), WSSE_NS))
+
+
+def build_retrieve_envelope(auth_stub, object_type=None, props=None, search_filter=None,
+                            batch_size=None, continue_request=None):
+    """
+    Build the RetrieveRequest envelope of a first page (`object_type`,
+    `props` and an optional `search_filter`) or of the continuation page of
+    the request with the ID `continue_request`.
+    """
+    request = ''
+
+    if continue_request is not None:
+        request += _element('ContinueRequest', continue_request)
+    else:
+        request += _element('ObjectType', object_type)
+        request += _element('Properties', props or [])
+
+        if search_filter:
+            request += _filter_part(search_filter)
+
+    if batch_size:
+        request += '<Options>{}</Options>'.format(_element('BatchSize', batch_size))
+
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<soap:Envelope xmlns:soap="{0}" xmlns:xsi="{1}">'
+            '<soap:Header>{2}</soap:Header>'
+            '<soap:Body><RetrieveRequestMsg xmlns="{3}"><RetrieveRequest>{4}</RetrieveRequest>'
+            '</RetrieveRequestMsg></soap:Body></soap:Envelope>'
+            .format(SOAP_NS, XSI_NS, _header(auth_stub), PARTNER_API_NS, request)).encode('utf-8')
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+# convert an element to a value: elements with children become dictionaries
+# (repeated or 'LIST_ELEMENTS' children become lists), empty or nil elements
+# become None and 'xsd:dateTime' text is formatted like 'sudsobj_to_dict' does
+def _to_value(element, parse_dates=True):
+    if element.get('{{{}}}nil'.format(XSI_NS)) == 'true':
+        return None
+
+    if len(element) == 0:
+        text = element.text
+
+        if not text:
+            return None
+
+        if parse_dates and DATETIME_PATTERN.match(text):
+            return text[:19] + 'Z'
+
+        return text
+
+    to_return = {}
+
+    for child in element:
+        name = _local_name(child.tag)
+        # data extension values are strings, whatever they look like
+        value = _to_value(child, parse_dates and name != 'Property')
+
+        if name in LIST_ELEMENTS:
+            to_return.setdefault(name, []).append(value)
+        elif name in to_return:
+            if not isinstance(to_return[name], list):
+                to_return[name] = [to_return[name]]
+            to_return[name].append(value)
+        else:
+            to_return[name] = value
+
+    return to_return
+
+
+class RetrieveResponseParser():
+    """
+    Incremental parser of a 'RetrieveResponseMsg'. 'feed' takes the next
+    bytes of the body and returns the 'Results' completed by them, as
+    dictionaries. 'overall_status' and 'request_id' are set once parsed.
+    """
+
+    def __init__(self):
+        self.parser = ElementTree.XMLPullParser(events=('start', 'end'))
+        self.stack = []
+        self.overall_status = None
+        self.request_id = None
+        self.fault = None
+
+    def feed(self, data):
+        self.parser.feed(data)
+        return self._read_events()
+
+    def close(self):
+        self.parser.close()
+        return self._read_events()
+
+    def _read_events(self):
+        results = []
+
+        for event, element in self.parser.read_events():
+            if event == 'start':
+                self.stack.append(element)
+                continue
+
+            self.stack.pop()
+            name = _local_name(element.tag)
+            parent = _local_name(self.stack[-1].tag) if self.stack else None
+
+            if parent == 'RetrieveResponseMsg':
+                if name == 'Results':
+                    results.append(_to_value(element))
+                    # drop the record from the tree, so it does not grow with the batch size
+                    self.stack[-1].remove(element)
+                elif name == 'OverallStatus':
+                    self.overall_status = element.text
+                elif name == 'RequestID':
+                    self.request_id = element.text
+
+            elif parent == 'Fault' and name == 'faultstring':
+                self.fault = element.text
+
+        return results
+
+
+# post 'envelope' and yield the results while the response body is downloaded,
+# the 'parser' holds the status of the page once all its results are yielded
+def _retrieve_page(auth_stub, envelope, parser, timeout):
+    # the keep-alive session of the 'auth_stub', see 'client.get_auth_stub'
+    session = getattr(auth_stub, 'session', None) or requests
+
+    # the request holds a slot of the 'GOVERNOR' until the response headers,
+    # not while the records are yielded, as the caller may request more pages
+    ticket = GOVERNOR.acquire()
+
+    try:
+        response = session.post(auth_stub.soap_endpoint,
+                                data=envelope,
+                                headers={'Content-Type': 'text/xml; charset=utf-8',
+                                         'SOAPAction': '"Retrieve"',
+                                         'User-Agent': USER_AGENT},
+                                stream=True,
+                                timeout=timeout)
+        # a failed response holds a fault (if not an error page) telling whether
+        # the request was throttled, it is small so it is read before the release
+        content = response.content if response.status_code != 200 else None
+    except Exception as e:
+        GOVERNOR.release(ticket, throttled=is_congestion_error(e), failed=True)
+        raise
+
+    if content is not None:
+        response.close()
+        fault = read_fault(content)
+        GOVERNOR.release(ticket, throttled=is_throttled(response.status_code, fault), failed=True)
+        check_page(parser, response.status_code, fault)
+
+    GOVERNOR.release(ticket)
+
+    with response:
+        try:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                yield from parser.feed(chunk)
+        except Exception as e:
+            # a body cut short (a read timeout, a dropped connection) is a sign of load
+            if is_congestion_error(e):
+                GOVERNOR.congested(ticket)
+            raise
+
+        yield from parser.close()
+
+    check_page(parser, response.status_code)
+
+
+# the fault of the failed response 'content', None if it is not a SOAP fault
+def read_fault(content):
+    parser = RetrieveResponseParser()
+
+    try:
+        for _ in parser.feed(content):
+            pass
+        for _ in parser.close():
+            pass
+    except ElementTree.ParseError:
+        return None
+
+    return parser.fault
+
+
+# raise if the page parsed by 'parser' (with the HTTP 'status_code') failed,
+# a 'ThrottleError' if it was throttled, 'fault' overrides the one of the 'parser'
+def check_page(parser, status_code, fault=None):
+    fault = fault or parser.fault
+
+    if is_throttled(status_code, fault):
+        raise ThrottleError("Request throttled with '{}'"
+                            .format(fault or status_code))
+
+    if status_code != 200 or fault is not None:
+        raise RuntimeError("Request failed with '{}'"
+                           .format(fault or status_code))
+
+    if parser.overall_status not in ('OK', 'MoreDataAvailable'):
+        raise RuntimeError("Request failed with '{}'"
+                           .format(parser.overall_status))
+
+
+def stream_retrieve(name, auth_stub, object_type, props=None, search_filter=None,
+                    batch_size=2500, timeout=None):
+    """
+    Given an object name (`name`), used for logging purposes only, the
+    `object_type` to retrieve (e.g. 'ClickEvent'), the `props` to return
+    (all the retrievable properties when None) and an optional
+    `search_filter`, return a generator that yields all the records as
+    dictionaries, following the continuation pages. `timeout` is the
+    request timeout, in seconds. A page failing on a transient error is
+    requested again, see `page_retry.retry_streamed_page`.
+    """
+    if props is None:
+        props = get_retrievable_props(auth_stub, object_type)
+
+    continue_request = None
+    parser = None
+
+    # request the page of 'continue_request' (the first one when None), a
+    # failed page is requested again with the same ContinueRequest ID
+    def request_page():
+        nonlocal parser
+        auth_stub.refresh_token()
+
+        envelope = build_retrieve_envelope(auth_stub,
+                                           object_type=object_type,
+                                           props=props,
+                                           search_filter=search_filter,
+                                           batch_size=batch_size,
+                                           continue_request=continue_request)
+        parser = RetrieveResponseParser()
+
+        return _retrieve_page(auth_stub, envelope, parser, timeout)
+
+    while True:
+        count = 0
+
+        for item in retry_streamed_page(request_page):
+            count += 1
+            yield item
+
+        LOGGER.info('Got %s results from %s endpoint.', count, name)
+
+        if parser.overall_status != 'MoreDataAvailable':
+            break
+
+        LOGGER.info("Getting more results from '{}' endpoint".format(name))
+        continue_request = parser.request_id
+
+    LOGGER.info("Done retrieving results from '{}' endpoint".format(name))
@@ -1,20 +1,32 @@
 from dateutil.parser import parse
 
+import copy
 import datetime
+import threading
+import time
 import singer
 
-from voluptuous import Schema, Required
+from voluptuous import Schema, Required, Optional
 
 from tap_marketingcloud.pagination import DATE_FORMAT
+from tap_marketingcloud.util import get_positive_int
 
 LOGGER = singer.get_logger()
 
+# serializes the RECORD, SCHEMA and STATE messages written by the
+# stream workers when streams are synced concurrently
+OUTPUT_LOCK = threading.RLock()
+
 STATE_SCHEMA = Schema({
     Required('bookmarks'): {
         str: {
             Required('last_record'): str,
             Required('field'): str,
         }
+    },
+    # window sizes (in seconds) learned by the adaptive pagination
+    Optional('window_sizes'): {
+        str: int
     }
 })
 
@@ -46,6 +58,23 @@ def get_end_date(config: dict):
     return end_date
 
 
+# parse a replication key value into a (naive) datetime
+# the values formatted by 'sudsobj_to_dict' (e.g. '2021-08-24T18:00:00Z')
+# are parsed directly, the other formats (e.g. '8/24/2021 6:00:00 PM' of
+# the data extensions) with 'dateutil'
+def parse_bookmark_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.replace(tzinfo=None)
+
+    if len(value) == 20 and value[10] == 'T' and value[19] == 'Z':
+        try:
+            return datetime.datetime.fromisoformat(value[:19])
+        except ValueError:
+            pass
+
+    return parse(value).replace(tzinfo=None)
+
+
 # updated the state file with the provided value
 def incorporate(state, table, field, value):
     if value is None:
@@ -53,7 +82,7 @@ def incorporate(state, table, field, value):
 
     new_state = state.copy()
 
-    parsed = parse(value).strftime("%Y-%m-%dT%H:%M:%SZ")
+    parsed = parse_bookmark_value(value).strftime("%Y-%m-%dT%H:%M:%SZ")
 
     if 'bookmarks' not in new_state:
         new_state['bookmarks'] = {}
@@ -74,13 +103,185 @@ def incorporate(state, table, field, value):
     return new_state
 
 
+class BookmarkTracker():
+    """
+    Latest replication key value of the records of every table, kept as a
+    datetime while the records are written and incorporated into the state
+    only by 'write' (when a checkpoint is taken), instead of copying the
+    state and formatting the value for every record.
+    """
+
+    def __init__(self):
+        # (field, datetime) of every table
+        self.bookmarks = {}
+
+    # keep the 'value' of the replication key 'field' of a 'table' record if it is the latest
+    def observe(self, table, field, value):
+        if value is None:
+            return
+
+        parsed = parse_bookmark_value(value)
+        bookmark = self.bookmarks.get(table)
+
+        if bookmark is None or bookmark[1] < parsed:
+            self.bookmarks[table] = (field, parsed)
+
+    # incorporate the latest values into 'state' and return it
+    def write(self, state):
+        for table, (field, value) in self.bookmarks.items():
+            state = incorporate(state, table, field, value)
+
+        self.bookmarks.clear()
+
+        return state
+
+
+# get the window size learned for the 'table' in an earlier run
+def get_window_size(state, table):
+    return state.get('window_sizes', {}).get(table)
+
+
+# record the window size of the 'table' to start the next run from
+def set_window_size(state, table, seconds):
+    new_state = state.copy()
+
+    new_state['window_sizes'] = dict(new_state.get('window_sizes', {}))
+    new_state['window_sizes'][table] = seconds
+
+    return new_state
+
+
+# shapes of the states that passed the 'STATE_SCHEMA' validation
+VALIDATED_STATE_SHAPES = set()
+
+
+# the keys and value types of 'state', which is all 'STATE_SCHEMA' checks
+# a state with the shape of a valid state is valid
+def _get_state_shape(state):
+    return (
+        tuple(sorted(state)),
+        tuple(sorted((table, tuple(sorted((key, type(value)) for key, value in bookmark.items())))
+                     for table, bookmark in state.get('bookmarks', {}).items())),
+        tuple(sorted((table, type(seconds)) for table, seconds in state.get('window_sizes', {}).items()))
+    )
+
+
+# validate the state with 'STATE_SCHEMA', once per shape of state
+def validate_state(state):
+    try:
+        shape = _get_state_shape(state)
+    except (AttributeError, TypeError):
+        # not even shaped like a state, the validation tells what is wrong
+        shape = None
+
+    if shape is not None and shape in VALIDATED_STATE_SHAPES:
+        return
+
+    STATE_SCHEMA(state)
+
+    if shape is not None:
+        VALIDATED_STATE_SHAPES.add(shape)
+
+
 # save the state
 def save_state(state):
     if not state:
         return
 
-    STATE_SCHEMA(state)
+    validate_state(state)
 
     LOGGER.info('Updating state.')
 
-    singer.write_state(state)
+    with OUTPUT_LOCK:
+        singer.write_state(state)
+
+
+class CheckpointPolicy():
+    """
+    Decides which checkpoints of a stream accessor emit a STATE message.
+
+    With 'records', 'seconds' or 'windows' set, a checkpoint is emitted
+    once that many records were written, seconds have passed or
+    checkpoints (windows or batches) were taken since the last STATE,
+    whichever comes first; the other checkpoints only update the state of
+    the accessor. With none of them set, every checkpoint is emitted.
+    """
+
+    def __init__(self, records=0, seconds=0, windows=0, clock=time.monotonic):
+        self.records = records
+        self.seconds = seconds
+        self.windows = windows
+        self.clock = clock
+        self.records_written = 0
+        self.windows_taken = 0
+        self.last_emitted = clock()
+        # whether a checkpoint was taken but not emitted
+        self.pending = False
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(records=get_positive_int(config, 'checkpoint_interval_records', 0),
+                   seconds=get_positive_int(config, 'checkpoint_interval_seconds', 0),
+                   windows=get_positive_int(config, 'checkpoint_interval_windows', 0))
+
+    # count the records written since the last checkpoint
+    def record(self, count=1):
+        self.records_written += count
+
+    # take a checkpoint and return whether it is emitted, always when 'force'
+    def should_emit(self, force=False):
+        self.windows_taken += 1
+
+        emit = force or not (self.records or self.seconds or self.windows) \
+            or (self.records and self.records_written >= self.records) \
+            or (self.windows and self.windows_taken >= self.windows) \
+            or (self.seconds and self.clock() - self.last_emitted >= self.seconds)
+
+        if emit:
+            self.records_written = 0
+            self.windows_taken = 0
+            self.last_emitted = self.clock()
+
+        self.pending = not emit
+
+        return bool(emit)
+
+
+class MergedState():
+    """
+    Run-wide state that the state of every stream accessor is merged into.
+
+    Each accessor works on its own copy of the state, so when streams are
+    synced concurrently the bookmarks of one stream would otherwise be
+    overwritten by the STATE messages of another. A bookmark is only ever
+    moved forward, so merging a stale copy of another stream's bookmark
+    never rolls it back.
+    """
+
+    def __init__(self, state):
+        self.state = copy.deepcopy(state)
+
+    # return a copy of the run-wide state for an accessor to work on
+    def copy(self):
+        with OUTPUT_LOCK:
+            return copy.deepcopy(self.state)
+
+    # merge the bookmarks of 'state' into the run-wide state
+    def merge(self, state):
+        with OUTPUT_LOCK:
+            for table, bookmark in state.get('bookmarks', {}).items():
+                bookmarks = self.state.setdefault('bookmarks', {})
+                current = bookmarks.get(table)
+
+                if current is None or current.get('last_record') < bookmark.get('last_record'):
+                    bookmarks[table] = bookmark.copy()
+
+            if state.get('window_sizes'):
+                self.state.setdefault('window_sizes', {}).update(state['window_sizes'])
+
+    # merge the state of an accessor and emit the run-wide state, the lock
+    # guarantees the STATE is written after the records it covers
+    def save(self, state):
+        with OUTPUT_LOCK:
+            self.merge(state)
+            save_state(self.state)
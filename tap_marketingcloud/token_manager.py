@@ -0,0 +1,111 @@
+import threading
+import time
+import singer
+
+LOGGER = singer.get_logger()
+
+# FuelSDK refreshes the token when it expires within this many seconds
+FUELSDK_REFRESH_WINDOW = 300
+
+# seconds before the expiry the token is refreshed in the background,
+# more than 'FUELSDK_REFRESH_WINDOW' so a request never has to refresh it
+TOKEN_REFRESH_MARGIN = 600
+
+# seconds to wait before retrying a failed background refresh
+TOKEN_REFRESH_RETRY_INTERVAL = 30
+
+
+class TokenManager():
+    """
+    Keeps the token of a FuelSDK 'ET_Client' ('auth_stub') fresh.
+
+    FuelSDK calls 'auth_stub.refresh_token()' before every SOAP call, and
+    the call that comes in the last few minutes before the expiry does the
+    token request itself. The manager replaces 'refresh_token' on the
+    'auth_stub': while the cached token is valid it returns straight away
+    without taking any lock, and a background thread refreshes the token
+    'margin' seconds before it expires, so the requests (and the threads
+    sharing the 'auth_stub') never wait on a token request. If the token
+    expires anyway, e.g. after failed background refreshes, the call is
+    made under a lock so only one thread refreshes it.
+
+    'on_refresh' is called with the 'auth_stub' after every refresh. FuelSDK
+    builds a new SOAP client when it refreshes the token, and sets it on
+    the 'auth_stub' before 'on_refresh' is called, so the options the other
+    threads must see on the new client are set when it is built (see
+    'fuel_overrides.tap_marketingcloud__set_client_cache').
+    """
+
+    def __init__(self, auth_stub, on_refresh=None, margin=TOKEN_REFRESH_MARGIN):
+        self.auth_stub = auth_stub
+        self.on_refresh = on_refresh
+        self.margin = margin
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+        self._refresh_token = getattr(auth_stub, 'refresh_token', None)
+
+        if self._refresh_token is not None:
+            auth_stub.refresh_token = self.refresh_token
+
+    # expiry of the current token in seconds since epoch, None if unknown
+    def _get_expiration(self):
+        expiration = getattr(self.auth_stub, 'authTokenExpiration', None)
+        if isinstance(expiration, (int, float)):
+            return expiration
+        return None
+
+    def _is_valid(self, window):
+        expiration = self._get_expiration()
+        return (self.auth_stub.authToken is not None and
+                expiration is not None and
+                time.time() + window <= expiration)
+
+    def _refresh(self, force_refresh):
+        with self.lock:
+            # another thread may have refreshed it while this one waited
+            if not force_refresh and self._is_valid(FUELSDK_REFRESH_WINDOW):
+                return
+
+            self._refresh_token(force_refresh=force_refresh)
+
+            if self.on_refresh is not None:
+                self.on_refresh(self.auth_stub)
+
+    # replacement of 'auth_stub.refresh_token'
+    def refresh_token(self, force_refresh=False):
+        if not force_refresh and self._is_valid(FUELSDK_REFRESH_WINDOW):
+            return
+
+        self._refresh(force_refresh)
+
+    def _run(self):
+        wait = self._get_wait()
+
+        while not self.stopped.wait(wait):
+            try:
+                LOGGER.info('Refreshing the access token before it expires.')
+                self._refresh(force_refresh=True)
+                wait = self._get_wait()
+            except Exception as e:  # pylint: disable=broad-except
+                LOGGER.warning('Failed to refresh the access token, retrying in %s seconds: %s',
+                               TOKEN_REFRESH_RETRY_INTERVAL, e)
+                wait = TOKEN_REFRESH_RETRY_INTERVAL
+
+    # seconds to wait before refreshing the current token
+    def _get_wait(self):
+        return max(self._get_expiration() - self.margin - time.time(), 0)
+
+    # start refreshing the token in the background, if its expiry is known
+    def start(self):
+        if self._refresh_token is None or self._get_expiration() is None:
+            LOGGER.info('Token expiry unknown, the token is refreshed on demand only.')
+            return self
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
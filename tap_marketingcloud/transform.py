@@ -0,0 +1,279 @@
+import copy
+import singer
+
+from singer import metadata, Transformer
+from singer.transform import Error, SchemaMismatch, string_to_datetime
+from singer.transform import LOGGER as TRANSFORM_LOGGER
+
+"""
+This module compiles the singer 'Transformer' logic for a stream once, from
+the catalog schema and metadata, instead of setting it up for every record.
+
+'RecordTransformer.transform' gives the same output as:
+
+    with Transformer() as transformer:
+        transformer.transform(record, schema, metadata.to_map(mdata))
+
+Scalar fields (string, integer, number, boolean, with an optional
+date-time format) are converted by precompiled steps, which mirror
+'Transformer._transform'. Any other field (objects, arrays, 'anyOf',
+decimals) is handed over to a single 'Transformer' built for the stream.
+Schemas or metadata that cannot be compiled, like nested metadata, fall
+back to the 'Transformer' for the whole record.
+"""
+
+LOGGER = singer.get_logger()
+
+
+def _transform_null(data):
+    if data is None or data == "":
+        return True, None
+    return False, None
+
+
+def _transform_datetime(data):
+    if data is None or data == "":
+        return False, None
+
+    data = string_to_datetime(data)
+    if data is None:
+        return False, None
+
+    return True, data
+
+
+def _transform_string(data):
+    if data is not None:
+        try:
+            return True, str(data)
+        except:  # pylint: disable=bare-except
+            return False, None
+    return False, None
+
+
+def _transform_integer(data):
+    if isinstance(data, str):
+        data = data.replace(",", "")
+
+    try:
+        return True, int(data)
+    except:  # pylint: disable=bare-except
+        return False, None
+
+
+def _transform_number(data):
+    if isinstance(data, str):
+        data = data.replace(",", "")
+
+    try:
+        return True, float(data)
+    except:  # pylint: disable=bare-except
+        return False, None
+
+
+def _transform_boolean(data):
+    if isinstance(data, str) and data.lower() == "false":
+        return True, False
+
+    try:
+        return True, bool(data)
+    except:  # pylint: disable=bare-except
+        return False, None
+
+
+SCALAR_STEPS = {
+    'string': _transform_string,
+    'integer': _transform_integer,
+    'number': _transform_number,
+    'boolean': _transform_boolean,
+}
+
+
+# order the types like 'Transformer.transform_recur' does, 'null' is always tried last
+# the schema is updated in place, the same as the 'Transformer' does
+def _normalize_types(schema):
+    types = schema['type']
+    if not isinstance(types, list):
+        types = [types]
+
+    if 'null' in types:
+        types.remove('null')
+        types.append('null')
+
+    if isinstance(schema['type'], list):
+        schema['type'] = types
+
+    return types
+
+
+# return the list of steps to convert a value of 'schema',
+# or None if the field has to go through the 'Transformer'
+def _compile_field(schema):
+    if 'anyOf' in schema:
+        return None
+
+    if 'type' not in schema:
+        # no typing information, the value is kept as is
+        return []
+
+    steps = []
+
+    for typ in _normalize_types(schema):
+        if typ == 'null':
+            steps.append(_transform_null)
+        elif schema.get('format') == 'date-time':
+            steps.append(_transform_datetime)
+        elif schema.get('format') == 'singer.decimal':
+            return None
+        elif typ in SCALAR_STEPS:
+            steps.append(SCALAR_STEPS[typ])
+        elif typ in ('object', 'array'):
+            return None
+        else:
+            # unknown type, never matches
+            steps.append(lambda data: (False, None))
+
+    return steps
+
+
+# check if the top level of the schema is a plain object with properties
+def _is_compilable(schema, mdata):
+    if not isinstance(schema, dict):
+        return False
+
+    if 'anyOf' in schema or schema.get('patternProperties') or not schema.get('properties'):
+        return False
+
+    types = schema.get('type')
+    if not isinstance(types, list):
+        types = [types]
+
+    if 'object' not in types or set(types) - {'object', 'null'}:
+        return False
+
+    if schema.get('format') is not None:
+        return False
+
+    # only the metadata of the top level properties can be compiled
+    return all(len(breadcrumb) <= 2 for breadcrumb in mdata)
+
+
+# get the top level fields the 'Transformer' removes from the records
+# of a stream as they are not selected or unsupported
+def get_filtered_fields(mdata):
+    filtered = set()
+
+    for breadcrumb, field_metadata in (mdata or {}).items():
+        if len(breadcrumb) != 2:
+            continue
+
+        if field_metadata.get('inclusion') == 'automatic':
+            continue
+
+        if field_metadata.get('selected') is False or field_metadata.get('inclusion') == 'unsupported':
+            filtered.add(breadcrumb[1])
+
+    return filtered
+
+
+class RecordTransformer():
+    """
+    Transformer of the records of one stream, built once from the catalog
+    'schema' and the metadata map 'mdata'.
+
+    The fields of the records missing from the schema are removed, as the
+    singer Transformer does, and logged once per stream by 'log_removed'
+    instead of on every record.
+    """
+
+    def __init__(self, schema, mdata):
+        self.schema = copy.deepcopy(schema)
+        self.mdata = mdata or {}
+        self.transformer = Transformer()
+        self.compiled = _is_compilable(self.schema, self.mdata)
+        # paths of the fields removed as they are not in the schema
+        self.removed = set()
+
+        if not self.compiled:
+            LOGGER.info('Schema can not be compiled, records are transformed with the singer Transformer.')
+            return
+
+        # fields removed because they are not selected or unsupported
+        self.filtered = get_filtered_fields(self.mdata)
+
+        self.fields = {}
+
+        for field_name, field_schema in self.schema['properties'].items():
+            self.fields[field_name] = (field_schema, _compile_field(field_schema))
+
+    def _transform_field(self, field_name, value, errors):
+        field_schema, steps = self.fields[field_name]
+
+        if steps is None:
+            # not compiled, use the 'Transformer' for this field
+            self.transformer.errors = errors
+            success, value = self.transformer.transform_recur(value, field_schema, [field_name])
+            return success, value
+
+        if not steps:
+            return True, value
+
+        for step in steps:
+            success, transformed = step(value)
+            if success:
+                return True, transformed
+
+        errors.append(Error([field_name], value, field_schema, logging_level=TRANSFORM_LOGGER.level))
+        return False, None
+
+    # transform 'record' to the schema of the stream
+    def transform(self, record):
+        if not self.compiled or not isinstance(record, dict):
+            transformer = Transformer()
+
+            try:
+                return transformer.transform(record, self.schema, self.mdata)
+            finally:
+                self.removed.update(transformer.removed)
+
+        to_return = {}
+        errors = []
+        success = True
+
+        for field_name, value in record.items():
+            if field_name not in self.fields:
+                if field_name not in self.filtered:
+                    self.removed.add(field_name)
+                continue
+
+            if field_name in self.filtered:
+                continue
+
+            field_success, to_return[field_name] = self._transform_field(field_name, value, errors)
+            success = success and field_success
+
+        if not success:
+            # the record itself does not match the schema either, like in 'Transformer.transform_recur'
+            data = {key: value for key, value in record.items() if key not in self.filtered}
+            errors.append(Error([], data, self.schema, logging_level=TRANSFORM_LOGGER.level))
+            raise SchemaMismatch(errors)
+
+        return to_return
+
+    # log the paths removed from the records of 'stream' as they are not in the
+    # schema, like 'Transformer.log_warning' does, and start collecting them again
+    def log_removed(self, stream):
+        removed = self.removed | self.transformer.removed
+
+        if removed:
+            LOGGER.warning("Removed %s paths not in the schema of '%s' during transforms: %s",
+                           len(removed), stream, sorted(removed))
+
+        self.removed.clear()
+        self.transformer.removed.clear()
+
+
+# build the transformer of a catalog entry
+def compile_transformer(catalog):
+    return RecordTransformer(catalog.get('schema'),
+                             metadata.to_map(catalog.get('metadata') or []))
@@ -0,0 +1,93 @@
+import io
+import http.client
+import requests
+import singer
+
+from requests.adapters import HTTPAdapter
+from suds.properties import Unskin
+from suds.transport import Reply, TransportError
+from suds.transport.https import HttpAuthenticated
+
+LOGGER = singer.get_logger()
+
+# default number of connections kept open to each host
+HTTP_POOL_SIZE = 10
+
+
+def get_session(pool_size=HTTP_POOL_SIZE, compression=True):
+    """
+    Return a `requests` session keeping up to `pool_size` connections alive
+    per host, shared by all the requests of the tap (SOAP and REST), so the
+    connection and the TLS handshake are reused from one call to the next.
+    With `compression`, gzip/deflate responses are requested.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    session.headers['Accept-Encoding'] = 'gzip, deflate' if compression else 'identity'
+
+    return session
+
+
+class PooledTransport(HttpAuthenticated):
+    """
+    suds transport sending the SOAP requests through a shared `requests`
+    session instead of a new urllib connection per call. The `timeout`
+    (and the other options) are the same as for `HttpAuthenticated`.
+    """
+
+    def __init__(self, session, **kwargs):
+        super().__init__(**kwargs)
+        self.session = session
+
+    def send(self, request):
+        self.addcredentials(request)
+
+        response = self.session.post(request.url,
+                                     data=request.message,
+                                     headers=request.headers,
+                                     timeout=request.timeout or self.options.timeout)
+
+        if response.status_code in (http.client.ACCEPTED, http.client.NO_CONTENT):
+            return None
+
+        if response.status_code != http.client.OK:
+            # suds reads the SOAP fault from the error, as with 'HttpTransport'
+            raise TransportError(response.reason, response.status_code, io.BytesIO(response.content))
+
+        return Reply(http.client.OK, response.headers, response.content)
+
+    def __deepcopy__(self, memo={}):  # pylint: disable=dangerous-default-value
+        clone = self.__class__(self.session)
+        Unskin(clone.options).update(Unskin(self.options))
+        return clone
+
+
+class RestSession():
+    """
+    Stand-in for the `requests` module in FuelSDK's REST calls
+    (`requests.get(...)`, ...), sending them through the shared `session`
+    with the request `timeout`.
+    """
+
+    def __init__(self, session, timeout=None):
+        self.session = session
+        self.timeout = timeout
+
+    def _request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self._request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._request('POST', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self._request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self._request('DELETE', url, **kwargs)
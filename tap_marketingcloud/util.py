@@ -1,6 +1,28 @@
 import datetime
+import json
+import os
+import tempfile
 import suds
 
+# marker of a key which is not present in an object
+_MISSING = object()
+
+# return the value of 'key' in the config as a positive integer
+# if value is 0, "0", "" or not passed then 'default' is returned
+def get_positive_int(config, key, default):
+    config_value = config.get(key)
+    if config_value and int(config_value) > 0:
+        return int(config_value)
+    return default
+
+# return the value of 'key' in the config as a boolean
+# the config can hold either a JSON boolean or a "true"/"false" string
+def get_bool(config, key, default=False):
+    config_value = config.get(key)
+    if config_value is None or config_value == '':
+        return default
+    return str(config_value).lower() == 'true'
+
 # divide the collection (date) in the chunk_size
 def partition_all(collection, chunk_size):
     to_yield = []
@@ -31,3 +53,63 @@ def sudsobj_to_dict(obj):
         to_return[key] = sudsobj_to_dict(getattr(obj, key))
 
     return to_return
+
+# get the value of 'key' of a suds object or dictionary, 'default' if it is not present
+def _get_value(obj, key, default):
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+# get the value at 'path' (list of keys) of a suds object or dictionary,
+# 'default' is returned if a key of the path is not present, and when a
+# list is found on the path, the rest of the path is read from every item:
+# get_path(email, ['ContentAreas', 'ID']) -> [1, 2]
+def get_path(obj, path, default=None):
+    for i, key in enumerate(path):
+        if isinstance(obj, list):
+            return [get_path(item, path[i:]) for item in obj]
+
+        if obj is None:
+            return default
+
+        obj = _get_value(obj, key, _MISSING)
+
+        if obj is _MISSING:
+            return default
+
+    return sudsobj_to_dict(obj)
+
+# convert only the 'keys' of a suds object (or dictionary) to a record,
+# without converting the rest of the object, 'derived_fields' maps a field
+# to the '(path, default)' it is read from (see 'get_path')
+def sudsobj_to_record(obj, keys, derived_fields=None):
+    derived_fields = derived_fields or {}
+    to_return = {}
+
+    for key in keys:
+        if key in derived_fields:
+            path, default = derived_fields[key]
+            to_return[key] = get_path(obj, path, default)
+            continue
+
+        value = _get_value(obj, key, _MISSING)
+        if value is not _MISSING:
+            to_return[key] = sudsobj_to_dict(value)
+
+    return to_return
+
+# read the JSON file at 'path', None if it does not exist or is not valid JSON
+def read_json(path):
+    try:
+        with open(path) as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return None
+
+# write 'data' as JSON to 'path' through a temporary file,
+# so a reader never sees a partially written file
+def write_json_atomic(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as json_file:
+        json.dump(data, json_file)
+    os.replace(json_file.name, path)
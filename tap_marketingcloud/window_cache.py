@@ -0,0 +1,176 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+import singer
+
+from tap_marketingcloud.util import read_json, write_json_atomic, get_bool, get_positive_int
+
+LOGGER = singer.get_logger()
+
+# default number of seconds a cached window is replayed for
+WINDOW_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+# default size of the cache, in megabytes
+WINDOW_CACHE_MAX_MB = 1024
+# default number of seconds before now in which a window is always requested
+# again, the lookback of the streams ('delay_in_day') for the records arriving late
+WINDOW_CACHE_REFRESH_SECONDS = 24 * 60 * 60
+
+# the caches in use, by directory
+CACHES = {}
+CACHES_LOCK = threading.Lock()
+
+
+class WindowCache():
+    """
+    On-disk cache of the raw records (as dictionaries) of the date windows
+    of the streams, so a sync started again after a failure replays the
+    windows it had already requested from disk instead of requesting them
+    again.
+
+    A window is keyed by the stream, the search filter (which holds the
+    window bounds) and the requested properties. With the cache, the
+    windows are on the grid of the windows starting at 'start_date' (see
+    'DataAccessObject.get_date_windows'), so the windows of a sync started
+    from a later bookmark are the cached ones. The windows ending less
+    than 'refresh_seconds' (or the lookback of their stream, if longer)
+    ago are neither read from nor written to the cache, as they can still
+    receive records. A cached window is used for 'ttl_seconds', and the
+    oldest windows are removed once the cache holds more than 'max_bytes'.
+
+    The windows sized adaptively ('pagination__adaptive') are not on the
+    grid, so the cache is disabled with them, see 'get_window_cache'.
+    """
+
+    def __init__(self, directory, ttl_seconds=WINDOW_CACHE_TTL_SECONDS,
+                 max_bytes=WINDOW_CACHE_MAX_MB * 1024 * 1024,
+                 refresh_seconds=WINDOW_CACHE_REFRESH_SECONDS):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+
+        # size of every cached window file, by path
+        self.sizes = {}
+        for file_name in os.listdir(directory):
+            if file_name.endswith('.json'):
+                path = os.path.join(directory, file_name)
+                self.sizes[path] = os.path.getsize(path)
+
+        self.total_bytes = sum(self.sizes.values())
+
+    def _get_path(self, stream, search_filter, props):
+        key = json.dumps([stream, search_filter, props], sort_keys=True, default=str)
+        return os.path.join(self.directory, '{}.json'.format(hashlib.sha256(key.encode('utf-8')).hexdigest()))
+
+    # whether the window ending at 'end' (datetime) is old enough to be cached, more
+    # than 'refresh_seconds' (the lookback of the stream) ago if longer than the cache's
+    def is_cacheable(self, end, refresh_seconds=0):
+        refresh_seconds = max(self.refresh_seconds, refresh_seconds)
+        return end <= datetime.datetime.utcnow() - datetime.timedelta(seconds=refresh_seconds)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+        self.total_bytes -= self.sizes.pop(path, 0)
+
+    def _read(self, path):
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except OSError:
+            return None
+
+        if age > self.ttl_seconds:
+            with self.lock:
+                self._remove(path)
+            return None
+
+        return read_json(path)
+
+    def _write(self, path, records):
+        try:
+            write_json_atomic(path, records)
+            size = os.path.getsize(path)
+        except (OSError, TypeError, ValueError) as e:
+            LOGGER.warning('Failed to write the window cache %s: %s', path, e)
+            return
+
+        with self.lock:
+            self.total_bytes += size - self.sizes.get(path, 0)
+            self.sizes[path] = size
+
+            # remove the windows written first until the cache fits
+            if self.total_bytes > self.max_bytes:
+                for old_path in sorted(self.sizes, key=self._get_mtime):
+                    if self.total_bytes <= self.max_bytes or old_path == path:
+                        break
+                    self._remove(old_path)
+
+    @staticmethod
+    def _get_mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
+
+    # get the cached records of the window of 'stream' with 'search_filter'
+    # ending at 'end' (datetime), None when not cached
+    def get(self, stream, search_filter, end, props=None, refresh_seconds=0):
+        if not self.is_cacheable(end, refresh_seconds):
+            return None
+
+        records = self._read(self._get_path(stream, search_filter, props))
+
+        if records is not None:
+            LOGGER.info('Replaying {} records of {} from the window cache.'.format(len(records), stream))
+
+        return records
+
+    # cache the 'records' (dictionaries) of the window, if old enough
+    def put(self, stream, search_filter, end, records, props=None, refresh_seconds=0):
+        if self.is_cacheable(end, refresh_seconds):
+            self._write(self._get_path(stream, search_filter, props), records)
+
+    # get the records of the window of 'stream' with 'search_filter' ending
+    # at 'end', from the cache, or from 'fetch' (returning the records as
+    # dictionaries) when not cached, and cache them
+    def get_or_fetch(self, stream, search_filter, end, fetch, props=None, refresh_seconds=0):
+        records = self.get(stream, search_filter, end, props, refresh_seconds)
+
+        if records is None:
+            records = fetch()
+            self.put(stream, search_filter, end, records, props, refresh_seconds)
+
+        return records
+
+
+# get the window cache of the config, shared by all the streams, None when
+# 'window_cache_path' is not set, or the windows are sized adaptively
+def get_window_cache(config):
+    directory = config.get('window_cache_path')
+
+    if not directory:
+        return None
+
+    if get_bool(config, 'pagination__adaptive'):
+        LOGGER.warning("The window cache is disabled, its windows are not on the grid with 'pagination__adaptive'.")
+        return None
+
+    with CACHES_LOCK:
+        if directory not in CACHES:
+            CACHES[directory] = WindowCache(
+                directory,
+                ttl_seconds=get_positive_int(config, 'window_cache_ttl_seconds', WINDOW_CACHE_TTL_SECONDS),
+                max_bytes=get_positive_int(config, 'window_cache_max_mb', WINDOW_CACHE_MAX_MB) * 1024 * 1024,
+                refresh_seconds=get_positive_int(config, 'window_cache_refresh_seconds',
+                                                 WINDOW_CACHE_REFRESH_SECONDS))
+
+        return CACHES[directory]
@@ -0,0 +1,202 @@
+import asyncio
+import datetime
+import threading
+import unittest
+from unittest import mock
+from tap_marketingcloud.async_client import async_retrieve, create_session, AsyncWindowFetcher
+from tap_marketingcloud.endpoints.events import EventDataAccessObject
+from tap_marketingcloud.governor import RateGovernor
+from test_soap_stream import RESULT, get_response, get_event, get_fault, get_auth_stub
+
+
+# mock 'aiohttp' response, reading the body in chunks of 100 bytes
+class MockedResponse:
+    def __init__(self, body, status=200, fail_at=None):
+        self.body = body
+        self.status = status
+        self.content = self
+        # the offset of the body the download times out at
+        self.fail_at = fail_at
+
+    async def read(self):
+        return self.body
+
+    async def iter_chunked(self, chunk_size):
+        for i in range(0, len(self.body), 100):
+            if self.fail_at is not None and i >= self.fail_at:
+                raise asyncio.TimeoutError()
+            yield self.body[i:i + 100]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+# mock 'aiohttp' session returning the 'bodies' (or the arguments of 'MockedResponse') in order
+class MockedSession:
+    def __init__(self, *bodies):
+        self.bodies = list(bodies)
+        self.posted = []
+        self.closed = False
+
+    async def post(self, url, data, headers):
+        self.posted.append(data)
+        body = self.bodies.pop(0)
+        return MockedResponse(*body) if isinstance(body, tuple) else MockedResponse(body)
+
+    async def close(self):
+        self.closed = True
+
+
+async def retrieve_all(*args, **kwargs):
+    return [record async for record in async_retrieve(*args, **kwargs)]
+
+
+class TestAsyncRetrieve(unittest.TestCase):
+
+    def test_continuation_pages(self):
+        session = MockedSession(get_response([RESULT.format(id=i) for i in range(2)], 'MoreDataAvailable'),
+                                get_response([RESULT.format(id=2)], 'OK', 'request_2'))
+
+        records = asyncio.run(retrieve_all('ClickEvent', session, get_auth_stub(), 'ClickEvent', props=['SendID']))
+
+        # verify all the records are returned and the second page continued the first request
+        self.assertEqual(records, [get_event(i) for i in range(3)])
+        self.assertIn(b'<ContinueRequest>request_1</ContinueRequest>', session.posted[1])
+
+    @mock.patch('tap_marketingcloud.async_client.get_retrievable_props', return_value=['SendID', 'EventDate', 'URL'])
+    def test_fields(self, mocked_get_retrievable_props):
+        session = MockedSession(get_response([]))
+
+        asyncio.run(retrieve_all('ClickEvent', session, get_auth_stub(), 'ClickEvent', fields=['SendID', 'EventDate']))
+
+        # verify only the retrievable properties of the fields are requested
+        self.assertIn(b'<Properties>SendID</Properties><Properties>EventDate</Properties>', session.posted[0])
+        self.assertNotIn(b'<Properties>URL</Properties>', session.posted[0])
+
+    def test_error_status(self):
+        session = MockedSession(get_response([], 'Error: Invalid filter'))
+
+        with self.assertRaises(RuntimeError) as e:
+            asyncio.run(retrieve_all('ClickEvent', session, get_auth_stub(), 'ClickEvent', props=['SendID']))
+
+        self.assertEqual(str(e.exception), "Request failed with 'Error: Invalid filter'")
+
+    @mock.patch('asyncio.sleep', new_callable=mock.AsyncMock)
+    def test_governed(self, mocked_sleep):
+        session = MockedSession((get_fault('Server was unable to process request. ---> Server too busy'), 500),
+                                get_response([RESULT.format(id=1)]))
+        governor = RateGovernor(max_concurrency=4)
+
+        with mock.patch('tap_marketingcloud.async_client.GOVERNOR', governor):
+            records = asyncio.run(retrieve_all('ClickEvent', session, get_auth_stub(), 'ClickEvent', props=['SendID']))
+
+        # verify the requests went through the governor, and the throttled page is
+        # requested again at a lower limit
+        self.assertEqual(records, [get_event(1)])
+        self.assertEqual((governor.requests, governor.throttles, int(governor.limit), governor.in_flight),
+                         (2, 1, 2, 0))
+
+    @mock.patch('asyncio.sleep', new_callable=mock.AsyncMock)
+    def test_failed_page_retried(self, mocked_sleep):
+        second_page = get_response([RESULT.format(id=i) for i in range(2, 5)], 'OK', 'request_2')
+        session = MockedSession(get_response([RESULT.format(id=i) for i in range(2)], 'MoreDataAvailable'),
+                                (second_page, 200, len(second_page) // 2),
+                                second_page)
+
+        records = asyncio.run(retrieve_all('ClickEvent', session, get_auth_stub(), 'ClickEvent', props=['SendID']))
+
+        # verify the failed page is continued again from the same request ID, and no record is repeated
+        self.assertEqual(records, [get_event(i) for i in range(5)])
+        self.assertEqual([b'<ContinueRequest>request_1</ContinueRequest>' in data for data in session.posted],
+                         [False, True, True])
+
+    @mock.patch('tap_marketingcloud.async_client.aiohttp', None)
+    def test_aiohttp_not_installed(self):
+        # verify a missing 'aiohttp' is reported when the client is used
+        with self.assertRaises(Exception) as e:
+            create_session(10)
+
+        self.assertIn('tap-marketingcloud[async]', str(e.exception))
+
+
+class TestAsyncWindowFetcher(unittest.TestCase):
+
+    def test_windows_in_order(self):
+        session = MockedSession()
+        barrier = None
+
+        async def fetch(window, fetch_session):
+            nonlocal barrier
+            barrier = barrier or asyncio.Barrier(3)
+            # only passes if the first windows are fetched at the same time
+            if window < 3:
+                await asyncio.wait_for(barrier.wait(), 5)
+            # the later windows finish first
+            await asyncio.sleep(0.01 * (5 - window))
+            return [window, fetch_session is session]
+
+        fetcher = AsyncWindowFetcher(fetch, 3, session_factory=lambda *args: session)
+        results = list(fetcher.run(iter(range(5))))
+
+        # verify the results are yielded in the order of the windows, and the session is closed
+        self.assertEqual(results, [(window, [window, True]) for window in range(5)])
+        self.assertTrue(session.closed)
+
+    def test_error(self):
+        session = MockedSession()
+
+        async def fetch(window, fetch_session):
+            if window == 1:
+                raise RuntimeError('failed')
+            await asyncio.sleep(0.01)
+            return window
+
+        fetcher = AsyncWindowFetcher(fetch, 10, session_factory=lambda *args: session)
+
+        # verify the error of a window is raised in order, and the session is closed
+        with self.assertRaises(RuntimeError):
+            for window, result in fetcher.run(range(100)):
+                self.assertEqual(window, 0)
+
+        self.assertTrue(session.closed)
+
+    # 'loop.shutdown_default_executor' is not in Python 3.8
+    @mock.patch.object(asyncio.BaseEventLoop, 'shutdown_default_executor', side_effect=AttributeError)
+    def test_executor_shut_down(self, mocked_shutdown):
+        session = MockedSession()
+
+        async def fetch(window, fetch_session):
+            return await asyncio.get_running_loop().run_in_executor(None, threading.current_thread)
+
+        fetcher = AsyncWindowFetcher(fetch, 3, session_factory=lambda *args: session)
+        threads = [thread for _, thread in fetcher.run(range(5))]
+
+        # verify the blocking calls ran on the executor of the fetcher, and its threads are joined
+        self.assertTrue(all(thread.name.startswith('async-window-fetcher') for thread in threads))
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertTrue(session.closed)
+
+
+class TestAsyncEvents(unittest.TestCase):
+
+    @mock.patch('tap_marketingcloud.async_client.get_retrievable_props', return_value=['SendID', 'EventDate'])
+    def test_events_opt_in(self, mocked_get_retrievable_props):
+        session = MockedSession(get_response([RESULT.format(id=1)]))
+        config = {'start_date': '2021-01-01T00:00:00Z', 'async_retrieve__event': 'true'}
+        catalog = {'schema': {'properties': {key: {} for key in ['SendID', 'EventType', 'SubscriberKey', 'EventDate', 'ID']}},
+                   'metadata': []}
+        window = ('click', mock.Mock(return_value=mock.Mock(obj_type='ClickEvent')),
+                  None, datetime.datetime(2021, 1, 2), {'Property': 'EventDate', 'SimpleOperator': 'between',
+                                                         'Value': ['2021-01-01T00:00:00Z', '2021-01-02T00:00:00Z']})
+
+        accessor = EventDataAccessObject(config, {}, get_auth_stub(), catalog)
+        events = list(AsyncWindowFetcher(accessor._fetch_window_async, 1,
+                                         session_factory=lambda *args: session).run([window]))[0][1]
+
+        # verify the events of the asynchronous client are parsed as the ones of 'request'
+        self.assertEqual(events, [{'SendID': '1', 'EventType': 'Click', 'SubscriberKey': 'key_1',
+                                   'EventDate': '2021-08-24T09:56:38Z', 'ID': 'N/A'}])
+        self.assertIn(b'<ObjectType>ClickEvent</ObjectType>', session.posted[0])
@@ -0,0 +1,42 @@
+import unittest
+from unittest import mock
+from tap_marketingcloud.fuel_overrides import TapMarketingcloud__ET_Continue
+from tap_marketingcloud.endpoints.events import EventDataAccessObject
+from tap_marketingcloud.endpoints.subscribers import SubscriberDataAccessObject
+from tap_marketingcloud.endpoints.data_extensions import DataExtensionDataAccessObject
+
+CONFIG = {
+    "start_date": "2021-01-01T00:00:00Z",
+    "batch_size": "2500",
+    "batch_size__subscriber": 500,
+    "batch_size__data_extension": "1000"
+}
+
+
+class TestContinueBatchSize(unittest.TestCase):
+
+    def test_continue_request_batch_size(self):
+        auth_stub = mock.Mock()
+        auth_stub.soap_client.service.Retrieve.return_value = None
+
+        TapMarketingcloud__ET_Continue(auth_stub, 'request_id', 100)
+
+        # verify the continuation request carries the batch size
+        continue_request = auth_stub.soap_client.service.Retrieve.call_args[0][0]
+        self.assertEqual(continue_request.ContinueRequest, 'request_id')
+        self.assertEqual(continue_request.Options.BatchSize, 100)
+
+
+class TestStreamBatchSize(unittest.TestCase):
+
+    def test_default_batch_size(self):
+        dao = EventDataAccessObject({"start_date": "2021-01-01T00:00:00Z"}, {}, None, {})
+
+        # verify the default batch size is used when none is passed
+        self.assertEqual(dao.batch_size, 2500)
+
+    def test_stream_batch_size(self):
+        # verify the 'batch_size__<stream>' overrides 'batch_size' for that stream only
+        self.assertEqual(EventDataAccessObject(CONFIG, {}, None, {}).batch_size, 2500)
+        self.assertEqual(SubscriberDataAccessObject(CONFIG, {}, None, {}).batch_size, 500)
+        self.assertEqual(DataExtensionDataAccessObject(CONFIG, {}, None, {}).batch_size, 1000)
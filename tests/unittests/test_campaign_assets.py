@@ -0,0 +1,74 @@
+import threading
+import unittest
+from unittest import mock
+from tap_marketingcloud.endpoints.campaigns import CampaignDataAccessObject
+from tap_marketingcloud.endpoints.campaign_assets import CampaignAssetDataAccessObject
+from tap_marketingcloud.result_cache import ResultCache
+
+CONFIG = {'start_date': '2021-01-01T00:00:00Z'}
+CATALOG = {'schema': {'type': 'object', 'properties': {'id': {}}}, 'metadata': []}
+CAMPAIGNS = [{'id': i} for i in range(1, 5)]
+
+
+class TestCampaignAssets(unittest.TestCase):
+
+    def setUp(self):
+        # the records written, in order
+        self.output = []
+
+    def write_records_with_transform(self, accessor, record, catalog, table):
+        self.output.append((table, record['id']))
+
+    # campaign listing and one asset per campaign, the later campaigns answered first
+    def request(self, name, selector, auth_stub, props=None, **kwargs):
+        if name == 'Campaign':
+            return iter(CAMPAIGNS)
+        if self.barrier:
+            # only passes if the assets of the campaigns are requested at the same time
+            self.barrier.wait(timeout=5)
+        return iter([{'id': props['id'] * 10}])
+
+    def sync(self, *accessors, barrier=None):
+        self.barrier = barrier
+
+        with mock.patch('tap_marketingcloud.endpoints.campaigns.request', side_effect=self.request) as mocked_request, \
+                mock.patch('tap_marketingcloud.endpoints.campaign_assets.request', side_effect=self.request), \
+                mock.patch('tap_marketingcloud.dao.DataAccessObject.write_records_with_transform',
+                           side_effect=self.write_records_with_transform, autospec=True):
+            for accessor in accessors:
+                accessor.sync_data()
+
+        return mocked_request
+
+    def test_campaign_listing_shared(self):
+        result_cache = ResultCache()
+        accessors = [CampaignDataAccessObject(CONFIG, {}, None, CATALOG), CampaignAssetDataAccessObject(CONFIG, {}, None, CATALOG)]
+        for accessor in accessors:
+            accessor.result_cache = result_cache
+
+        mocked_request = self.sync(*accessors)
+
+        # verify the campaigns are listed once for both streams
+        self.assertEqual(mocked_request.call_count, 1)
+        self.assertEqual(self.output, [('campaign', i) for i in range(1, 5)] +
+                         [('campaign_asset', i * 10) for i in range(1, 5)])
+
+    def test_campaign_listing_filters(self):
+        result_cache = ResultCache()
+        accessors = [CampaignDataAccessObject(CONFIG, {}, None, CATALOG),
+                     CampaignAssetDataAccessObject(dict(CONFIG, filters__campaign_asset={'name': 'Spring'}), {}, None, CATALOG)]
+        for accessor in accessors:
+            accessor.result_cache = result_cache
+
+        mocked_request = self.sync(*accessors)
+
+        # verify the listings with different query parameters are not shared
+        self.assertEqual(mocked_request.call_count, 2)
+
+    def test_assets_in_order(self):
+        accessor = CampaignAssetDataAccessObject(dict(CONFIG, max_concurrent_campaign_asset_requests=4), {}, None, CATALOG)
+
+        self.sync(accessor, barrier=threading.Barrier(4))
+
+        # verify the assets requested at the same time are written in the order of the campaigns
+        self.assertEqual(self.output, [('campaign_asset', i * 10) for i in range(1, 5)])
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from tap_marketingcloud.change_detection import ChangeDetector
+from tap_marketingcloud.endpoints.campaigns import CampaignDataAccessObject
+from tap_marketingcloud.endpoints.list_sends import ListSendDataAccessObject
+from tap_marketingcloud.filters import from_expression
+
+CATALOG = {
+    'stream': 'list_send',
+    'schema': {'type': 'object', 'properties': {'ListID': {'type': ['null', 'integer']},
+                                                'SendID': {'type': ['null', 'integer']},
+                                                'NumberSent': {'type': ['null', 'integer']}}},
+    'metadata': [{'breadcrumb': (), 'metadata': {'selected': True}}]
+}
+
+
+class TestFilterPushdown(unittest.TestCase):
+
+    def test_from_expression(self):
+        # verify one condition makes a simple filter, and several are combined with AND
+        self.assertIsNone(from_expression(None))
+        self.assertEqual(from_expression(['List.ID', 'equals', 1]),
+                         {'Property': 'List.ID', 'SimpleOperator': 'equals', 'Value': 1})
+        self.assertEqual(from_expression([['List.ID', 'IN', [1, 2]], ['Status', 'equals', 'Active']]), {
+            'LogicalOperator': 'AND',
+            'LeftOperand': {'Property': 'List.ID', 'SimpleOperator': 'IN', 'Value': [1, 2]},
+            'RightOperand': {'Property': 'Status', 'SimpleOperator': 'equals', 'Value': 'Active'}
+        })
+        # verify the conditions after the second one are additional operands
+        self.assertEqual(from_expression([['A', 'equals', 1], ['B', 'equals', 2], ['C', 'equals', 3]])['AdditionalOperands'],
+                         [{'Property': 'C', 'SimpleOperator': 'equals', 'Value': 3}])
+
+        with self.assertRaises(ValueError):
+            from_expression([['List.ID', 'equals']])
+
+    @mock.patch('tap_marketingcloud.endpoints.list_sends.request', return_value=iter([]))
+    def test_soap_stream_filter(self, mocked_request):
+        config = {'start_date': '2021-01-01T00:00:00Z', 'filters__list_send': '["List.ID", "equals", 1]'}
+
+        ListSendDataAccessObject(config, {}, None, CATALOG).sync_data()
+
+        # verify the filter of the config (here a JSON string) is sent with the request
+        self.assertEqual(mocked_request.call_args[0][3], {'Property': 'List.ID', 'SimpleOperator': 'equals', 'Value': 1})
+
+    @mock.patch('tap_marketingcloud.endpoints.campaigns.request', return_value=iter([]))
+    def test_rest_stream_params(self, mocked_request):
+        config = {'start_date': '2021-01-01T00:00:00Z', 'filters__campaign': {'name': 'Spring'}}
+
+        CampaignDataAccessObject(config, {}, None, {}).sync_data()
+
+        # verify the query parameters of the config are added to the request
+        self.assertEqual(mocked_request.call_args[1]['props']['name'], 'Spring')
+        self.assertEqual(mocked_request.call_args[1]['props']['$page'], 1)
+
+        with self.assertRaises(ValueError):
+            CampaignDataAccessObject({'start_date': '2021-01-01T00:00:00Z', 'filters__campaign': ['name']},
+                                     {}, None, {}).sync_data()
+
+
+class TestChangeDetector(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'hashes.json')
+
+    def test_changed_records(self):
+        detector = ChangeDetector(self.path)
+
+        # verify all the records are changed on the first run
+        self.assertTrue(detector.changed('list_send', ['ListID'], {'ListID': 1, 'NumberSent': 10}))
+        self.assertTrue(detector.changed('list_send', ['ListID'], {'ListID': 2, 'NumberSent': 20}))
+        detector.save('list_send')
+
+        detector = ChangeDetector(self.path)
+
+        # verify only the new and updated records are changed on the next run
+        self.assertFalse(detector.changed('list_send', ['ListID'], {'ListID': 1, 'NumberSent': 10}))
+        self.assertTrue(detector.changed('list_send', ['ListID'], {'ListID': 2, 'NumberSent': 21}))
+        self.assertTrue(detector.changed('list_send', ['ListID'], {'ListID': 3, 'NumberSent': 30}))
+        # verify a record without its key is always changed
+        self.assertTrue(detector.changed('list_send', ['ListID'], {'NumberSent': 30}))
+
+    def test_failed_sync_keeps_hashes(self):
+        detector = ChangeDetector(self.path)
+        detector.changed('list_send', ['ListID'], {'ListID': 1, 'NumberSent': 10})
+        detector.save('list_send')
+
+        # a run that fails before saving
+        detector = ChangeDetector(self.path)
+        detector.changed('list_send', ['ListID'], {'ListID': 1, 'NumberSent': 11})
+
+        # verify the hashes of the last successful run are used
+        self.assertFalse(ChangeDetector(self.path).changed('list_send', ['ListID'], {'ListID': 1, 'NumberSent': 10}))
+
+    @mock.patch('tap_marketingcloud.dao.singer.write_schema')
+    @mock.patch('tap_marketingcloud.dao.singer.write_record')
+    def test_unchanged_records_not_written(self, mocked_write_record, mocked_write_schema):
+        config = {'start_date': '2021-01-01T00:00:00Z', 'change_detection_path': self.path}
+        records = [{'List': {'ID': 1}, 'SendID': 1, 'NumberSent': 10},
+                   {'List': {'ID': 2}, 'SendID': 1, 'NumberSent': 20}]
+
+        with mock.patch('tap_marketingcloud.endpoints.list_sends.request', side_effect=lambda *a, **k: iter(records)), \
+                mock.patch('tap_marketingcloud.change_detection.DETECTORS', {}):
+            ListSendDataAccessObject(config, {}, None, CATALOG).sync()
+            self.assertEqual(mocked_write_record.call_count, 2)
+
+            records[1]['NumberSent'] = 21
+            ListSendDataAccessObject(config, {}, None, CATALOG).sync()
+
+        # verify only the updated record is written by the second run
+        self.assertEqual(mocked_write_record.call_count, 3)
+        self.assertEqual(mocked_write_record.call_args[0][1]['NumberSent'], 21)
@@ -0,0 +1,185 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import requests
+import suds.client
+from suds.sax.element import Element
+import tap_marketingcloud.client as _client
+from tap_marketingcloud.client_cache import ClientCache, AUTH_MODE_V2
+from tap_marketingcloud.fuel_overrides import _tap_marketingcloud__build_soap_client
+from tap_marketingcloud.transport import PooledTransport
+
+WSDL = """<?xml version="1.0" encoding="utf-8"?>
+<definitions xmlns="http://schemas.xmlsoap.org/wsdl/" xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+             xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:tns="http://exacttarget.com/wsdl/partnerAPI"
+             targetNamespace="http://exacttarget.com/wsdl/partnerAPI">
+  <types>
+    <xsd:schema elementFormDefault="qualified" targetNamespace="http://exacttarget.com/wsdl/partnerAPI">
+      <xsd:complexType name="RetrieveRequest">
+        <xsd:sequence><xsd:element name="{property}" type="xsd:string" minOccurs="0"/></xsd:sequence>
+      </xsd:complexType>
+      <xsd:element name="RetrieveRequestMsg">
+        <xsd:complexType><xsd:sequence>
+          <xsd:element name="RetrieveRequest" type="tns:RetrieveRequest"/>
+        </xsd:sequence></xsd:complexType>
+      </xsd:element>
+    </xsd:schema>
+  </types>
+  <message name="RetrieveRequestMsg"><part name="parameters" element="tns:RetrieveRequestMsg"/></message>
+  <portType name="Soap">
+    <operation name="Retrieve"><input message="tns:RetrieveRequestMsg"/></operation>
+  </portType>
+  <binding name="Soap" type="tns:Soap">
+    <soap:binding transport="http://schemas.xmlsoap.org/soap/http"/>
+    <operation name="Retrieve"><soap:operation soapAction="Retrieve" style="document"/>
+      <input><soap:body use="literal"/></input></operation>
+  </binding>
+  <service name="PartnerAPI">
+    <port name="Soap" binding="tns:Soap"><soap:address location="https://localhost/Service.asmx"/></port>
+  </service>
+</definitions>"""
+
+CONFIG = {
+    "client_id": "client_id_123",
+    "client_secret": "client_secret_123",
+    "tenant_subdomain": "tenant_subdomain_123",
+    "start_date": "2021-01-01T00:00:00Z"
+}
+
+
+# mock 'ET_Client' of a tenant authenticating with V2 only, recording the attempts
+class Mocked_ET_Client:
+    attempts = []
+
+    def __init__(self, params):
+        self.attempts.append(params['useOAuth2Authentication'])
+        if params['useOAuth2Authentication'] == "False":
+            raise Exception('Unauthorized')
+        self.params = params
+
+
+class TestClientCache(unittest.TestCase):
+
+    def setUp(self):
+        Mocked_ET_Client.attempts = []
+        self.path = tempfile.mkdtemp()
+        self.wsdl_url = 'file:///' + os.path.join(self.path, 'ExactTargetWSDL.xml')
+        self.write_wsdl('ObjectType')
+
+    def write_wsdl(self, prop):
+        with open(os.path.join(self.path, 'ExactTargetWSDL.xml'), 'w') as wsdl_file:
+            wsdl_file.write(WSDL.replace('{property}', prop))
+
+    def get_client(self, endpoint='https://endpoint'):
+        return ClientCache(os.path.join(self.path, 'cache')).get_client(self.wsdl_url, endpoint)
+
+    def test_parsed_once_per_run(self):
+        client_cache = ClientCache()
+
+        with mock.patch('suds.client.Definitions', wraps=suds.client.Definitions) as mocked_definitions:
+            clients = [client_cache.get_client(self.wsdl_url, 'https://endpoint') for _ in range(3)]
+
+        # verify the WSDL is parsed once for the clients of the token refreshes
+        self.assertEqual(mocked_definitions.call_count, 1)
+        self.assertEqual(len({id(client) for client in clients}), 3)
+        self.assertIsNotNone(clients[2].factory.create('RetrieveRequest'))
+
+    def test_options_not_shared(self):
+        client_cache = ClientCache()
+        clients = [client_cache.get_client(self.wsdl_url, 'https://endpoint') for _ in range(2)]
+
+        for index, client in enumerate(clients):
+            element_oAuth = Element('fueloauth', ns=('etns', 'http://exacttarget.com'))
+            element_oAuth.setText('token_{}'.format(index))
+            client.set_options(soapheaders=element_oAuth, nosend=True)
+
+        # verify each client builds its messages with its own options, e.g. the
+        # token of the client of an earlier refresh still in use on a thread
+        for index, client in enumerate(clients):
+            envelope = client.service.Retrieve(RetrieveRequest={'ObjectType': 'Send'}).envelope
+            self.assertIn('<etns:fueloauth>token_{}</etns:fueloauth>'.format(index).encode('utf-8'), envelope)
+
+    def test_parsed_once_across_runs(self):
+        with mock.patch('suds.client.Definitions', wraps=suds.client.Definitions) as mocked_definitions:
+            self.get_client()
+            client = self.get_client()
+
+            # verify the next run loads the parsed WSDL from the disk
+            self.assertEqual(mocked_definitions.call_count, 1)
+            self.assertIn('ObjectType', client.factory.create('RetrieveRequest'))
+
+            # verify a new WSDL, or another endpoint, is parsed again
+            self.write_wsdl('Properties')
+            self.assertIn('Properties', self.get_client().factory.create('RetrieveRequest'))
+            self.get_client('https://other_endpoint')
+            self.assertEqual(mocked_definitions.call_count, 3)
+
+    def test_build_soap_client(self):
+        auth_stub = mock.Mock(wsdl_file_url=self.wsdl_url, soap_endpoint='https://endpoint',
+                              use_oAuth2_authentication='True', authToken='token', session=None)
+
+        _tap_marketingcloud__build_soap_client(auth_stub, ClientCache())
+
+        # verify the client of the cache gets the options FuelSDK sets
+        self.assertEqual(auth_stub.soap_client.options.location, 'https://endpoint')
+        self.assertEqual(auth_stub.soap_client.options.soapheaders.getText(), 'token')
+
+    def test_transport_set_before_published(self):
+        session = requests.Session()
+
+        # 'ET_Client' recording the transport of every client set on it
+        class Mocked_ET_Client:
+            wsdl_file_url = self.wsdl_url
+            soap_endpoint = 'https://endpoint'
+            use_oAuth2_authentication = 'True'
+            authToken = 'token'
+            request_timeout = 60
+            transports = []
+
+            @property
+            def soap_client(self):
+                return self._soap_client
+
+            @soap_client.setter
+            def soap_client(self, soap_client):
+                self.transports.append(soap_client.options.transport)
+                self._soap_client = soap_client
+
+        auth_stub = Mocked_ET_Client()
+        client_cache = ClientCache()
+        _tap_marketingcloud__build_soap_client(auth_stub, client_cache)
+        auth_stub.session = session
+        _tap_marketingcloud__build_soap_client(auth_stub, client_cache)
+
+        # verify the client of a token refresh is set on the 'auth_stub' with the pooled transport
+        self.assertEqual(len(auth_stub.transports), 2)
+        self.assertNotIsInstance(auth_stub.transports[0], PooledTransport)
+        self.assertIsInstance(auth_stub.transports[1], PooledTransport)
+        self.assertIs(auth_stub.transports[1].session, session)
+
+    @mock.patch('tap_marketingcloud.client._manage_token', side_effect=lambda auth_stub, *args: auth_stub)
+    @mock.patch('tap_marketingcloud.client._set_transport')
+    @mock.patch('FuelSDK.ET_Client', side_effect=Mocked_ET_Client)
+    def test_auth_mode(self, mocked_ET_Client, mocked_set_transport, mocked_manage_token):
+        config = dict(CONFIG, client_cache_path=os.path.join(self.path, 'cache'))
+
+        _client.get_auth_stub(config)
+        auth_stub = _client.get_auth_stub(config)
+
+        # verify the V1 attempt is made by the first run only, and the WSDL is downloaded to the cache
+        self.assertEqual(Mocked_ET_Client.attempts, ["False", "True", "True"])
+        self.assertEqual(auth_stub.params['wsdl_file_local_loc'], os.path.join(self.path, 'cache', 'ExactTargetWSDL.xml'))
+        self.assertEqual(ClientCache(config['client_cache_path']).get_auth_mode('tenant_subdomain_123', 'client_id_123'),
+                         AUTH_MODE_V2)
+
+    @mock.patch('tap_marketingcloud.client._manage_token', side_effect=lambda auth_stub, *args: auth_stub)
+    @mock.patch('tap_marketingcloud.client._set_transport')
+    @mock.patch('FuelSDK.ET_Client', side_effect=Mocked_ET_Client)
+    def test_no_cache_path(self, mocked_ET_Client, mocked_set_transport, mocked_manage_token):
+        _client.get_auth_stub(CONFIG)
+        auth_stub = _client.get_auth_stub(CONFIG)
+
+        # verify both endpoints are tried on every run, and FuelSDK keeps its WSDL location
+        self.assertEqual(Mocked_ET_Client.attempts, ["False", "True", "False", "True"])
+        self.assertNotIn('wsdl_file_local_loc', auth_stub.params)
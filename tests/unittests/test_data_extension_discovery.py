@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import suds
+from tap_marketingcloud.endpoints.data_extensions import DataExtensionDataAccessObject
+
+
+def get_sudsobj(**kwargs):
+    obj = suds.sudsobject.Object()
+    for key, value in kwargs.items():
+        setattr(obj, key, value)
+    return obj
+
+
+def get_field(customer_key, name, field_type='Text', is_primary_key=False):
+    return get_sudsobj(Name=name, FieldType=field_type, Description=name, IsPrimaryKey=is_primary_key,
+                       DataExtension=get_sudsobj(CustomerKey=customer_key))
+
+
+# mock 'request' returning the data extensions, and the fields matching the search filter
+class MockedRequest:
+    def __init__(self, modified_dates):
+        self.modified_dates = modified_dates
+        self.field_filters = []
+        self.fields = [
+            get_field('de1', 'id', 'Number', True),
+            get_field('de2', 'name'),
+            get_field('de1', 'ModifiedDate', 'Date'),
+            get_field('de3', 'amount', 'Decimal'),
+            get_field('de1', 'active', 'Boolean'),
+            get_field('de2', '_CustomObjectKey'),
+        ]
+
+    def __call__(self, name, selector, auth_stub, search_filter=None, props=None, batch_size=2500):
+        if name == 'DataExtension':
+            return [get_sudsobj(CustomerKey=key, Name='DE {}'.format(key), ModifiedDate=modified_date)
+                    for key, modified_date in self.modified_dates.items()]
+
+        self.field_filters.append(search_filter)
+
+        if search_filter is None:
+            return iter(self.fields)
+
+        customer_keys = search_filter['Value']
+        if search_filter['SimpleOperator'] == 'equals':
+            customer_keys = [customer_keys]
+
+        return iter([field for field in self.fields if field.DataExtension.CustomerKey in customer_keys])
+
+
+class TestDataExtensionDiscovery(unittest.TestCase):
+
+    def discover(self, config, mocked_request):
+        with mock.patch('tap_marketingcloud.endpoints.data_extensions.request', mocked_request):
+            dao = DataExtensionDataAccessObject(dict(config, start_date='2021-01-01T00:00:00Z'), {}, None, {})
+            return {catalog['tap_stream_id']: catalog for catalog in dao.generate_catalog()}
+
+    def test_catalog(self):
+        mocked_request = MockedRequest({'de1': '2021-01-01', 'de2': '2021-01-01'})
+        catalogs = self.discover({}, mocked_request)
+
+        # verify all the fields are requested through one cursor
+        self.assertEqual(mocked_request.field_filters, [None])
+
+        de1 = catalogs['data_extension.de1']
+        self.assertEqual(de1['stream'], 'data_extension.DE de1')
+        self.assertEqual(de1['key_properties'], ['_CustomObjectKey', 'id'])
+        self.assertEqual(list(de1['schema']['properties']),
+                         ['_CustomObjectKey', 'CategoryID', 'id', 'ModifiedDate', 'active'])
+        self.assertEqual(de1['schema']['properties']['id'], {'type': ['null', 'integer'], 'description': 'id'})
+        self.assertEqual(de1['metadata'][0]['metadata'], {
+            'inclusion': 'available',
+            'forced-replication-method': 'INCREMENTAL',
+            'table-key-properties': ['_CustomObjectKey', 'id'],
+            'valid-replication-keys': ['ModifiedDate']
+        })
+        self.assertEqual([(mdata['breadcrumb'], mdata['metadata']['inclusion']) for mdata in de1['metadata'][1:]], [
+            (('properties', '_CustomObjectKey'), 'automatic'),
+            (('properties', 'CategoryID'), 'available'),
+            (('properties', 'id'), 'automatic'),
+            (('properties', 'ModifiedDate'), 'automatic'),
+            (('properties', 'active'), 'available'),
+        ])
+
+        # verify the empty 'valid-replication-keys' is removed, and the default fields are not added again
+        de2 = catalogs['data_extension.de2']
+        self.assertEqual(de2['metadata'][0]['metadata']['forced-replication-method'], 'FULL_TABLE')
+        self.assertNotIn('valid-replication-keys', de2['metadata'][0]['metadata'])
+        self.assertEqual(len(de2['metadata']), 4)
+
+    @mock.patch('tap_marketingcloud.endpoints.data_extensions.DISCOVERY_BATCH_SIZE', 2)
+    def test_concurrent_field_requests(self):
+        modified_dates = {'de1': '2021-01-01', 'de2': '2021-01-01', 'de3': '2021-01-01'}
+        serial = self.discover({}, MockedRequest(modified_dates))
+
+        mocked_request = MockedRequest(modified_dates)
+        concurrent = self.discover({'max_concurrent_discovery_requests': 2}, mocked_request)
+
+        # verify the fields are requested in batches of data extensions, with the same catalog
+        self.assertEqual(sorted(str(search_filter) for search_filter in mocked_request.field_filters), [
+            str({'Property': 'DataExtension.CustomerKey', 'SimpleOperator': 'IN', 'Value': ['de1', 'de2']}),
+            str({'Property': 'DataExtension.CustomerKey', 'SimpleOperator': 'equals', 'Value': 'de3'}),
+        ])
+        self.assertEqual(concurrent, serial)
+
+    def test_cached_catalog(self):
+        cache_path = os.path.join(tempfile.mkdtemp(), 'catalog.json')
+        config = {'data_extension_catalog_cache_path': cache_path}
+
+        first = self.discover(config, MockedRequest({'de1': '2021-01-01', 'de2': '2021-01-01'}))
+
+        mocked_request = MockedRequest({'de1': '2021-01-01', 'de2': '2021-02-01'})
+        second = self.discover(config, mocked_request)
+
+        # verify only the fields of the data extension modified since the cache was written are requested
+        self.assertEqual(mocked_request.field_filters,
+                         [{'Property': 'DataExtension.CustomerKey', 'SimpleOperator': 'equals', 'Value': 'de2'}])
+        self.assertEqual(second['data_extension.de1']['key_properties'], first['data_extension.de1']['key_properties'])
+        self.assertEqual(second['data_extension.de1']['schema'], first['data_extension.de1']['schema'])
+        self.assertEqual(second['data_extension.de2'], first['data_extension.de2'])
+
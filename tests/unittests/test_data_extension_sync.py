@@ -0,0 +1,101 @@
+import threading
+import unittest
+from unittest import mock
+import suds
+import tap_marketingcloud
+from tap_marketingcloud.endpoints.data_extensions import DataExtensionDataAccessObject, DataExtensionLookup
+
+
+def get_sudsobj(**kwargs):
+    obj = suds.sudsobject.Object()
+    for key, value in kwargs.items():
+        setattr(obj, key, value)
+    return obj
+
+
+# mock 'request' returning the data extensions matching the search filter
+class MockedRequest:
+    def __init__(self):
+        self.search_filters = []
+        self.lock = threading.Lock()
+
+    def __call__(self, name, selector, auth_stub, search_filter=None, props=None, batch_size=2500):
+        with self.lock:
+            self.search_filters.append(search_filter)
+
+        customer_keys = search_filter['Value']
+        if search_filter['SimpleOperator'] == 'equals':
+            customer_keys = [customer_keys]
+
+        return iter([get_sudsobj(CustomerKey=key, CategoryID=int(key[2:]), Name='DE {}'.format(key))
+                     for key in customer_keys])
+
+
+def get_catalog(customer_key):
+    return {
+        'tap_stream_id': 'data_extension.{}'.format(customer_key),
+        'stream': 'data_extension.DE {}'.format(customer_key),
+        'schema': {'properties': {'_CustomObjectKey': {}, 'CategoryID': {}, 'name': {}}},
+        'metadata': [{'breadcrumb': (), 'metadata': {'selected': True}}]
+    }
+
+
+class TestDataExtensionLookup(unittest.TestCase):
+
+    @mock.patch('tap_marketingcloud.endpoints.data_extensions.request', new_callable=MockedRequest)
+    def test_single_bulk_lookup(self, mocked_request):
+        lookup = DataExtensionLookup(None, ['de{}'.format(i) for i in range(10)])
+        results = {}
+
+        def get(customer_key):
+            results[customer_key] = lookup.get(customer_key).CategoryID
+
+        threads = [threading.Thread(target=get, args=('de{}'.format(i),)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # verify all the data extensions are requested once, for all the threads
+        self.assertEqual(len(mocked_request.search_filters), 1)
+        self.assertEqual(mocked_request.search_filters[0]['SimpleOperator'], 'IN')
+        self.assertEqual(results, {'de{}'.format(i): i for i in range(10)})
+
+    @mock.patch('tap_marketingcloud.endpoints.data_extensions.request', new_callable=MockedRequest)
+    def test_sync_uses_shared_lookup(self, mocked_request):
+        lookup = DataExtensionLookup(None, ['de1', 'de2'])
+        accessors = [DataExtensionDataAccessObject({'start_date': '2021-01-01T00:00:00Z'}, {}, None, get_catalog(key))
+                     for key in ['de1', 'de2']]
+
+        for accessor in accessors:
+            accessor.extension_lookup = lookup
+            with mock.patch.object(accessor, '_replicate', return_value=0) as mocked_replicate:
+                accessor.sync_data()
+
+            # verify the category and the name of the data extension are passed on
+            self.assertEqual(mocked_replicate.call_args[0][2], int(accessor.customer_key[2:]))
+            self.assertEqual(mocked_replicate.call_args[1]['name'], 'DE {}'.format(accessor.customer_key))
+
+        # verify one request is made for both the data extensions
+        self.assertEqual(len(mocked_request.search_filters), 1)
+
+    @mock.patch('tap_marketingcloud.endpoints.data_extensions.request', new_callable=MockedRequest)
+    def test_checkpoint_per_window(self, mocked_request):
+        catalog = get_catalog('de1')
+        catalog['schema']['properties']['ModifiedDate'] = {}
+        config = {'start_date': '2021-01-01T00:00:00Z', 'end_date': '2021-01-22T00:00:00Z'}
+        accessor = DataExtensionDataAccessObject(config, {}, None, catalog)
+
+        with mock.patch.object(accessor, '_request_rows', side_effect=lambda *args: iter([])), \
+                mock.patch.object(accessor, 'checkpoint') as mocked_checkpoint:
+            accessor.sync_data()
+
+        # verify one checkpoint is taken per window of 7 days, so 'checkpoint_interval_windows' counts windows
+        self.assertEqual(mocked_checkpoint.call_count, 4)
+        self.assertEqual(accessor.state['bookmarks']['data_extension.DE de1']['last_record'], '2021-01-22T00:00:00Z')
+
+    def test_available_stream_accessor(self):
+        # verify the data extension streams are discovered and synced
+        self.assertIn(DataExtensionDataAccessObject, tap_marketingcloud.AVAILABLE_STREAM_ACCESSORS)
+        self.assertTrue(DataExtensionDataAccessObject.matches_catalog(get_catalog('de1')))
+        self.assertEqual(DataExtensionDataAccessObject({}, {}, None, get_catalog('de.1')).customer_key, 'de.1')
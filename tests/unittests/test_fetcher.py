@@ -0,0 +1,89 @@
+import threading
+import time
+import unittest
+from tap_marketingcloud.fetcher import WindowFetcher, interleave
+
+
+class TestInterleave(unittest.TestCase):
+
+    def test_interleave(self):
+        # verify that the items are taken from every iterable in turn
+        self.assertEqual(
+            list(interleave([1, 2, 3], ['a', 'b'], [])),
+            [1, 'a', 2, 'b', 3])
+
+
+class TestWindowFetcher(unittest.TestCase):
+
+    def test_results_in_window_order(self):
+        # the earlier windows take longer, so they complete last
+        def fetch(window):
+            time.sleep(0.01 * (5 - window))
+            return [window] * 2
+
+        fetcher = WindowFetcher(fetch, max_in_flight=4)
+
+        # verify that the results are yielded in the order of the windows
+        self.assertEqual(
+            list(fetcher.run(range(5))),
+            [(window, [window] * 2) for window in range(5)])
+
+    def test_max_in_flight(self):
+        lock = threading.Lock()
+        in_flight = []
+        max_seen = []
+
+        def fetch(window):
+            with lock:
+                in_flight.append(window)
+                max_seen.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.remove(window)
+            return window
+
+        fetcher = WindowFetcher(fetch, max_in_flight=3)
+        list(fetcher.run(range(10)))
+
+        # verify that no more than 3 windows were fetched at the same time
+        self.assertLessEqual(max(max_seen), 3)
+
+    def test_streamed_when_serial(self):
+        fetched = []
+
+        def fetch(window):
+            for record in range(3):
+                fetched.append((window, record))
+                yield record
+
+        results = WindowFetcher(fetch, max_in_flight=1).run(range(2))
+        window, records = next(results)
+
+        # verify the records of a window are not read before the caller uses them
+        self.assertEqual(fetched, [])
+        self.assertEqual(list(records), [0, 1, 2])
+        self.assertEqual(fetched, [(0, 0), (0, 1), (0, 2)])
+
+    def test_buffered_when_concurrent(self):
+        def fetch(window):
+            return iter([window] * 2)
+
+        # verify the iterator of a buffered window is read on the worker
+        self.assertEqual(list(WindowFetcher(fetch, max_in_flight=2).run(range(3))),
+                         [(window, [window] * 2) for window in range(3)])
+
+    def test_error_is_raised(self):
+        def fetch(window):
+            if window == 2:
+                raise ConnectionError('Connection reset by peer')
+            return window
+
+        fetcher = WindowFetcher(fetch, max_in_flight=3)
+        results = []
+
+        # verify that the error of a window is raised to the caller after the earlier windows
+        with self.assertRaises(ConnectionError):
+            for window, result in fetcher.run(range(10)):
+                results.append(result)
+
+        self.assertEqual(results, [0, 1])
@@ -0,0 +1,174 @@
+import requests
+import socket
+import threading
+import unittest
+from unittest import mock
+from tap_marketingcloud.client import request_from_cursor
+from tap_marketingcloud.page_retry import RetryStats
+from tap_marketingcloud.governor import RateGovernor, ThrottleError, is_congestion_error, is_throttled
+
+
+# clock moved forward by the sleeps only
+class MockedClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class MockedResponse:
+    def __init__(self, code=200, message=None, results=()):
+        self.code = code
+        self.message = message
+        self.results = list(results)
+        self.more_results = False
+
+
+def get_governor(**kwargs):
+    clock = MockedClock()
+    return RateGovernor(clock=clock, sleep=clock.sleep, **kwargs), clock
+
+
+class TestRateGovernor(unittest.TestCase):
+
+    def test_is_throttled(self):
+        self.assertTrue(is_throttled(429))
+        self.assertTrue(is_throttled(500, 'Server was unable to process request. ---> Server too busy'))
+        self.assertFalse(is_throttled(500, 'Error: Invalid filter'))
+        self.assertFalse(is_throttled(200))
+
+    def test_token_bucket(self):
+        governor, clock = get_governor(rate=2)
+
+        for _ in range(5):
+            governor.release(governor.acquire())
+
+        # verify the burst is sent at once, then a request every half second
+        self.assertEqual(clock.sleeps, [0.5, 0.5, 0.5])
+        self.assertEqual(governor.wait_seconds, 1.5)
+        self.assertEqual(governor.max_wait_seconds, 0.5)
+
+    def test_unlimited_rate(self):
+        governor, clock = get_governor()
+
+        for _ in range(100):
+            governor.release(governor.acquire())
+
+        self.assertEqual(clock.sleeps, [])
+
+    def test_aimd_limit(self):
+        governor, _ = get_governor(max_concurrency=8)
+
+        # verify the throttles of the requests sent at the same limit lower it once
+        tickets = [governor.acquire() for _ in range(2)]
+        for ticket in tickets:
+            governor.release(ticket, throttled=True)
+        self.assertEqual(governor.limit, 4)
+
+        # verify a throttle of a request sent at the lower limit lowers it again,
+        # down to the minimum
+        for _ in range(4):
+            governor.release(governor.acquire(), throttled=True)
+        self.assertEqual((governor.limit, governor.throttles), (1, 6))
+
+        # verify the successful requests raise it back by about one per limit's worth of requests
+        for _ in range(7):
+            governor.release(governor.acquire())
+        self.assertEqual(int(governor.limit), 4)
+
+    def test_concurrency_limit(self):
+        governor = RateGovernor(max_concurrency=2)
+        tickets = [governor.acquire(), governor.acquire()]
+        acquired = threading.Event()
+
+        def acquire():
+            governor.acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+
+        # verify a request waits for a free slot
+        self.assertFalse(acquired.wait(0.1))
+        governor.release(tickets[0])
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+
+    def test_call(self):
+        governor, _ = get_governor(max_concurrency=4)
+
+        # verify a failed response is returned as is, without lowering the limit
+        self.assertEqual(governor.call(MockedResponse, 500, 'Error: Invalid filter').code, 500)
+        self.assertEqual(governor.limit, 4)
+
+        # verify a throttled response raises and lowers the limit
+        with self.assertRaises(ThrottleError):
+            governor.call(MockedResponse, 503)
+        self.assertEqual(governor.limit, 2)
+
+        # verify an error is raised as is, lowering the limit for a timeout only
+        with self.assertRaises(KeyError):
+            governor.call(mock.Mock(side_effect=KeyError))
+        self.assertEqual(governor.limit, 2)
+        with self.assertRaises(socket.timeout):
+            governor.call(mock.Mock(side_effect=socket.timeout))
+        self.assertEqual((governor.limit, governor.in_flight), (1, 0))
+
+    def test_congested(self):
+        governor, _ = get_governor(max_concurrency=4)
+
+        # verify a request timing out after its release lowers the limit once, keeping its slot free
+        ticket = governor.acquire()
+        governor.release(ticket)
+        governor.congested(ticket)
+        governor.congested(ticket)
+        self.assertEqual((governor.limit, governor.throttles, governor.in_flight), (2, 2, 0))
+
+    def test_congestion_errors(self):
+        # verify the timeouts and the responses cut short are a sign of load, but not a failed connection
+        self.assertTrue(is_congestion_error(requests.ConnectionError('Read timed out. (read timeout=300)')))
+        self.assertTrue(is_congestion_error(requests.exceptions.ChunkedEncodingError('Connection broken')))
+        self.assertTrue(is_congestion_error(requests.ReadTimeout()))
+        self.assertFalse(is_congestion_error(requests.ConnectionError('Failed to resolve soap.example.com')))
+
+    @mock.patch('singer.metrics.log')
+    def test_report(self, mocked_log):
+        governor, _ = get_governor(rate=1, max_concurrency=4)
+        for _ in range(3):
+            governor.release(governor.acquire())
+
+        governor.report()
+
+        self.assertEqual([(args[1].metric, args[1].value, args[1].tags) for args, _ in mocked_log.call_args_list], [
+            ('request_concurrency_limit', 4, {}),
+            ('throttled_requests', 0, {}),
+            ('request_wait', 2.0, {'requests': 3, 'max_wait': 1.0}),
+        ])
+
+
+# the REST asset cursor of the FuelSDK fork, not in every FuelSDK version
+@mock.patch('FuelSDK.ET_Asset', type('ET_Asset', (), {}), create=True)
+@mock.patch('time.sleep')
+@mock.patch('tap_marketingcloud.page_retry.RETRY_STATS', new_callable=RetryStats)
+class TestGovernedRequest(unittest.TestCase):
+
+    def test_throttled_page_retried(self, mocked_stats, mocked_sleep):
+        governor, _ = get_governor(max_concurrency=4)
+        responses = [MockedResponse(500, 'Server was unable to process request. ---> Server too busy'),
+                     MockedResponse(results=[1, 2])]
+        cursor = mock.Mock(get=mock.Mock(side_effect=responses))
+
+        with mock.patch('tap_marketingcloud.client.GOVERNOR', governor):
+            records = list(request_from_cursor('Send', cursor, 2500))
+
+        # verify the throttled page is requested again, at a lower limit
+        self.assertEqual(records, [1, 2])
+        self.assertEqual(cursor.get.call_count, 2)
+        self.assertEqual(mocked_stats.page_retries, 1)
+        self.assertEqual(int(governor.limit), 2)
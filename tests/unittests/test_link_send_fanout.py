@@ -0,0 +1,77 @@
+import threading
+import unittest
+from unittest import mock
+from tap_marketingcloud.endpoints.sends import SendDataAccessObject
+
+SEND_CATALOG = {
+    'stream': 'send',
+    'schema': {'type': 'object', 'properties': {'ID': {}, 'ModifiedDate': {}}},
+    'metadata': []
+}
+LINK_SEND_CATALOG = {
+    'stream': 'link_send',
+    'schema': {'type': 'object', 'properties': {'ID': {}, 'SendID': {}}},
+    'metadata': []
+}
+SENDS = [{'ID': i, 'ModifiedDate': '2021-01-0{}T00:00:00Z'.format(i)} for i in range(1, 6)]
+
+
+class TestLinkSendFanOut(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        # the records written and the checkpoints, in order
+        self.output = []
+
+    def write_records_with_transform(self, accessor, record, catalog, table):
+        with self.lock:
+            self.output.append((table, record['ID']))
+
+    def checkpoint(self, accessor, force=False):
+        with self.lock:
+            self.output.append(('checkpoint', None))
+
+    def get_link_sends(self, _filter):
+        send_ids = _filter['Value'] if isinstance(_filter['Value'], list) else [_filter['Value']]
+        return iter([{'ID': send_id * 10, 'SendID': send_id} for send_id in send_ids])
+
+    def sync(self, config, barrier=None):
+        def request(name, selector, auth_stub, search_filter=None, **kwargs):
+            if name == 'Send':
+                return iter(SENDS)
+            if barrier:
+                # only passes if the batches are requested at the same time
+                barrier.wait(timeout=5)
+            return self.get_link_sends(search_filter)
+
+        accessor = SendDataAccessObject(dict(config, start_date='2021-01-01T00:00:00Z'), {}, None, SEND_CATALOG)
+        accessor.send_link_catalog = LINK_SEND_CATALOG
+
+        # the accessor is passed as the first argument of the methods mocked with 'autospec'
+        with mock.patch('tap_marketingcloud.endpoints.sends.request', side_effect=request), \
+                mock.patch('tap_marketingcloud.endpoints.link_sends.request', side_effect=request), \
+                mock.patch('FuelSDK.ET_LinkSend', create=True), \
+                mock.patch('tap_marketingcloud.dao.DataAccessObject.write_schema'), \
+                mock.patch('tap_marketingcloud.dao.DataAccessObject.write_records_with_transform',
+                           side_effect=self.write_records_with_transform, autospec=True), \
+                mock.patch('tap_marketingcloud.dao.DataAccessObject.checkpoint',
+                           side_effect=self.checkpoint, autospec=True):
+            accessor.sync_data()
+
+    def test_link_sends_in_order(self):
+        self.sync({'link_send_batch_size': 2, 'max_concurrent_link_send_requests': 3}, threading.Barrier(3))
+
+        # verify the batches are written in order, each send batch followed by its link sends
+        # and the checkpoint, so a checkpoint never passes a send whose link sends are not written
+        self.assertEqual(self.output, [
+            ('send', 1), ('send', 2), ('link_send', 10), ('link_send', 20), ('checkpoint', None),
+            ('send', 3), ('send', 4), ('link_send', 30), ('link_send', 40), ('checkpoint', None),
+            ('send', 5), ('link_send', 50), ('checkpoint', None)
+        ])
+
+    def test_serial_by_default(self):
+        self.sync({})
+
+        # verify the sends are batched by 50 by default
+        self.assertEqual([table for table, _ in self.output],
+                         ['send'] * 5 + ['link_send'] * 5 + ['checkpoint'])
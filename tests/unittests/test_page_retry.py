@@ -0,0 +1,79 @@
+import requests
+import unittest
+from unittest import mock
+from tap_marketingcloud.client import request_from_cursor
+from tap_marketingcloud.page_retry import RetryStats, PAGE_MAX_TRIES
+
+
+# mock page of a Retrieve response
+class MockedPage:
+    def __init__(self, results, request_id, more_results):
+        self.code = 200
+        self.results = results
+        self.request_id = request_id
+        self.more_results = more_results
+
+
+# mock FuelSDK cursor, with the first page of 'pages'
+class MockedCursor:
+    def __init__(self, pages):
+        self.pages = pages
+        self.auth_stub = mock.Mock()
+        self.last_request_id = None
+
+    def get(self):
+        self.last_request_id = self.pages['first'].request_id
+        return self.pages['first']
+
+
+# the REST asset cursor of the FuelSDK fork, not in every FuelSDK version
+@mock.patch('FuelSDK.ET_Asset', type('ET_Asset', (), {}), create=True)
+@mock.patch('time.sleep')
+@mock.patch('tap_marketingcloud.page_retry.RETRY_STATS', new_callable=RetryStats)
+class TestPageRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.pages = {
+            'first': MockedPage([1, 2], 'request_1', True),
+            'request_1': MockedPage([3, 4], 'request_2', True),
+            'request_2': MockedPage([5], 'request_3', False),
+        }
+        # the request IDs continued, in order
+        self.continued = []
+
+    def get_continue(self, failures):
+        def continue_request(auth_stub, request_id, batch_size):
+            self.continued.append(request_id)
+            if failures.get(request_id):
+                failures[request_id] -= 1
+                raise requests.ConnectionError('Connection aborted.', ConnectionResetError(104, 'Connection reset by peer'))
+            return self.pages[request_id]
+        return continue_request
+
+    def test_failed_page_continued(self, mocked_stats, mocked_sleep):
+        with mock.patch('tap_marketingcloud.fuel_overrides.TapMarketingcloud__ET_Continue',
+                        side_effect=self.get_continue({'request_2': 2})):
+            records = list(request_from_cursor('ListSend', MockedCursor(self.pages), 2500))
+
+        # verify the failed page is continued from the same request ID, and no record is repeated
+        self.assertEqual(records, [1, 2, 3, 4, 5])
+        self.assertEqual(self.continued, ['request_1', 'request_2', 'request_2', 'request_2'])
+        self.assertEqual(mocked_stats.page_retries, 2)
+        self.assertEqual(mocked_stats.failed_requests, 0)
+
+    def test_page_retries_exhausted(self, mocked_stats, mocked_sleep):
+        with mock.patch('tap_marketingcloud.fuel_overrides.TapMarketingcloud__ET_Continue',
+                        side_effect=self.get_continue({'request_2': PAGE_MAX_TRIES})):
+            records = []
+            with self.assertRaises(requests.ConnectionError) as e:
+                for record in request_from_cursor('ListSend', MockedCursor(self.pages), 2500):
+                    records.append(record)
+
+        # verify the error is raised once the page retries are exhausted, marked so the
+        # stream is not synced again, and the work lost with the request is counted
+        self.assertEqual(self.continued.count('request_2'), PAGE_MAX_TRIES)
+        self.assertTrue(e.exception.page_retries_exhausted)
+        self.assertEqual(records, [1, 2, 3, 4])
+        self.assertEqual(mocked_stats.page_retries, PAGE_MAX_TRIES - 1)
+        self.assertEqual((mocked_stats.failed_requests, mocked_stats.lost_pages, mocked_stats.lost_records),
+                         (1, 2, 4))
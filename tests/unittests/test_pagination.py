@@ -1,6 +1,8 @@
+import datetime
 import unittest
 import tap_marketingcloud
-from tap_marketingcloud.pagination import increment_date
+from tap_marketingcloud.pagination import increment_date, before_date, get_date_page, date_windows, \
+    AdaptiveWindow
 
 
 class TestPagination(unittest.TestCase):
@@ -14,3 +16,85 @@ class TestPagination(unittest.TestCase):
         self.assertEqual(
             increment_date("2015-09-28T10:05:53Z", {'hours': 1}),
             "2015-09-28T11:05:53Z")
+
+
+class TestDateWindows(unittest.TestCase):
+
+    def test_same_windows(self):
+        window = AdaptiveWindow({'minutes': 10}, 2500)
+        start, end_date = '2021-01-01T00:00:00Z', '2021-01-01T01:00:00Z'
+
+        # the windows of the previous 'before_date' / 'increment_date' loop
+        expected = []
+        while before_date(start, end_date):
+            expected.append(get_date_page('EventDate', start, window.unit))
+            start = increment_date(start, window.unit)
+
+        windows = list(date_windows('EventDate', '2021-01-01T00:00:00Z', end_date, window))
+
+        # verify the same filters are generated, with datetime bounds
+        self.assertEqual([search_filter for _, _, search_filter in windows], expected)
+        self.assertEqual(len(windows), 7)
+        self.assertEqual(windows[0][:2], (datetime.datetime(2021, 1, 1, 0, 0), datetime.datetime(2021, 1, 1, 0, 10)))
+
+    def test_window_resized(self):
+        window = AdaptiveWindow({'minutes': 10}, 2500, adaptive=True)
+        windows = date_windows('EventDate', '2021-01-01T00:00:00Z', '2021-01-02T00:00:00Z', window)
+
+        _, _, first = next(windows)
+        window.observe(0)
+        _, _, second = next(windows)
+
+        # verify the new size applies from the next window
+        self.assertEqual(first['Value'], ['2021-01-01T00:00:00Z', '2021-01-01T00:10:00Z'])
+        self.assertEqual(second['Value'], ['2021-01-01T00:10:00Z', '2021-01-01T00:30:00Z'])
+
+    def test_windows_aligned(self):
+        window = AdaptiveWindow({'hours': 6}, 2500)
+        windows = date_windows('EventDate', '2021-01-02T05:00:00Z', '2021-01-02T12:00:00Z', window,
+                               anchor='2021-01-01T03:00:00Z')
+
+        # verify the first window starts on the grid of the windows starting at the anchor
+        self.assertEqual([search_filter['Value'] for _, _, search_filter in windows], [
+            ['2021-01-02T03:00:00Z', '2021-01-02T09:00:00Z'],
+            ['2021-01-02T09:00:00Z', '2021-01-02T15:00:00Z']])
+
+
+class TestAdaptiveWindow(unittest.TestCase):
+
+    def test_not_adaptive(self):
+        window = AdaptiveWindow({'minutes': 10}, 2500)
+        window.observe(0)
+        # verify that the configured unit is used as is without 'adaptive'
+        self.assertEqual(window.unit, {'minutes': 10})
+
+    def test_grow_after_sparse_window(self):
+        window = AdaptiveWindow({'minutes': 10}, 2500, adaptive=True)
+        window.observe(0)
+        # verify that the window is doubled after an empty window
+        self.assertEqual(window.unit, {'seconds': 1200})
+        window.observe(1000)
+        # verify that the window is kept as is after a well filled window
+        self.assertEqual(window.unit, {'seconds': 1200})
+
+    def test_shrink_after_spilled_window(self):
+        window = AdaptiveWindow({'minutes': 10}, 2500, adaptive=True)
+        window.observe(6000)
+        # verify that the window is halved after a window bigger than one batch
+        self.assertEqual(window.unit, {'seconds': 300})
+
+    def test_bounds(self):
+        window = AdaptiveWindow({'minutes': 10}, 2500, adaptive=True, min_seconds=300, max_seconds=1200)
+        for _ in range(5):
+            window.observe(0)
+        # verify that the window never grows past the maximum
+        self.assertEqual(window.seconds, 1200)
+        for _ in range(5):
+            window.observe(6000)
+        # verify that the window never shrinks past the minimum
+        self.assertEqual(window.seconds, 300)
+
+    def test_learned_size(self):
+        # verify that the size learned in an earlier run is used instead of the configured unit
+        window = AdaptiveWindow({'minutes': 10}, 2500, adaptive=True, seconds=3600)
+        self.assertEqual(increment_date("2015-09-28T10:05:53Z", window.unit), "2015-09-28T11:05:53Z")
@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+import FuelSDK
+from tap_marketingcloud.client import request, get_field_props
+from tap_marketingcloud.endpoints.link_sends import LinkSendDataAccessObject
+from tap_marketingcloud.endpoints.sends import SendDataAccessObject
+
+
+def get_catalog(fields, unselected=()):
+    return {
+        'schema': {'type': 'object', 'properties': {field: {} for field in fields}},
+        'metadata': [{'breadcrumb': ('properties', field), 'metadata': {'selected': False}}
+                     for field in unselected]
+    }
+
+
+class TestProjectionPushdown(unittest.TestCase):
+
+    def test_get_field_props(self):
+        retrievable = ['ID', 'Client.ID', 'Client.PartnerClientKey', 'Email.ID', 'Email.Name', 'Link', 'Subject']
+
+        # verify only the properties needed for the fields are kept, in the retrievable order
+        self.assertEqual(get_field_props(retrievable, ['Subject', 'ID', 'Email.ID']), ['ID', 'Email.ID', 'Subject'])
+        # verify a field part of a property, or made of properties, requests them
+        self.assertEqual(get_field_props(retrievable, ['Link.URL', 'Client']),
+                         ['Client.ID', 'Client.PartnerClientKey', 'Link'])
+        # verify no property is requested when no field is retrievable
+        self.assertIsNone(get_field_props(retrievable, ['PartnerProperties']))
+
+    def test_derived_fields(self):
+        catalog = get_catalog(['ID', 'EmailID', 'Subject', 'FromName', 'ModifiedDate'], unselected=['FromName', 'ID'])
+
+        # verify the derived fields are requested from their source and the unselected ones are
+        # skipped, but the key and replication key are always requested
+        self.assertEqual(SendDataAccessObject({}, {}, None, catalog).get_request_fields(),
+                         ['ID', 'Email.ID', 'Subject', 'ModifiedDate'])
+
+        catalog = get_catalog(['ID', 'LinkID', 'URL', 'Alias', 'ModifiedDate'], unselected=['Alias'])
+
+        self.assertEqual(LinkSendDataAccessObject({}, {}, None, catalog).get_request_fields(),
+                         ['ID', 'Link.ID', 'Link.URL', 'ModifiedDate'])
+
+    @mock.patch('tap_marketingcloud.client.request_from_cursor')
+    @mock.patch('tap_marketingcloud.client.get_retrievable_props')
+    def test_request_props(self, mocked_get_retrievable_props, mocked_request_from_cursor):
+        mocked_get_retrievable_props.return_value = ['ID', 'Email.ID', 'Subject', 'FromName']
+
+        request('Send', FuelSDK.ET_Send, None, fields=['ID', 'Email.ID'])
+
+        # verify the cursor retrieves the properties needed for the fields only
+        cursor = mocked_request_from_cursor.call_args[0][1]
+        self.assertEqual(cursor.props, ['ID', 'Email.ID'])
+        mocked_get_retrievable_props.assert_called_with(None, 'Send')
+
+        # verify the explicit properties are used as is
+        request('Send', FuelSDK.ET_Send, None, props=['Subject'], fields=['ID'])
+        self.assertEqual(mocked_request_from_cursor.call_args[0][1].props, ['Subject'])
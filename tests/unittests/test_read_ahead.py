@@ -0,0 +1,49 @@
+import unittest
+from unittest import mock
+import tap_marketingcloud.client as _client
+
+class Mockresponse:
+    def __init__(self, items, more_results, code=200, message=None):
+        self.results = items
+        self.more_results = more_results
+        self.code = code
+        self.message = message
+
+# mock cursor returning 'pages' of items, the first from 'get' and the rest as continuation pages
+class MockedCursor:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get(self):
+        return self.pages[0]
+
+def get_more_results(cursor, batch_size):
+    cursor.pages = cursor.pages[1:]
+    return cursor.pages[0]
+
+@mock.patch("FuelSDK.ET_Asset", new=type("ET_Asset", (), {}), create=True)
+@mock.patch("tap_marketingcloud.client.tap_marketingcloud__getMoreResults", side_effect=get_more_results)
+class TestReadAhead(unittest.TestCase):
+
+    def get_pages(self):
+        return [Mockresponse([1, 2], True), Mockresponse([3, 4], True), Mockresponse([5], False)]
+
+    def test_same_items_with_read_ahead(self, mocked_get_more_results):
+        without_read_ahead = list(_client.request_from_cursor('Test', MockedCursor(self.get_pages()), 2))
+        with_read_ahead = list(_client.request_from_cursor('Test', MockedCursor(self.get_pages()), 2, prefetch=2))
+
+        # verify that the read-ahead returns the same items in the same order
+        self.assertEqual(without_read_ahead, [1, 2, 3, 4, 5])
+        self.assertEqual(with_read_ahead, without_read_ahead)
+
+    def test_error_with_read_ahead(self, mocked_get_more_results):
+        pages = [Mockresponse([1, 2], True), Mockresponse([3, 4], True, code=500, message='Server error')]
+        items = []
+
+        # verify that the error of a page is raised after the items of the earlier pages
+        with self.assertRaises(RuntimeError) as e:
+            for item in _client.request_from_cursor('Test', MockedCursor(pages), 2, prefetch=2):
+                items.append(item)
+
+        self.assertEqual(items, [1, 2])
+        self.assertEqual(str(e.exception), "Request failed with 'Server error'")
@@ -0,0 +1,79 @@
+import threading
+import unittest
+from unittest import mock
+from tap_marketingcloud.scheduler import StreamScheduler, get_max_concurrent_streams
+from tap_marketingcloud.state import MergedState
+
+# mock stream accessor which bookmarks 'table' at 'last_record' on sync
+class MockedStreamAccessor:
+    def __init__(self, table, last_record, barrier=None, error=None):
+        self.table = table
+        self.last_record = last_record
+        self.barrier = barrier
+        self.error = error
+        self.state = None
+        self.merged_state = None
+
+    def sync(self):
+        if self.barrier:
+            # only passes if the other accessors are running at the same time
+            self.barrier.wait(timeout=5)
+        if self.error:
+            raise self.error
+        self.state.setdefault('bookmarks', {})[self.table] = {
+            'field': 'ModifiedDate',
+            'last_record': self.last_record
+        }
+
+class TestStreamScheduler(unittest.TestCase):
+
+    def test_max_concurrent_streams(self):
+        # verify that the streams are synced one at a time by default
+        self.assertEqual(get_max_concurrent_streams({}), 1)
+        self.assertEqual(get_max_concurrent_streams({'max_concurrent_streams': ''}), 1)
+        self.assertEqual(get_max_concurrent_streams({'max_concurrent_streams': '4'}), 4)
+
+    def test_streams_synced_concurrently(self):
+        barrier = threading.Barrier(3)
+        accessors = [MockedStreamAccessor(table, '2021-01-01T00:00:00Z', barrier)
+                     for table in ['send', 'email', 'folder']]
+
+        scheduler = StreamScheduler({}, max_workers=3)
+
+        self.assertTrue(scheduler.run(accessors))
+        # verify the bookmarks of all the streams are present in the merged state
+        self.assertEqual(sorted(scheduler.state['bookmarks'].keys()), ['email', 'folder', 'send'])
+
+    @mock.patch("tap_marketingcloud.scheduler.LOGGER")
+    def test_failed_stream(self, mocked_logger):
+        accessors = [MockedStreamAccessor('send', '2021-01-01T00:00:00Z', error=RuntimeError('failed')),
+                     MockedStreamAccessor('email', '2021-01-01T00:00:00Z')]
+
+        scheduler = StreamScheduler({}, max_workers=2)
+
+        # verify the run is failed but the other stream is still synced
+        self.assertFalse(scheduler.run(accessors))
+        self.assertEqual(list(scheduler.state['bookmarks'].keys()), ['email'])
+
+    def test_run_max_workers(self):
+        barrier = threading.Barrier(2)
+        accessors = [MockedStreamAccessor(table, '2021-01-01T00:00:00Z', barrier)
+                     for table in ['data_extension.de1', 'data_extension.de2']]
+
+        scheduler = StreamScheduler({}, max_workers=1)
+
+        # verify the number of workers passed to 'run' is used for that run
+        self.assertTrue(scheduler.run(accessors, max_workers=2))
+        self.assertEqual(sorted(scheduler.state['bookmarks'].keys()), ['data_extension.de1', 'data_extension.de2'])
+
+class TestMergedState(unittest.TestCase):
+
+    def test_merge_does_not_move_bookmark_back(self):
+        merged_state = MergedState({'bookmarks': {'send': {'field': 'ModifiedDate', 'last_record': '2021-02-01T00:00:00Z'}}})
+
+        # verify a stale copy of the bookmark does not roll back the merged state
+        merged_state.merge({'bookmarks': {'send': {'field': 'ModifiedDate', 'last_record': '2021-01-01T00:00:00Z'}}})
+        self.assertEqual(merged_state.state['bookmarks']['send']['last_record'], '2021-02-01T00:00:00Z')
+
+        merged_state.merge({'bookmarks': {'send': {'field': 'ModifiedDate', 'last_record': '2021-03-01T00:00:00Z'}}})
+        self.assertEqual(merged_state.state['bookmarks']['send']['last_record'], '2021-03-01T00:00:00Z')
@@ -4,9 +4,8 @@ from unittest import mock
 
 class TestSchema(unittest.TestCase):
 
-    @mock.patch("tap_marketingcloud.dao.get_abs_path")
     @mock.patch("singer.utils.load_json")
-    def test_load_schema(self, mocked_load_json, mocked_get_abs_path):
+    def test_load_schema(self, mocked_load_json):
         field_schema = {
             "type": "object",
             "properties": {
@@ -25,9 +24,8 @@ class TestSchema(unittest.TestCase):
         # verify if the 'schema' is same as 'field_schema'
         self.assertEquals(schema, field_schema)
 
-    @mock.patch("tap_marketingcloud.dao.get_abs_path")
     @mock.patch("singer.utils.load_json")
-    def test_load_schema_references(self, mocked_load_json, mocked_get_abs_path):
+    def test_load_schema_references(self, mocked_load_json):
         field_schema = {
             "type": "object",
             "properties": {
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+import singer
+from unittest import mock
+from tap_marketingcloud.dao import load_schema, load_schema_references
+from tap_marketingcloud.schema_registry import SchemaRegistry, SCHEMAS_DIR
+
+
+class TestSchemaRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.schemas_dir = os.path.join(self.directory, 'schemas')
+        shutil.copytree(SCHEMAS_DIR, self.schemas_dir)
+        self.cache_path = os.path.join(self.directory, 'schemas.cache.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_same_schemas(self):
+        registry = SchemaRegistry()
+
+        # verify the schemas are the same as resolved from the files one by one
+        for stream in ['event', 'send', 'subscriber', 'triggered_send', 'campaign_asset']:
+            self.assertEqual(registry.get_schema(stream),
+                             singer.resolve_schema_references(load_schema(stream), load_schema_references()))
+
+    @mock.patch('singer.utils.load_json', side_effect=singer.utils.load_json)
+    def test_loaded_once(self, mocked_load_json):
+        registry = SchemaRegistry(self.schemas_dir)
+
+        schema = registry.get_schema('event')
+        schema['properties'].clear()
+        registry.get_schema('send')
+        count = mocked_load_json.call_count
+
+        # verify the files are read on first use only, and a copy is returned
+        self.assertEqual(count, len(os.listdir(self.schemas_dir)))
+        self.assertTrue(registry.get_schema('event')['properties'])
+        self.assertEqual(mocked_load_json.call_count, count)
+
+    @mock.patch('singer.utils.load_json', side_effect=singer.utils.load_json)
+    def test_cache(self, mocked_load_json):
+        schema = SchemaRegistry(self.schemas_dir).get_schema('event', self.cache_path)
+        mocked_load_json.reset_mock()
+
+        # verify a new process reads the schemas from the cache
+        self.assertEqual(SchemaRegistry(self.schemas_dir).get_schema('event', self.cache_path), schema)
+        self.assertEqual(mocked_load_json.call_count, 0)
+
+        # verify the cache is not used once a schema file changed
+        os.utime(os.path.join(self.schemas_dir, 'events.json'), ns=(0, 0))
+        SchemaRegistry(self.schemas_dir).get_schema('event', self.cache_path)
+        self.assertGreater(mocked_load_json.call_count, 0)
@@ -0,0 +1,264 @@
+import requests
+import unittest
+import urllib3
+from unittest import mock
+from tap_marketingcloud.governor import RateGovernor
+from tap_marketingcloud.page_retry import RetryStats, PAGE_MAX_TRIES
+from tap_marketingcloud.soap_stream import RetrieveResponseParser, build_retrieve_envelope, stream_retrieve
+
+RESPONSE = """<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+<soap:Body>
+<RetrieveResponseMsg xmlns="http://exacttarget.com/wsdl/partnerAPI">
+<OverallStatus>{status}</OverallStatus>
+<RequestID>{request_id}</RequestID>
+{results}
+</RetrieveResponseMsg>
+</soap:Body>
+</soap:Envelope>"""
+
+RESULT = """<Results xsi:type="ClickEvent">
+<Client><ID>1</ID></Client>
+<SendID>{id}</SendID>
+<SubscriberKey>key_{id}</SubscriberKey>
+<EventDate>2021-08-24T09:56:38.25</EventDate>
+<EventType>Click</EventType>
+<URL xsi:nil="true" />
+<PartnerProperties><Name>a</Name><Value>b</Value></PartnerProperties>
+</Results>"""
+
+DE_ROW = """<Results xsi:type="DataExtensionObject">
+<Properties>
+<Property><Name>ModifiedDate</Name><Value>2021-08-24T09:56:38</Value></Property>
+<Property><Name>Email</Name><Value /></Property>
+</Properties>
+</Results>"""
+
+
+def get_response(results, status='OK', request_id='request_1'):
+    return RESPONSE.format(status=status, request_id=request_id, results=''.join(results)).encode('utf-8')
+
+
+def get_fault(message):
+    return ('<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+            '<soap:Fault><faultcode>soap:Client</faultcode><faultstring>{}</faultstring>'
+            '</soap:Fault></soap:Body></soap:Envelope>').format(message).encode('utf-8')
+
+
+def get_event(id):
+    return {
+        'Client': {'ID': '1'},
+        'SendID': str(id),
+        'SubscriberKey': 'key_{}'.format(id),
+        'EventDate': '2021-08-24T09:56:38Z',
+        'EventType': 'Click',
+        'URL': None,
+        'PartnerProperties': [{'Name': 'a', 'Value': 'b'}],
+    }
+
+
+# the error of 'requests' for a read timeout in the body of a response
+def get_read_timeout():
+    return requests.ConnectionError(urllib3.exceptions.ReadTimeoutError(
+        None, None, 'Read timed out. (read timeout=300)'))
+
+
+class MockedResponse:
+    def __init__(self, body, status_code=200, fail_at=None, error=None):
+        self.body = body
+        self.content = body
+        self.status_code = status_code
+        # the offset of the body the download fails at, with 'error'
+        self.fail_at = fail_at
+        self.error = error or get_read_timeout()
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), 100):
+            if self.fail_at is not None and i >= self.fail_at:
+                raise self.error
+            yield self.body[i:i + 100]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def get_auth_stub():
+    auth_stub = mock.Mock()
+    auth_stub.use_oAuth2_authentication = 'True'
+    auth_stub.authToken = 'token'
+    auth_stub.soap_endpoint = 'https://soap.example.com/Service.asmx'
+    auth_stub.session = None
+    return auth_stub
+
+
+class TestRetrieveResponseParser(unittest.TestCase):
+
+    def test_records_parsed_incrementally(self):
+        body = get_response([RESULT.format(id=i) for i in range(10)], 'MoreDataAvailable')
+        parser = RetrieveResponseParser()
+
+        # feed the body in small chunks, the records are returned as soon as they are complete
+        fed = 0
+        first_record_at = None
+        max_kept = 0
+        results = []
+        for i in range(0, len(body), 50):
+            results += parser.feed(body[i:i + 50])
+            fed += len(body[i:i + 50])
+            if results and first_record_at is None:
+                first_record_at = fed
+            for element in parser.stack:
+                if element.tag.endswith('RetrieveResponseMsg'):
+                    max_kept = max(max_kept, len([child for child in element if child.tag.endswith('Results')]))
+        results += parser.close()
+
+        # verify the first record was returned before the whole body was parsed
+        self.assertLess(first_record_at, len(body) / 5)
+        self.assertEqual(results, [get_event(i) for i in range(10)])
+        self.assertEqual(parser.overall_status, 'MoreDataAvailable')
+        self.assertEqual(parser.request_id, 'request_1')
+        # verify the parsed records are not kept in the tree
+        self.assertLessEqual(max_kept, 1)
+
+    def test_data_extension_values_kept_as_is(self):
+        parser = RetrieveResponseParser()
+        results = parser.feed(get_response([DE_ROW])) + parser.close()
+
+        # verify the data extension values are not formatted as dates
+        self.assertEqual(results, [{'Properties': {'Property': [
+            {'Name': 'ModifiedDate', 'Value': '2021-08-24T09:56:38'},
+            {'Name': 'Email', 'Value': None}]}}])
+
+
+class TestBuildRetrieveEnvelope(unittest.TestCase):
+
+    def test_first_page(self):
+        search_filter = {'Property': 'EventDate', 'SimpleOperator': 'between',
+                         'Value': ['2021-01-01T00:00:00Z', '2021-01-02T00:00:00Z']}
+        envelope = build_retrieve_envelope(get_auth_stub(), 'ClickEvent', ['SendID', 'EventDate'],
+                                           search_filter, batch_size=100).decode('utf-8')
+
+        self.assertIn('<fueloauth xmlns="http://exacttarget.com">token</fueloauth>', envelope)
+        self.assertIn('<ObjectType>ClickEvent</ObjectType><Properties>SendID</Properties>'
+                      '<Properties>EventDate</Properties>', envelope)
+        self.assertIn('<Filter xsi:type="SimpleFilterPart"><Property>EventDate</Property>'
+                      '<SimpleOperator>between</SimpleOperator><Value>2021-01-01T00:00:00Z</Value>'
+                      '<Value>2021-01-02T00:00:00Z</Value></Filter>', envelope)
+        self.assertIn('<Options><BatchSize>100</BatchSize></Options>', envelope)
+
+    def test_continue_request(self):
+        envelope = build_retrieve_envelope(get_auth_stub(), continue_request='request_1').decode('utf-8')
+
+        self.assertIn('<RetrieveRequest><ContinueRequest>request_1</ContinueRequest></RetrieveRequest>', envelope)
+        self.assertNotIn('ObjectType', envelope)
+
+
+@mock.patch('tap_marketingcloud.soap_stream.requests.post')
+class TestStreamRetrieve(unittest.TestCase):
+
+    def test_continuation_pages(self, mocked_post):
+        mocked_post.side_effect = [
+            MockedResponse(get_response([RESULT.format(id=i) for i in range(2)], 'MoreDataAvailable')),
+            MockedResponse(get_response([RESULT.format(id=2)], 'OK', 'request_2')),
+        ]
+
+        records = list(stream_retrieve('ClickEvent', get_auth_stub(), 'ClickEvent', props=['SendID']))
+
+        # verify all the records are returned and the second page continued the first request
+        self.assertEqual(records, [get_event(i) for i in range(3)])
+        self.assertIn(b'<ContinueRequest>request_1</ContinueRequest>', mocked_post.call_args_list[1][1]['data'])
+
+    def test_error_status(self, mocked_post):
+        mocked_post.return_value = MockedResponse(get_response([], 'Error: Invalid filter'))
+
+        with self.assertRaises(RuntimeError) as e:
+            list(stream_retrieve('ClickEvent', get_auth_stub(), 'ClickEvent', props=['SendID']))
+
+        self.assertEqual(str(e.exception), "Request failed with 'Error: Invalid filter'")
+
+    def test_fault(self, mocked_post):
+        mocked_post.return_value = MockedResponse(get_fault('Token Expired'), 500)
+        governor = RateGovernor(max_concurrency=4)
+
+        with mock.patch('tap_marketingcloud.soap_stream.GOVERNOR', governor), \
+                self.assertRaises(RuntimeError) as e:
+            list(stream_retrieve('ClickEvent', get_auth_stub(), 'ClickEvent', props=['SendID']))
+
+        # verify the fault is raised, without lowering the concurrency limit
+        self.assertEqual(str(e.exception), "Request failed with 'Token Expired'")
+        self.assertEqual((governor.limit, governor.in_flight), (4, 0))
+
+    @mock.patch('time.sleep')
+    def test_throttled_fault(self, mocked_sleep, mocked_post):
+        mocked_post.side_effect = [
+            MockedResponse(get_fault('Server was unable to process request. ---> Server too busy'), 500),
+            MockedResponse(get_response([RESULT.format(id=1)])),
+        ]
+        governor = RateGovernor(max_concurrency=4)
+
+        with mock.patch('tap_marketingcloud.soap_stream.GOVERNOR', governor):
+            records = list(stream_retrieve('ClickEvent', get_auth_stub(), 'ClickEvent', props=['SendID']))
+
+        # verify the throttled page is requested again, at a lower concurrency limit
+        self.assertEqual(records, [get_event(1)])
+        self.assertEqual((governor.throttles, int(governor.limit), governor.in_flight), (1, 2, 0))
+
+    @mock.patch('time.sleep')
+    @mock.patch('tap_marketingcloud.page_retry.RETRY_STATS', new_callable=RetryStats)
+    def test_failed_page_retried(self, mocked_stats, mocked_sleep, mocked_post):
+        second_page = get_response([RESULT.format(id=i) for i in range(2, 5)], 'OK', 'request_2')
+        mocked_post.side_effect = [
+            MockedResponse(get_response([RESULT.format(id=i) for i in range(2)], 'MoreDataAvailable')),
+            MockedResponse(second_page, fail_at=len(second_page) // 2),
+            MockedResponse(second_page),
+        ]
+
+        governor = RateGovernor(max_concurrency=4)
+
+        with mock.patch('tap_marketingcloud.soap_stream.GOVERNOR', governor):
+            records = list(stream_retrieve('ClickEvent', get_auth_stub(), 'ClickEvent', props=['SendID']))
+
+        # verify the failed page is continued again from the same request ID, and no record is repeated
+        self.assertEqual(records, [get_event(i) for i in range(5)])
+        self.assertEqual([b'<ContinueRequest>request_1</ContinueRequest>' in kwargs['data']
+                          for _, kwargs in mocked_post.call_args_list], [False, True, True])
+        self.assertEqual(mocked_stats.page_retries, 1)
+        # verify the read timeout in the body lowered the concurrency limit
+        self.assertEqual((governor.throttles, int(governor.limit), governor.in_flight), (1, 2, 0))
+
+    @mock.patch('time.sleep')
+    def test_dropped_connection_retried(self, mocked_sleep, mocked_post):
+        body = get_response([RESULT.format(id=i) for i in range(5)])
+        dropped = requests.exceptions.ChunkedEncodingError(urllib3.exceptions.ProtocolError(
+            'Connection broken: IncompleteRead(100 bytes read, 200 more expected)'))
+        mocked_post.side_effect = [
+            MockedResponse(body, fail_at=len(body) // 2, error=dropped),
+            MockedResponse(body),
+        ]
+        governor = RateGovernor(max_concurrency=4)
+
+        with mock.patch('tap_marketingcloud.soap_stream.GOVERNOR', governor):
+            records = list(stream_retrieve('ClickEvent', get_auth_stub(), 'ClickEvent', props=['SendID']))
+
+        # verify the page cut short is requested again, at a lower concurrency limit
+        self.assertEqual(records, [get_event(i) for i in range(5)])
+        self.assertEqual(mocked_post.call_count, 2)
+        self.assertEqual((governor.throttles, int(governor.limit), governor.in_flight), (1, 2, 0))
+
+    @mock.patch('time.sleep')
+    def test_page_retries_exhausted(self, mocked_sleep, mocked_post):
+        body = get_response([RESULT.format(id=i) for i in range(2)])
+        mocked_post.side_effect = lambda *args, **kwargs: MockedResponse(body, fail_at=len(body) // 2)
+
+        with self.assertRaises(requests.ConnectionError) as e:
+            list(stream_retrieve('ClickEvent', get_auth_stub(), 'ClickEvent', props=['SendID']))
+
+        # verify the error is raised once the page is requested 'PAGE_MAX_TRIES' times
+        self.assertEqual(mocked_post.call_count, PAGE_MAX_TRIES)
+        self.assertTrue(e.exception.page_retries_exhausted)
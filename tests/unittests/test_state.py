@@ -1,6 +1,11 @@
+import datetime
 import unittest
+from unittest import mock
+import voluptuous
 import tap_marketingcloud
-from tap_marketingcloud.state import incorporate
+from tap_marketingcloud.dao import DataAccessObject
+from tap_marketingcloud.state import incorporate, get_window_size, set_window_size, STATE_SCHEMA, \
+    parse_bookmark_value, BookmarkTracker, CheckpointPolicy, validate_state
 
 
 class TestState(unittest.TestCase):
@@ -57,3 +62,146 @@ class TestState(unittest.TestCase):
                     }
                 }
             })
+
+    def test_window_size(self):
+        state = set_window_size({'bookmarks': {}}, 'sent', 1200)
+
+        # verify that the window size is kept in the state and passes the state validation
+        self.assertEqual(get_window_size(state, 'sent'), 1200)
+        self.assertIsNone(get_window_size(state, 'click'))
+        STATE_SCHEMA(state)
+
+    def test_parse_bookmark_value(self):
+        # verify the ISO values and the data extension values are parsed the same as with 'dateutil'
+        self.assertEqual(parse_bookmark_value('2021-08-24T18:00:00Z'), datetime.datetime(2021, 8, 24, 18, 0, 0))
+        self.assertEqual(parse_bookmark_value('8/24/2021 6:00:00 PM'), datetime.datetime(2021, 8, 24, 18, 0, 0))
+        self.assertEqual(parse_bookmark_value('2021-08-24T18:00:00.123-06:00'),
+                         datetime.datetime(2021, 8, 24, 18, 0, 0, 123000))
+        self.assertEqual(parse_bookmark_value(datetime.datetime(2021, 8, 24, 18, 0, 0)),
+                         datetime.datetime(2021, 8, 24, 18, 0, 0))
+
+
+class TestBookmarkTracker(unittest.TestCase):
+
+    def test_write(self):
+        state = {'bookmarks': {'email': {'field': 'ModifiedDate', 'last_record': '2021-08-01T00:00:00Z'}}}
+        tracker = BookmarkTracker()
+
+        for value in ['2021-08-24T18:00:00Z', '8/25/2021 6:00:00 PM', None, '2021-08-02T00:00:00Z']:
+            tracker.observe('email', 'ModifiedDate', value)
+        tracker.observe('folder', 'ModifiedDate', '2021-07-01T00:00:00Z')
+
+        # verify the state is not updated until the bookmarks are written
+        self.assertEqual(state['bookmarks']['email']['last_record'], '2021-08-01T00:00:00Z')
+
+        state = tracker.write(state)
+
+        # verify the latest value of every table is written in the state format
+        self.assertEqual(state['bookmarks'], {
+            'email': {'field': 'ModifiedDate', 'last_record': '2021-08-25T18:00:00Z'},
+            'folder': {'field': 'ModifiedDate', 'last_record': '2021-07-01T00:00:00Z'}
+        })
+
+    def test_bookmark_not_moved_back(self):
+        state = {'bookmarks': {'email': {'field': 'ModifiedDate', 'last_record': '2021-08-01T00:00:00Z'}}}
+        tracker = BookmarkTracker()
+
+        tracker.observe('email', 'ModifiedDate', '2021-07-01T00:00:00Z')
+
+        # verify an older value does not replace the bookmark of the state
+        self.assertEqual(tracker.write(state)['bookmarks']['email']['last_record'], '2021-08-01T00:00:00Z')
+
+
+# mock clock, moved forward by the test
+class MockedClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCheckpointPolicy(unittest.TestCase):
+
+    def test_no_limit(self):
+        policy = CheckpointPolicy.from_config({})
+
+        # verify every checkpoint is emitted by default
+        self.assertEqual([policy.should_emit() for _ in range(3)], [True, True, True])
+
+    def test_records(self):
+        policy = CheckpointPolicy(records=100)
+        emitted = []
+
+        for _ in range(5):
+            policy.record(40)
+            emitted.append(policy.should_emit())
+
+        # verify a checkpoint is emitted once 100 records are written since the last one
+        self.assertEqual(emitted, [False, False, True, False, False])
+        self.assertTrue(policy.pending)
+
+    def test_windows_and_seconds(self):
+        clock = MockedClock()
+        policy = CheckpointPolicy(seconds=60, windows=3, clock=clock)
+        emitted = []
+
+        for _ in range(4):
+            clock.now += 10
+            emitted.append(policy.should_emit())
+
+        clock.now += 60
+        emitted.append(policy.should_emit())
+
+        # verify a checkpoint is emitted after 3 windows or 60 seconds, whichever comes first
+        self.assertEqual(emitted, [False, False, True, False, True])
+
+    def test_force(self):
+        policy = CheckpointPolicy(windows=10)
+
+        # verify a forced checkpoint is always emitted
+        self.assertFalse(policy.should_emit())
+        self.assertTrue(policy.should_emit(force=True))
+        self.assertFalse(policy.pending)
+
+    @mock.patch('tap_marketingcloud.dao.save_state')
+    def test_last_checkpoint_emitted(self, mocked_save_state):
+        class MockedDataAccessObject(DataAccessObject):
+            TABLE = 'email'
+
+            def sync_data(self):
+                for i in range(5):
+                    self.bookmark_tracker.observe('email', 'ModifiedDate', '2021-01-0{}T00:00:00Z'.format(i + 1))
+                    self.checkpoint()
+
+        dao = MockedDataAccessObject({'checkpoint_interval_windows': '2'}, {}, None, {
+            'stream': 'email', 'schema': {}, 'metadata': [{'breadcrumb': (), 'metadata': {'selected': True}}]})
+
+        with mock.patch('tap_marketingcloud.dao.singer.write_schema'):
+            dao.sync()
+
+        # verify every other checkpoint is emitted, and the last one is not lost
+        self.assertEqual(mocked_save_state.call_count, 3)
+        self.assertEqual(mocked_save_state.call_args[0][0]['bookmarks']['email']['last_record'],
+                         '2021-01-05T00:00:00Z')
+
+
+class TestValidateState(unittest.TestCase):
+
+    @mock.patch('tap_marketingcloud.state.STATE_SCHEMA')
+    def test_validated_once_per_shape(self, mocked_schema):
+        for day in range(1, 10):
+            validate_state({'bookmarks': {'shape_test': {'field': 'ModifiedDate',
+                                                         'last_record': '2021-01-0{}T00:00:00Z'.format(day)}}})
+
+        validate_state({'bookmarks': {'shape_test': {'field': 'ModifiedDate', 'last_record': '2021-01-01T00:00:00Z'},
+                                      'shape_test_2': {'field': 'ModifiedDate', 'last_record': '2021-01-01T00:00:00Z'}}})
+
+        # verify the states with the same tables are validated once
+        self.assertEqual(mocked_schema.call_count, 2)
+
+    def test_invalid_state(self):
+        # verify an invalid state still fails the validation every time
+        for _ in range(2):
+            with self.assertRaises(voluptuous.Invalid):
+                validate_state({'bookmarks': {'email': {'field': 'ModifiedDate', 'last_record': 1}}})
@@ -0,0 +1,66 @@
+import threading
+import time
+import unittest
+from tap_marketingcloud.token_manager import TokenManager
+
+# mock 'ET_Client' with a token valid for 'lifetime' seconds
+class Mocked_ET_Client:
+    def __init__(self, lifetime):
+        self.lifetime = lifetime
+        self.refresh_count = 0
+        self.authToken = 'token_0'
+        self.authTokenExpiration = time.time() + lifetime
+
+    def refresh_token(self, force_refresh=False):
+        if force_refresh or time.time() + 300 > self.authTokenExpiration:
+            time.sleep(0.01)
+            self.refresh_count += 1
+            self.authToken = 'token_{}'.format(self.refresh_count)
+            self.authTokenExpiration = time.time() + self.lifetime
+
+
+class TestTokenManager(unittest.TestCase):
+
+    def test_valid_token_not_refreshed(self):
+        auth_stub = Mocked_ET_Client(1200)
+        TokenManager(auth_stub)
+
+        for _ in range(100):
+            auth_stub.refresh_token()
+
+        # verify the cached token is used
+        self.assertEqual(auth_stub.refresh_count, 0)
+
+    def test_expired_token_refreshed_once(self):
+        auth_stub = Mocked_ET_Client(0)
+        refreshed = []
+        TokenManager(auth_stub, on_refresh=refreshed.append, margin=0)
+        auth_stub.lifetime = 1200
+
+        threads = [threading.Thread(target=auth_stub.refresh_token) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # verify only one of the threads refreshed the token, and the client was set up again
+        self.assertEqual(auth_stub.refresh_count, 1)
+        self.assertEqual(refreshed, [auth_stub])
+
+    def test_background_refresh(self):
+        auth_stub = Mocked_ET_Client(600.2)
+        refreshed = []
+        manager = TokenManager(auth_stub, on_refresh=refreshed.append, margin=600).start()
+
+        try:
+            # verify the token is refreshed before it expires, without any request
+            for _ in range(100):
+                if auth_stub.refresh_count:
+                    break
+                time.sleep(0.05)
+
+            self.assertGreaterEqual(auth_stub.refresh_count, 1)
+            self.assertEqual(auth_stub.authToken, 'token_{}'.format(auth_stub.refresh_count))
+            self.assertTrue(refreshed)
+        finally:
+            manager.stop()
@@ -0,0 +1,114 @@
+import copy
+import json
+import os
+import unittest
+from unittest import mock
+from singer import metadata, Transformer
+from singer.transform import SchemaMismatch
+from tap_marketingcloud.schema_registry import get_schema, SCHEMAS_DIR
+from tap_marketingcloud.transform import RecordTransformer, compile_transformer
+
+SAMPLE_VALUES = ["123", 12, "1,234", None, "", "abc", True, "false", 3.5,
+                 "2021-01-01T00:00:00Z", "8/24/2021 6:00:00 PM", {"ID": 1},
+                 [{"Name": "a", "Value": "b"}], [1, 2]]
+
+# values that match the type of the field
+TYPED_VALUES = {
+    'integer': ["1,234", 5, None, ""],
+    'number': ["1.5", 2, None],
+    'boolean': ["false", "True", 1, None],
+    'string': ["abc", 12, None, ""],
+    'array': [[], [{"Name": "a", "Value": "b"}], None],
+    'object': [{}, None],
+}
+
+def get_typed_value(field_schema, offset):
+    types = field_schema.get('type', ['string'])
+    types = [types] if not isinstance(types, list) else types
+    typ = [typ for typ in types if typ != 'null'][0] if types != ['null'] else 'string'
+    if field_schema.get('format') == 'date-time':
+        return ["2021-01-01T00:00:00Z", "8/24/2021 6:00:00 PM", None][offset % 3]
+    values = TYPED_VALUES[typ]
+    if 'null' not in types:
+        values = [value for value in values if value is not None]
+    return values[offset % len(values)]
+
+def get_streams():
+    return [file_name[:-len('s.json')] for file_name in sorted(os.listdir(SCHEMAS_DIR))
+            if file_name != 'definitions.json']
+
+def get_catalog(stream):
+    schema = get_schema(stream)
+    mdata = metadata.to_map(metadata.get_standard_metadata(schema=schema, key_properties=[]))
+    # unselect every third field
+    for i, field_name in enumerate(schema['properties']):
+        mdata[('properties', field_name)]['selected'] = i % 3 != 0
+    return {'schema': schema, 'metadata': metadata.to_list(mdata)}
+
+# transform the record as the singer Transformer does
+def singer_transform(record, catalog):
+    with Transformer() as transformer:
+        return transformer.transform(copy.deepcopy(record), copy.deepcopy(catalog['schema']),
+                                     metadata.to_map(catalog['metadata']))
+
+def transform_or_error(transform, *args):
+    try:
+        return json.dumps(transform(*args))
+    except SchemaMismatch:
+        return 'SchemaMismatch'
+
+class TestRecordTransformer(unittest.TestCase):
+
+    def test_same_output_as_singer_transformer(self):
+        for stream in get_streams():
+            catalog = get_catalog(stream)
+            transformer = compile_transformer(catalog)
+            fields = list(catalog['schema']['properties'].keys()) + ['NotInSchema']
+
+            for offset in range(len(SAMPLE_VALUES)):
+                record = {field_name: SAMPLE_VALUES[(i + offset) % len(SAMPLE_VALUES)]
+                          for i, field_name in enumerate(fields)}
+
+                # verify the compiled transformer returns the same output (or error) as the singer Transformer
+                self.assertEqual(transform_or_error(transformer.transform, record),
+                                 transform_or_error(singer_transform, record, catalog),
+                                 'Different output for stream {}'.format(stream))
+
+    def test_same_output_for_typed_records(self):
+        for stream in get_streams():
+            catalog = get_catalog(stream)
+            transformer = compile_transformer(catalog)
+
+            for offset in range(4):
+                record = {field_name: get_typed_value(field_schema, offset)
+                          for field_name, field_schema in catalog['schema']['properties'].items()}
+
+                # verify the compiled transformer writes byte-identical records
+                self.assertEqual(json.dumps(transformer.transform(record)),
+                                 json.dumps(singer_transform(record, catalog)))
+
+    def test_not_compilable_schema(self):
+        schema = {'anyOf': [{'type': 'object', 'properties': {'a': {'type': 'integer'}}}]}
+        transformer = RecordTransformer(schema, {})
+
+        # verify that the schemas which can not be compiled go through the singer Transformer
+        self.assertFalse(transformer.compiled)
+        self.assertEqual(transformer.transform({'a': '1'}), {'a': 1})
+
+    @mock.patch('tap_marketingcloud.transform.LOGGER')
+    def test_removed_fields_logged_once(self, mocked_logger):
+        schema = {'type': 'object', 'properties': {'a': {'type': 'integer'}, 'b': {'type': 'integer'}}}
+        mdata = {(): {'selected': True}, ('properties', 'b'): {'selected': False}}
+        transformer = RecordTransformer(schema, mdata)
+
+        for _ in range(3):
+            self.assertEqual(transformer.transform({'a': '1', 'b': '2', 'c': '3', 'd': '4'}), {'a': 1})
+        transformer.log_removed('stream')
+
+        # verify the fields missing from the schema are logged once, without the unselected ones
+        self.assertEqual(mocked_logger.warning.call_count, 1)
+        self.assertEqual(mocked_logger.warning.call_args[0][1:], (2, 'stream', ['c', 'd']))
+
+        # verify a transformer with nothing removed logs nothing
+        transformer.log_removed('stream')
+        self.assertEqual(mocked_logger.warning.call_count, 1)
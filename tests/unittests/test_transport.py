@@ -0,0 +1,123 @@
+import requests
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from suds.transport import Request, TransportError
+from tap_marketingcloud.client import request_page
+from tap_marketingcloud.dao import exacttarget_error_handling
+from tap_marketingcloud.page_retry import PAGE_MAX_TRIES
+from tap_marketingcloud.transport import get_session, PooledTransport, RestSession
+
+# stub SOAP server, returns the body it received, or a fault for '/fault',
+# and closes the connection without a response for '/reset'
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    client_ports = set()
+
+    def do_POST(self):
+        StubHandler.client_ports.add(self.client_address[1])
+        body = self.rfile.read(int(self.headers['Content-Length']))
+
+        if self.path == '/reset':
+            self.close_connection = True
+            return
+
+        if self.path == '/fault':
+            self.send_response(500)
+            body = b'<faultstring>Error</faultstring>'
+        else:
+            self.send_response(200)
+
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPooledTransport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = 'http://127.0.0.1:{}'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_connection_reused(self):
+        StubHandler.client_ports.clear()
+        transport = PooledTransport(get_session(), timeout=10)
+
+        for i in range(5):
+            reply = transport.send(Request(self.url + '/Service.asmx', 'message_{}'.format(i).encode('utf-8')))
+            # verify the reply of every call
+            self.assertEqual(reply.code, 200)
+            self.assertEqual(reply.message, 'message_{}'.format(i).encode('utf-8'))
+
+        # verify all the calls went through one connection
+        self.assertEqual(len(StubHandler.client_ports), 1)
+
+    def test_fault(self):
+        transport = PooledTransport(get_session(), timeout=10)
+
+        # verify the fault is raised as a 'TransportError' with the body, the same as 'HttpTransport'
+        with self.assertRaises(TransportError) as e:
+            transport.send(Request(self.url + '/fault', b'message'))
+
+        self.assertEqual(e.exception.httpcode, 500)
+        self.assertEqual(e.exception.fp.read(), b'<faultstring>Error</faultstring>')
+
+    @mock.patch('time.sleep')
+    def test_connection_error_retried(self, mocked_sleep):
+        transport = PooledTransport(get_session(), timeout=10)
+        transport.send = mock.Mock(side_effect=transport.send)
+
+        # verify the dropped connection is raised as the 'ConnectionError' of 'requests', and
+        # the page is requested again until its retries are exhausted
+        with self.assertRaises(requests.ConnectionError) as e:
+            request_page(transport.send, Request(self.url + '/reset', b'message'))
+
+        self.assertEqual(transport.send.call_count, PAGE_MAX_TRIES)
+        self.assertTrue(e.exception.page_retries_exhausted)
+
+        # verify the calls outside of the page requests are retried by the streams too
+        transport.send.reset_mock()
+        with self.assertRaises(requests.ConnectionError):
+            exacttarget_error_handling(transport.send)(Request(self.url + '/reset', b'message'))
+
+        self.assertEqual(transport.send.call_count, 8)
+
+    def test_request_timeout(self):
+        session = mock.Mock()
+        session.post.return_value.status_code = 200
+        transport = PooledTransport(session, timeout=100)
+
+        transport.send(Request(self.url, b'message'))
+
+        # verify the timeout of the transport is used
+        self.assertEqual(session.post.call_args[1]['timeout'], 100)
+
+    def test_compression(self):
+        # verify compressed responses are requested only when enabled
+        self.assertEqual(get_session().headers['Accept-Encoding'], 'gzip, deflate')
+        self.assertEqual(get_session(compression=False).headers['Accept-Encoding'], 'identity')
+
+
+class TestRestSession(unittest.TestCase):
+
+    def test_request_timeout(self):
+        session = mock.Mock()
+        rest_session = RestSession(session, 100)
+
+        rest_session.get('https://example.com', headers={'authorization': 'Bearer token'})
+
+        # verify the call goes through the session with the request timeout
+        session.request.assert_called_with('GET', 'https://example.com',
+                                           headers={'authorization': 'Bearer token'}, timeout=100)
@@ -1,6 +1,8 @@
+import datetime
 import unittest
+import suds
 import tap_marketingcloud
-from tap_marketingcloud.util import partition_all
+from tap_marketingcloud.util import partition_all, get_path, sudsobj_to_dict, sudsobj_to_record
 
 
 class TestPartitionAll(unittest.TestCase):
@@ -10,3 +12,48 @@ class TestPartitionAll(unittest.TestCase):
         self.assertEqual(
             list(partition_all([1, 2, 3, 4, 5, 6, 7], 3)),
             [[1, 2, 3], [4, 5, 6], [7]])
+
+
+def get_sudsobj(**kwargs):
+    obj = suds.sudsobject.Object()
+    for key, value in kwargs.items():
+        setattr(obj, key, value)
+    return obj
+
+
+class TestSudsobjToRecord(unittest.TestCase):
+
+    def setUp(self):
+        self.link_send = get_sudsobj(
+            ID=1,
+            SendID=2,
+            ModifiedDate=datetime.datetime(2021, 1, 1, 10, 0, 0),
+            Link=get_sudsobj(ID=3, URL='http://example.com', LastClicked=datetime.datetime(2021, 1, 2)),
+            Client=get_sudsobj(ID=4))
+
+    def test_get_path(self):
+        # verify the nested values are read and the datetimes formatted
+        self.assertEqual(get_path(self.link_send, ['Link', 'URL']), 'http://example.com')
+        self.assertEqual(get_path(self.link_send, ['Link', 'LastClicked']), '2021-01-02T00:00:00Z')
+        # verify the default is returned when a key of the path is missing
+        self.assertEqual(get_path(self.link_send, ['Link', 'Alias'], 'N/A'), 'N/A')
+        self.assertEqual(get_path(self.link_send, ['Email', 'ID']), None)
+
+    def test_get_path_list(self):
+        email = {'ContentAreas': [{'ID': 1}, {'ID': 2}, {}]}
+
+        # verify the rest of the path is read from every item of a list
+        self.assertEqual(get_path(email, ['ContentAreas', 'ID']), [1, 2, None])
+        self.assertEqual(get_path({}, ['ContentAreas', 'ID'], []), [])
+
+    def test_sudsobj_to_record(self):
+        derived_fields = {'LinkID': (['Link', 'ID'], None), 'Alias': (['Link', 'Alias'], None)}
+        record = sudsobj_to_record(self.link_send, ['ID', 'ModifiedDate', 'Link', 'LinkID', 'Alias', 'Missing'],
+                                   derived_fields)
+
+        # verify only the keys are converted, the same as converting the whole object and projecting it
+        expected = sudsobj_to_dict(self.link_send)
+        del expected['SendID'], expected['Client']
+        expected.update({'LinkID': 3, 'Alias': None})
+
+        self.assertEqual(record, expected)
@@ -0,0 +1,166 @@
+import datetime
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import suds
+from tap_marketingcloud.endpoints.events import EventDataAccessObject
+from tap_marketingcloud.endpoints.list_subscribers import ListSubscriberDataAccessObject
+from tap_marketingcloud.window_cache import get_window_cache, WindowCache
+
+OLD_WINDOW_END = datetime.datetime(2021, 1, 1)
+
+
+def get_sudsobj(**kwargs):
+    obj = suds.sudsobject.Object()
+    for key, value in kwargs.items():
+        setattr(obj, key, value)
+    return obj
+
+
+# mock 'fetch' counting its calls
+class MockedFetch:
+    def __init__(self, records):
+        self.records = records
+        self.call_count = 0
+
+    def __call__(self):
+        self.call_count += 1
+        return list(self.records)
+
+
+class TestWindowCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def test_window_replayed(self):
+        cache = WindowCache(self.directory)
+        fetch = MockedFetch([{'ID': 1}, {'ID': 2}])
+        search_filter = {'Property': 'EventDate', 'SimpleOperator': 'between', 'Value': ['a', 'b']}
+
+        first = cache.get_or_fetch('sent', search_filter, OLD_WINDOW_END, fetch)
+        second = WindowCache(self.directory).get_or_fetch('sent', search_filter, OLD_WINDOW_END, fetch)
+
+        # verify the window is requested once and replayed from disk by the next run
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(first, second)
+
+        # verify another window is requested
+        cache.get_or_fetch('click', search_filter, OLD_WINDOW_END, fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_recent_window_refreshed(self):
+        cache = WindowCache(self.directory, refresh_seconds=3600)
+        fetch = MockedFetch([{'ID': 1}])
+        end = datetime.datetime.utcnow() - datetime.timedelta(minutes=10)
+
+        cache.get_or_fetch('sent', {}, end, fetch)
+        cache.get_or_fetch('sent', {}, end, fetch)
+
+        # verify a window ending less than 'refresh_seconds' ago is always requested, and never written
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_lookback_refreshed(self):
+        cache = WindowCache(self.directory)
+        fetch = MockedFetch([{'ID': 1}])
+        yesterday = datetime.datetime.utcnow() - datetime.timedelta(hours=12)
+        two_days_ago = datetime.datetime.utcnow() - datetime.timedelta(days=2)
+        refresh_seconds = ListSubscriberDataAccessObject.DELAY_IN_DAY * 24 * 60 * 60
+
+        # verify the windows of the default lookback (1 day) are always requested
+        cache.get_or_fetch('sent', {}, yesterday, fetch)
+        cache.get_or_fetch('sent', {}, yesterday, fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+        # verify the windows of a longer lookback of the stream are always requested
+        cache.get_or_fetch('list_subscriber', {}, two_days_ago, fetch, refresh_seconds=refresh_seconds)
+        cache.get_or_fetch('list_subscriber', {}, two_days_ago, fetch, refresh_seconds=refresh_seconds)
+        self.assertEqual(fetch.call_count, 4)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_disabled_with_adaptive_windows(self):
+        # verify the cache is disabled when its windows are not on the grid
+        self.assertIsNotNone(get_window_cache({'window_cache_path': self.directory}))
+        self.assertIsNone(get_window_cache({'window_cache_path': self.directory, 'pagination__adaptive': True}))
+
+    def test_expired_window(self):
+        cache = WindowCache(self.directory, ttl_seconds=60)
+        fetch = MockedFetch([{'ID': 1}])
+
+        cache.get_or_fetch('sent', {}, OLD_WINDOW_END, fetch)
+        path = os.path.join(self.directory, os.listdir(self.directory)[0])
+        os.utime(path, (time.time() - 120, time.time() - 120))
+
+        cache.get_or_fetch('sent', {}, OLD_WINDOW_END, fetch)
+
+        # verify a window cached for longer than the TTL is requested again
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_size_eviction(self):
+        cache = WindowCache(self.directory, max_bytes=250)
+        fetch = MockedFetch([{'ID': i} for i in range(10)])
+
+        for i in range(5):
+            cache.get_or_fetch('sent', {'Value': i}, OLD_WINDOW_END, fetch)
+            path = cache._get_path('sent', {'Value': i}, None)
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+
+        # verify the windows written first are removed to fit in the size
+        self.assertLessEqual(cache.total_bytes, 250)
+        self.assertEqual(cache.total_bytes, sum(os.path.getsize(os.path.join(self.directory, name))
+                                                for name in os.listdir(self.directory)))
+        self.assertTrue(os.path.exists(cache._get_path('sent', {'Value': 4}, None)))
+        self.assertFalse(os.path.exists(cache._get_path('sent', {'Value': 0}, None)))
+
+
+class TestWindowCacheReplay(unittest.TestCase):
+
+    @mock.patch('tap_marketingcloud.endpoints.events.request')
+    def test_events_replayed(self, mocked_request):
+        mocked_request.side_effect = lambda *args, **kwargs: iter([
+            get_sudsobj(SendID=1, EventType='Click', SubscriberKey='a', ID=10,
+                        EventDate=datetime.datetime(2020, 12, 31, 10, 0, 0))])
+
+        config = {'start_date': '2020-12-31T00:00:00Z', 'window_cache_path': tempfile.mkdtemp()}
+        search_filter = {'Property': 'EventDate', 'SimpleOperator': 'between',
+                         'Value': ['2020-12-31T00:00:00Z', '2021-01-01T00:00:00Z']}
+        window = ('click', None, None, OLD_WINDOW_END, search_filter)
+        catalog = {'schema': {'properties': {key: {} for key in ['SendID', 'EventType', 'SubscriberKey', 'EventDate', 'ID']}},
+                   'metadata': []}
+
+        fetched = list(EventDataAccessObject(config, {}, None, catalog)._fetch_window(window))
+        replayed = list(EventDataAccessObject(config, {}, None, catalog)._fetch_window(window))
+
+        # verify the replayed events are parsed the same as the requested ones
+        self.assertEqual(mocked_request.call_count, 1)
+        self.assertEqual(replayed, fetched)
+        self.assertEqual(replayed[0]['EventDate'], '2020-12-31T10:00:00Z')
+
+    @mock.patch('tap_marketingcloud.dao.singer.write_state')
+    @mock.patch('tap_marketingcloud.dao.singer.write_record')
+    @mock.patch('tap_marketingcloud.endpoints.events.request')
+    def test_moved_bookmark_replayed(self, mocked_request, mocked_write_record, mocked_write_state):
+        mocked_request.side_effect = lambda *args, **kwargs: iter([])
+        config = {'start_date': '2020-12-01T00:00:00Z', 'end_date': '2020-12-04T00:00:00Z',
+                  'window_cache_path': tempfile.mkdtemp()}
+        for event_name in ['sent', 'click', 'bounce', 'unsub']:
+            config.update({'pagination__{}_interval_unit'.format(event_name): 'hours',
+                           'pagination__{}_interval_quantity'.format(event_name): 6})
+        catalog = {'schema': {'properties': {key: {} for key in ['SendID', 'EventType', 'SubscriberKey', 'EventDate', 'ID']}},
+                   'metadata': []}
+
+        EventDataAccessObject(config, {}, None, catalog).sync_data()
+        requested = mocked_request.call_count
+
+        # the next sync starts from a bookmark one day (the lookback) before a
+        # time which is not on the boundary of a window
+        state = {'bookmarks': {event_name: {'field': 'EventDate', 'last_record': '2020-12-03T10:00:00Z'}
+                               for event_name in ['sent', 'click', 'bounce', 'unsub']}}
+        EventDataAccessObject(config, state, None, catalog).sync_data()
+
+        # verify the windows of the second sync are the ones of the first sync, replayed from the cache
+        self.assertGreater(requested, 0)
+        self.assertEqual(mocked_request.call_count, requested)